@@ -1,13 +1,10 @@
-from flask import Flask, request, jsonify, Response, render_template
+from flask import Flask, request, jsonify, Response, render_template, g
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
+import threading
 import json
 import os
-import re
-import psycopg2
-from psycopg2 import OperationalError
-from collections import defaultdict
 from dotenv import load_dotenv
 
 # Flask uygulamasını en başta tanımlıyoruz (Hata riskini sıfıra indirmek için)
@@ -16,8 +13,9 @@ CORS(app, origins=["*"])
 load_dotenv()
 
 # --- GÜVENLİK MODÜLLERİ ---
+from security.rate_limiter import rate_limiter
+
 try:
-    from security.rate_limiter import rate_limiter
     from security.validator import validator
 except ImportError:
     class DummyValidator:
@@ -32,138 +30,132 @@ except Exception as e:
     validator = DummyValidator()
 
 # --- VERİTABANI BAĞLANTISI ---
-def get_db_connection():
-    db_url = os.environ.get('DATABASE_PRIVATE_URL')
-    
-    if not db_url and os.environ.get('PGHOST'):
-         try:
-            db_url = f"postgres://{os.environ.get('PGUSER')}:{os.environ.get('PGPASSWORD')}@{os.environ.get('PGHOST')}:{os.environ.get('PGPORT')}/{os.environ.get('PGDATABASE')}"
-         except: pass
-    
-    if not db_url:
-        db_url = os.environ.get('DATABASE_URL')
-
-    if not db_url:
-        print("❌ HATA: DB URL bulunamadı.")
-        return None
-
-    if "sslmode" not in db_url:
-        if "?" in db_url:
-            db_url += "&sslmode=require"
-        else:
-            db_url += "?sslmode=require"
-
-    try:
-        conn = psycopg2.connect(db_url, connect_timeout=10)
-        return conn
-    except Exception as e:
-        print(f"❌ Veritabanı Bağlantı Hatası: {e}")
-        return None
-
-# --- TABLO OLUŞTURMA ---
-def create_tables():
-    print("\n🔍 --- BAŞLANGIÇ KONTROLÜ ---")
-    keys = [k for k in os.environ.keys() if 'PG' in k or 'DB' in k or 'DATABASE' in k]
-    for k in keys:
-        val = os.environ[k]
-        hint = "✅ Private/Internal"
-        if "ballast" in val: hint = "⚠️ PUBLIC PROXY (Sorunlu)"
-        print(f"   🔑 {k}: [{hint}]")
-    print("------------------------------\n")
-
-    conn = get_db_connection()
-    if not conn:
-        print("❌ Tablolar oluşturulamadı: Bağlantı yok.")
-        return
-
+# Bağlantılar süreç geneli havuzdan gelir (bkz. database.py); ChatbotManager da aynı havuzu kullanır.
+from database import get_db_connection, release_db_connection, ping_database, pool_stats
+
+# --- CHATBOT ---
+# Uygulama ömrü boyunca tek yönetici; parser/yanıt tabloları her istekte yeniden kurulmaz.
+from chatbot_manager import (
+    STATIC_ACTIONS, etag_matches, get_chatbot_manager, site_payloads, warm_sms_cache,
+)
+from sms_cache import recent_sms_cache
+from ingest import IngestError, ingest_queue
+from gateway import (
+    GATEWAY_BATCH_MAX, batch_messages, batch_summary, is_allowed_user_agent,
+    prepare_batch, prepare_sms, remember_sms,
+)
+from sms_events import (
+    SMS_STREAM_HEARTBEAT, SMS_STREAM_MAX_CONCURRENT, SMS_STREAM_RETRY_AFTER, format_sse, latest_cached_event, sms_event_bus, stream_wait,
+)
+from health import db_probe, readiness
+from schema import AUTO_MIGRATE, migrate
+from partitions import partition_maintainer
+from sessions import session_tracker
+from rules import rule_pack_watcher
+from senders import sender_index
+from export import ExportError, export_headers, export_params, stream_export
+from export import check_token as check_export_token
+from response_manager import explicit_language, negotiate_language
+from logs import get_logger
+from metrics import observe_request, register_default_stats, registry, render_metrics
+chatbot = get_chatbot_manager()
+log = get_logger('app')
+register_default_stats(pool_stats)
+registry.register_stats('shipliyo_db_probe', db_probe.stats)
+registry.register_stats('shipliyo_sms_partitions', partition_maintainer.stats)
+registry.register_stats('shipliyo_chat_sessions', session_tracker.stats)
+registry.register_stats('shipliyo_rule_pack', rule_pack_watcher.stats)
+registry.register_stats('shipliyo_sender_index', sender_index.stats)
+
+# --- SÜREÇ BAŞLATMA ---
+# Import sırasında DB'ye dokunulmaz: şema `python manage.py migrate` ile (Procfile
+# release adımı) kurulur; önbellek ısıtma her süreçte (gunicorn fork'undan sonra
+# her worker'da) ilk istekte arka plan thread'inde başlar ve istekleri bekletmez.
+_started_pid = None
+_startup_lock = threading.Lock()
+
+def warm_cache_in_background():
+    # Son SMS penceresini belleğe al (DB yoksa önbellek soğuk kalır, sorgular DB'ye gider)
+    started = time.monotonic()
     try:
-        cur = conn.cursor()
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS sms_messages (
-                id SERIAL PRIMARY KEY,
-                from_number TEXT NOT NULL,
-                body TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                device_id TEXT,
-                processed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                source TEXT
-            )
-        ''')
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS chat_sessions (
-                id SERIAL PRIMARY KEY,
-                session_id TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        print("✅ PostgreSQL tabloları hazır.")
+        warmed = warm_sms_cache()
+        if recent_sms_cache:
+            log.info('sms_cache_warmed', rows=warmed, seconds=round(time.monotonic() - started, 3))
     except Exception as e:
-        print(f"❌ Tablo oluşturma hatası: {e}")
-    finally:
-        if conn: conn.close()
+        log.warning('sms_cache_warm_failed', error=str(e))
 
-# Uygulama başlarken tabloları kontrol et
-try:
-    create_tables()
-except Exception as e:
-    print(f"⚠️ Tablo oluşturma sırasında hata (Kritik Değil): {e}")
+def ensure_process_started():
+    """Süreç başına bir kez; AUTO_MIGRATE=1 ise (yerel geliştirme) önce şemayı kurar"""
+    global _started_pid
+    pid = os.getpid()
+    if _started_pid == pid:
+        return
+    with _startup_lock:
+        if _started_pid == pid:
+            return
+        if AUTO_MIGRATE:
+            conn = get_db_connection()
+            if conn:
+                try:
+                    for warning in migrate(conn):
+                        log.warning('migrate_warning', detail=warning)
+                except Exception as e:
+                    log.error('migrate_failed', error=str(e))
+                finally:
+                    release_db_connection(conn)
+        # Yapılandırılmış kural paketi ilk istekten önce devreye girer (bkz. rules.py)
+        rule_pack_watcher.check()
+        rule_pack_watcher.ensure_thread()
+        sender_index.ensure_thread()
+        if sms_event_bus.feeds_cache:
+            # Önbelleği LISTEN bağlantısı ısıtır ve besler (bkz. sms_events)
+            sms_event_bus.start()
+        else:
+            threading.Thread(target=warm_cache_in_background, name='sms-cache-warm', daemon=True).start()
+        partition_maintainer.ensure_thread()
+        _started_pid = pid
 
 # --- YARDIMCI FONKSİYONLAR ---
-sms_duplicate_cache = {}
-SMS_CACHE_TIMEOUT = 5
-
-def check_sms_duplicate(from_number, body, timestamp):
-    current_time = time.time()
-    duplicate_key = f"{from_number}_{body}_{timestamp}"
-    
-    if duplicate_key in sms_duplicate_cache:
-        cache_time = sms_duplicate_cache[duplicate_key]
-        if current_time - cache_time < SMS_CACHE_TIMEOUT:
-            print(f"🔄 DUPLICATE SMS ENGELLENDİ: {duplicate_key}")
-            return True
-    
-    sms_duplicate_cache[duplicate_key] = current_time
-    for key in list(sms_duplicate_cache.keys()):
-        if current_time - sms_duplicate_cache[key] > 60:
-            del sms_duplicate_cache[key]
-    return False
-
-rate_limit_data = defaultdict(list)
-
-def check_rate_limit(client_ip, max_requests=30, window_seconds=60):
-    current_time = time.time()
-    rate_limit_data[client_ip] = [
-        req_time for req_time in rate_limit_data[client_ip] 
-        if current_time - req_time < window_seconds
-    ]
-    if len(rate_limit_data[client_ip]) >= max_requests:
-        return False, window_seconds
-    rate_limit_data[client_ip].append(current_time)
-    return True, 0
-
-def validate_phone_number(phone):
-    if not phone: return False
-    pattern = r'^\+?[1-9]\d{1,14}$'
-    return re.match(pattern, phone) is not None
-
-def validate_message_content(message):
-    if not message or len(message.strip()) == 0:
-        return False, "Boş mesaj gönderilemez"
-    if len(message) > 1000:
-        return False, "Mesaj çok uzun (max 1000 karakter)"
-    return True, ""
+def check_rate_limit(key, max_requests=30, window_seconds=60):
+    """Token bucket sınırı; backend RATE_LIMIT_BACKEND ile seçilir (bkz. security.rate_limiter)"""
+    return rate_limiter.check(key, max_requests, window_seconds)
+
+def rate_limited_response(retry_after):
+    response = jsonify({"error": f"Hız sınırı aşıldı. {retry_after}sn bekleyin."})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
 
 def verify_user_agent():
-    user_agent = request.headers.get('User-Agent', '')
-    allowed_agents = ['Shipliyo-SMS-Gateway', 'Android', 'Dalvik']
-    for allowed in allowed_agents:
-        if allowed in user_agent:
-            return True
-    print(f"🚫 Yetkisiz User-Agent: {user_agent}")
-    return False
+    return is_allowed_user_agent(request.headers.get('User-Agent', ''))
+
+def request_language(requested=None):
+    """İstekte açıkça verilen dil, yoksa Accept-Language (bkz. response_manager.negotiate_language)"""
+    if not isinstance(requested, str):
+        requested = None
+    return negotiate_language(requested, request.headers.get('Accept-Language'))
+
+def static_reply_response(reply, vary_language=False):
+    """Önceden serileştirilmiş statik yanıt; istemcide aynı ETag varsa gövdesiz 304"""
+    headers = {'ETag': reply.etag, 'Cache-Control': reply.cache_control}
+    if vary_language:
+        headers['Vary'] = 'Accept-Language'
+    if etag_matches(request.headers.get('If-None-Match'), reply.etag):
+        return Response(status=304, headers=headers)
+    return Response(reply.body, mimetype='application/json', headers=headers)
+
+# --- ÖLÇÜM ---
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    ensure_process_started()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_request(route, request.method, response.status_code, started)
+    return response
 
 # --- ROUTE HANDLERS ---
 @app.route('/')
@@ -173,105 +165,250 @@ def home():
     except Exception as e:
         return f"<h3>Arayüz Yüklenemedi</h3><p>Hata: {e}</p><p>Lütfen 'templates/index.html' dosyasının var olduğundan emin olun.</p>"
 
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    # DB'ye gitmez: arka plandaki yoklamanın son sonucu okunur (bkz. health.py)
+    db_probe.ensure_thread(ping_database)
+    ready, body = readiness(db_probe.stats(), pool_stats(), ingest_queue.stats())
+    return jsonify(body), 200 if ready else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
     client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-    conn = get_db_connection()
-    db_status = "connected" if conn else "disconnected"
-    if conn: conn.close()
-    
+    db_probe.ensure_thread(ping_database)
+    probe = db_probe.stats()
+    db_status = "connected" if probe['ok'] else "disconnected"
+
     return jsonify({
         "status": "healthy" if db_status == "connected" else "degraded",
         "service": "Shipliyo SMS Backend",
         "database": db_status,
+        "db_probe": probe,
+        "pool": pool_stats(),
+        "sms_cache": recent_sms_cache.stats() if recent_sms_cache else {"enabled": False},
+        "ingest": ingest_queue.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "sms_events": sms_event_bus.stats(),
         "ip": client_ip,
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 @app.route('/gateway-sms', methods=['POST'])
 def gateway_sms():
-    client_ip = request.headers.get('X-Forwarded-For', request.remote_addr or 'unknown')
-    allowed, retry_after = check_rate_limit(client_ip, 60, 60)
+    client_ip = rate_limiter.get_client_ip()
+    allowed, retry_after = check_rate_limit(f"gateway:{client_ip}", 60, 60)
     if not allowed:
-        return jsonify({"error": f"Hız sınırı aşıldı. {retry_after}sn bekleyin."}), 429
+        return rate_limited_response(retry_after)
 
     if not verify_user_agent(): return jsonify({"error": "Yetkisiz erişim"}), 403
     if not request.is_json: return jsonify({"error": "JSON gerekli"}), 400
 
     try:
         data = request.get_json()
-        print(f"📨 SMS GELDİ: {data}")
+        log.sampled('sms_received', device=(data or {}).get('deviceId'), sender=(data or {}).get('from'))
 
-        from_number = data.get('from', '').strip()
-        body = data.get('body', '').strip()
-        timestamp = data.get('timestamp', '')
-        device_id = data.get('deviceId', 'android_gateway')
-
-        if check_sms_duplicate(from_number, body, timestamp):
+        item, status, error = prepare_sms(data, time.monotonic())
+        if status == "duplicate":
             return jsonify({"status": "duplicate", "message": "Zaten işlendi"}), 200
+        if item is None:
+            return jsonify({"error": error}), 400
 
-        is_valid_msg, msg_error = validate_message_content(body)
-        if not is_valid_msg: return jsonify({"error": msg_error}), 400
+        # Parse + DB yazma arka planda yapılır; gateway hemen ACK alır
+        if ingest_queue.submit(item):
+            remember_sms([item])
+            return jsonify({
+                "status": "success",
+                "message": "SMS kuyruğa alındı",
+                "processed": False,
+                "queued": True
+            })
 
-        conn = get_db_connection()
-        if not conn:
+        # Kuyruk kapalı (INGEST_MODE=sync) veya dolu: istek içinde yaz
+        try:
+            inserted = ingest_queue.process_now([item])
+        except IngestError:
             return jsonify({"error": "Veritabanı bağlantısı kurulamadı"}), 500
+        remember_sms([item])
 
-        try:
-            cur = conn.cursor()
-            try:
-                sms_ts = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            except:
-                sms_ts = datetime.now()
-
-            cur.execute('''
-                INSERT INTO sms_messages 
-                (from_number, body, device_id, processed, source, timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (from_number, body, device_id, False, 'android_gateway', sms_ts))
-            
-            conn.commit()
-            cur.close()
-            print(f"✅ SMS DB'ye Yazıldı: {from_number}")
+        if not inserted:
+            return jsonify({"status": "duplicate", "message": "Zaten işlendi"}), 200
+
+        return jsonify({
+            "status": "success",
+            "message": "SMS işlendi",
+            "processed": True
+        })
+
+    except Exception as e:
+        log.error('gateway_error', error=str(e))
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/gateway-sms/batch', methods=['POST'])
+def gateway_sms_batch():
+    """
+    Yeniden bağlanan gateway'in biriktirdiği SMS'leri tek istekte alır.
+    Gövde: [{"from", "body", "timestamp", "deviceId"}, ...] veya {"messages": [...]}
+    Geçerli SMS'ler tek transaction içinde tek çok satırlı INSERT ile yazılır;
+    yanıt her SMS için durum içerir (stored / duplicate / invalid).
+    """
+    client_ip = rate_limiter.get_client_ip()
+    allowed, retry_after = check_rate_limit(f"gateway:{client_ip}", 60, 60)
+    if not allowed:
+        return rate_limited_response(retry_after)
+
+    if not verify_user_agent(): return jsonify({"error": "Yetkisiz erişim"}), 403
+    if not request.is_json: return jsonify({"error": "JSON gerekli"}), 400
+
+    try:
+        data = request.get_json()
+        messages = batch_messages(data)
+        if messages is None:
+            return jsonify({"error": "SMS listesi gerekli"}), 400
+        if len(messages) > GATEWAY_BATCH_MAX:
+            return jsonify({"error": f"Tek istekte en fazla {GATEWAY_BATCH_MAX} SMS gönderilebilir"}), 413
 
+        log.info('sms_batch_received', count=len(messages))
+        items, results = prepare_batch(messages, time.monotonic())
+
+        inserted = set()
+        if items:
             try:
-                from chatbot_manager import ChatbotManager
-                temp_chatbot = ChatbotManager()
-                bot_response = temp_chatbot.handle_message(body, from_number, 'tr')
-                print(f"🤖 Chatbot Yanıtı: {bot_response}")
-            except Exception as e:
-                print(f"⚠️ Chatbot Hatası: {e}")
-            
-            return jsonify({
-                "status": "success",
-                "message": "SMS işlendi",
-                "processed": True
-            })
+                inserted = ingest_queue.process_now(items)
+            except IngestError:
+                return jsonify({"error": "Veritabanı bağlantısı kurulamadı"}), 500
+            remember_sms(items)
 
-        finally:
-            if conn: conn.close()
+        return jsonify(batch_summary(messages, results, inserted))
 
     except Exception as e:
-        print(f"❌ GATEWAY HATASI: {e}")
+        log.error('gateway_batch_error', error=str(e))
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/chatbot', methods=['POST'])
 def chatbot_api():
+    allowed, retry_after = check_rate_limit(f"chatbot:{rate_limiter.get_client_ip()}", 30, 60)
+    if not allowed:
+        return rate_limited_response(retry_after)
+
     try:
-        from chatbot_manager import ChatbotManager
-        temp_chatbot = ChatbotManager()
-        
         data = request.get_json()
-        msg = data.get('message', '')
-        session_id = data.get('session_id', 'web-user')
-        
-        response = temp_chatbot.handle_message(msg, session_id, 'tr')
-        return jsonify(response)
+        msg = data.get('message', '').strip().lower()
+        language = request_language(data.get('language'))
+        session_tracker.touch(data.get('session_id'), language)
+
+        action = chatbot.resolve_action(msg, language)
+        if action in STATIC_ACTIONS:
+            return static_reply_response(chatbot.cached_static_reply(action, language))
+        return jsonify(chatbot.lookup_reply(msg, action, language))
     except Exception as e:
-        print(f"❌ API Chatbot Hatası: {e}")
+        log.error('chatbot_error', error=str(e))
         return jsonify({"error": "İşlem başarısız"}), 500
 
+@app.route('/api/chatbot/reply/<action>', methods=['GET'])
+def chatbot_static_reply(action):
+    """
+    Dile bağlı statik yanıtlar (menü, site baloncukları, yardım, adres) için
+    önbelleklenebilir GET: ETag + Cache-Control ile tarayıcı/CDN tekrar sormaz.
+    """
+    if action not in STATIC_ACTIONS:
+        return jsonify({"error": "Bulunamadı"}), 404
+    requested = request.args.get('language')
+    return static_reply_response(chatbot.cached_static_reply(action, request_language(requested)),
+                                 vary_language=explicit_language(requested) is None)
+
+@app.route('/api/export/sms', methods=['GET'])
+def export_sms():
+    """Denetim için SMS geçmişi (NDJSON/CSV akışı); EXPORT_TOKEN ile korunur (bkz. export.py)"""
+    if not check_export_token(request.headers.get('Authorization')):
+        return jsonify({"error": "Yetkisiz"}), 401
+    try:
+        params = export_params(request.args)
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        stream = stream_export(**params)
+    except Exception as e:
+        log.error('sms_export_failed', error=str(e))
+        return jsonify({"error": "Dışa aktarım başlatılamadı"}), 500
+    return Response(stream, headers=export_headers(params['export_format']))
+
+# Her akış bir gthread thread'ini tutar; gateway ve chatbot istekleri için thread bırakılır
+sms_stream_slots = threading.BoundedSemaphore(SMS_STREAM_MAX_CONCURRENT)
+
+@app.route('/api/sms-stream', methods=['GET'])
+def sms_stream():
+    """
+    Seçilen site için SMS bekleyen istemciye (widget) Server-Sent Events akışı.
+    /gateway-sms eşleşen bir SMS yazdığı anda kod itilir ve akış kapanır;
+    bekleme sırasında hiç DB sorgusu çalışmaz (bkz. sms_events).
+    Olaylar: sms (kod bulundu), timeout (süre doldu).
+
+    Worker başına en fazla SMS_STREAM_MAX_CONCURRENT akış açılır; fazlası 503
+    alır ve widget periyodik sorguya geçer. Çok sayıda bekleyen widget için
+    SSE'yi ASGI modu sunmalı (bkz. asgi_app.py).
+    """
+    allowed, retry_after = check_rate_limit(f"stream:{rate_limiter.get_client_ip()}", 30, 60)
+    if not allowed:
+        return rate_limited_response(retry_after)
+
+    site = request.args.get('site', '').strip().lower()
+    if site not in site_payloads():
+        return jsonify({"error": "Geçersiz site"}), 400
+    language = request_language(request.args.get('language'))
+    try:
+        wait = stream_wait(request.args.get('timeout'))
+    except ValueError:
+        return jsonify({"error": "Geçersiz timeout"}), 400
+
+    if not sms_stream_slots.acquire(blocking=False):
+        log.sampled('sms_stream_rejected', site=site, limit=SMS_STREAM_MAX_CONCURRENT)
+        response = jsonify({"error": "Akış kapasitesi dolu", "retry": SMS_STREAM_RETRY_AFTER * 1000})
+        response.headers['Retry-After'] = str(SMS_STREAM_RETRY_AFTER)
+        return response, 503
+
+    def generate():
+        # Önce abone ol, sonra önbelleğe bak: arada gelen SMS kaçmaz
+        subscription = sms_event_bus.subscribe(site)
+        try:
+            yield "retry: 5000\n\n"
+            cached = latest_cached_event(site)
+            if cached:
+                yield format_sse('sms', chatbot.sms_event_reply(cached, language))
+                return
+
+            deadline = time.monotonic() + wait
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield format_sse('timeout', {"site": site, "seconds": int(wait)})
+                    return
+                event = subscription.get(min(remaining, SMS_STREAM_HEARTBEAT))
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse('sms', chatbot.sms_event_reply(event, language))
+                return
+        finally:
+            subscription.close()
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Üreteç hiç başlamadan bağlantı kopsa da yer WSGI close() ile geri verilir
+    response.call_on_close(sms_stream_slots.release)
+    return response
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
     print(f"🚀 Sunucu {port} portunda başlatılıyor...")
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
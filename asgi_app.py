@@ -0,0 +1,615 @@
+"""
+asyncio tabanlı alternatif sunucu modu.
+
+Flask uygulamasıyla (app.py) aynı /health, /health/live, /health/ready,
+/metrics, /api/chatbot, /gateway-sms, /gateway-sms/batch, /api/sms-stream ve
+/api/export/sms
+route'larını sunar; ancak DB okumaları asyncpg havuzu üzerinden await edilir
+ve SSE ile bekleyen widget'lar birer coroutine olarak tutulur (thread başına
+bir istemci yerine). Böylece tek süreç binlerce bekleyen istemciyi taşıyabilir;
+SSE akışlarını sunmanın önerilen yolu budur (Flask modu worker başına
+SMS_STREAM_MAX_CONCURRENT akışla sınırlıdır, bkz. sms_events).
+
+Çalıştırma:
+    uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+
+Notlar:
+- Şema `python manage.py migrate` ile oluşturulur (bkz. schema.py); bu mod
+  tabloların var olduğunu varsayar.
+- SMS yazma yolu Flask moduyla aynıdır: /gateway-sms SMS'i ingest kuyruğuna
+  koyup hemen yanıt döner, yazma arka plan thread'inde yapılır. Kuyruk kapalı
+  / dolu ise senkron yazma event loop'u bloklamamak için thread'e devredilir.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+import asyncpg
+
+from chatbot_manager import (
+    SMS_BY_BODY_SQL, SMS_BY_REF_CODE_SQL, STATIC_ACTIONS, WARM_SMS_SQL,
+    etag_matches, get_chatbot_manager, recent_sms_query, reference_threshold, site_payloads,
+)
+from database import get_database_url
+from gateway import (
+    GATEWAY_BATCH_MAX, batch_messages, batch_summary, is_allowed_user_agent,
+    prepare_batch, prepare_sms, remember_sms,
+)
+from health import db_probe, readiness
+from partitions import partition_maintainer
+from sessions import session_tracker
+from rules import rule_pack_watcher
+from senders import sender_index
+from export import ExportError, export_headers, export_params, stream_export
+from export import check_token as check_export_token
+from ingest import IngestError, ingest_queue
+from logs import get_logger
+from metrics import DB_QUERY_SECONDS, observe_request, register_default_stats, registry, render_metrics
+from response_manager import explicit_language, negotiate_language
+from security.rate_limiter import rate_limiter
+from sms_cache import recent_sms_cache
+from sms_events import (
+    SMS_STREAM_HEARTBEAT, format_sse, latest_cached_event, sms_event_bus, stream_wait,
+)
+
+
+log = get_logger('asgi')
+
+
+STATIC_REPLY_PREFIX = '/api/chatbot/reply/'
+
+# asyncpg havuzu kurulamazsa yeniden denemeler arasındaki en uzun bekleme (sn)
+POOL_RETRY_MAX_DELAY = 30
+
+
+def to_asyncpg_sql(sql: str) -> str:
+    """psycopg2 '%s' yer tutucularını asyncpg'nin '$1, $2, ...' biçimine çevirir"""
+    parts = sql.split('%s')
+    return parts[0] + ''.join(f'${index}{part}' for index, part in enumerate(parts[1:], start=1))
+
+
+class AsyncDatabase:
+    """asyncpg bağlantı havuzu; ayarlar database.py'deki havuzla aynı ortam değişkenlerinden okunur"""
+
+    def __init__(self):
+        self.pool = None
+        self._statements = {}
+        self._probe_task = None
+        self._partition_task = None
+        self._rules_task = None
+        self._senders_task = None
+        self._pool_task = None
+
+    async def start(self, on_ready=None):
+        """
+        Havuzu kurar ve arka plan görevlerini başlatır. Havuz kurulamazsa
+        istekler 500 dönerken arka planda artan aralıklarla yeniden denenir;
+        havuz hazır olunca on_ready (varsa) çağrılır.
+        """
+        self._probe_task = asyncio.ensure_future(db_probe.run_async(self.ping))
+        # Bölüm bakımı psycopg2 havuzuyla thread'de çalışır (bkz. partitions.py)
+        self._partition_task = asyncio.ensure_future(partition_maintainer.run_async())
+        # Kural paketi izleme (bkz. rules.py)
+        self._rules_task = asyncio.ensure_future(rule_pack_watcher.run_async())
+        # Gönderici -> site indeksi (bkz. senders.py)
+        self._senders_task = asyncio.ensure_future(sender_index.run_async())
+
+        db_url, connection_source = get_database_url()
+        if not db_url:
+            log.error('db_url_missing')
+            return
+        if await self._create_pool(db_url, connection_source):
+            if on_ready is not None:
+                await on_ready()
+        else:
+            self._pool_task = asyncio.ensure_future(self._retry_pool(db_url, connection_source, on_ready))
+
+    async def _create_pool(self, db_url: str, connection_source: str) -> bool:
+        timezone_name = os.environ.get('DB_TIMEZONE', 'Europe/Istanbul')
+
+        async def init(conn):
+            await conn.execute(f"SET TIME ZONE '{timezone_name}'")
+
+        try:
+            self.pool = await asyncpg.create_pool(
+                db_url,
+                min_size=int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+                max_size=int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                max_inactive_connection_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+                timeout=10,
+                init=init,
+            )
+        except Exception as e:
+            log.error('db_pool_failed', source=connection_source, error=str(e))
+            return False
+        log.info('db_pool_ready', source=connection_source, driver='asyncpg')
+        return True
+
+    async def _retry_pool(self, db_url: str, connection_source: str, on_ready=None):
+        delay = 1.0
+        while True:
+            await asyncio.sleep(delay)
+            if await self._create_pool(db_url, connection_source):
+                break
+            delay = min(delay * 2, POOL_RETRY_MAX_DELAY)
+        if on_ready is not None:
+            await on_ready()
+
+    async def ping(self):
+        if self.pool is None:
+            raise IngestError("Veritabanı bağlantısı kurulamadı")
+        await self.pool.fetchval('SELECT 1', timeout=2)
+
+    async def close(self):
+        for task in (self._probe_task, self._partition_task, self._rules_task, self._senders_task, self._pool_task):
+            if task is not None:
+                task.cancel()
+        if self.pool is not None:
+            await self.pool.close()
+
+    def _sql(self, sql: str) -> str:
+        converted = self._statements.get(sql)
+        if converted is None:
+            converted = self._statements[sql] = to_asyncpg_sql(sql)
+        return converted
+
+    async def fetch(self, sql: str, params: tuple, name: str = 'other'):
+        if self.pool is None:
+            raise IngestError("Veritabanı bağlantısı kurulamadı")
+        with DB_QUERY_SECONDS.time(query=name):
+            return await self.pool.fetch(self._sql(sql), *params,
+                                         timeout=float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', 5)))
+
+    async def fetchrow(self, sql: str, params: tuple, name: str = 'other'):
+        rows = await self.fetch(sql, params, name)
+        return rows[0] if rows else None
+
+    def stats(self) -> dict:
+        if self.pool is None:
+            return {'driver': 'asyncpg', 'size': 0}
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {
+            'driver': 'asyncpg',
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'max_size': self.pool.get_max_size(),
+            'saturation': round((size - idle) / self.pool.get_max_size(), 3),
+        }
+
+
+# --- HTTP yardımcıları ---
+class Request:
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        self.args = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+
+    @property
+    def client_ip(self) -> str:
+        forwarded = self.headers.get('x-forwarded-for')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+        client = self.scope.get('client')
+        return client[0] if client else 'unknown'
+
+    @property
+    def is_json(self) -> bool:
+        return self.headers.get('content-type', '').split(';')[0].strip() == 'application/json'
+
+    async def body(self) -> bytes:
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def json(self):
+        return json.loads(await self.body() or b'null')
+
+    def language(self, requested=None) -> str:
+        """İstekte açıkça verilen dil, yoksa Accept-Language (bkz. response_manager.negotiate_language)"""
+        if not isinstance(requested, str):
+            requested = None
+        return negotiate_language(requested, self.headers.get('accept-language'))
+
+
+async def send_json(send, payload, status: int = 200, headers: Optional[Dict[str, str]] = None):
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+    raw_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    for key, value in (headers or {}).items():
+        raw_headers.append((key.lower().encode(), str(value).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_static_reply(request, send, reply, vary_language: bool = False):
+    """Önceden serileştirilmiş statik yanıt; istemcide aynı ETag varsa gövdesiz 304"""
+    headers = [(b'etag', reply.etag.encode()), (b'cache-control', reply.cache_control.encode())]
+    if vary_language:
+        headers.append((b'vary', b'Accept-Language'))
+    if etag_matches(request.headers.get('if-none-match'), reply.etag):
+        await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    headers += [(b'content-type', b'application/json'), (b'content-length', str(len(reply.body)).encode())]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': reply.body})
+
+
+async def check_rate_limit(key: str, max_requests: int, window_seconds: float):
+    """rate_limiter.check; sqlite/postgres backend'i event loop'u bekletmesin diye thread'de çalışır"""
+    if rate_limiter.blocking:
+        return await asyncio.to_thread(rate_limiter.check, key, max_requests, window_seconds)
+    return rate_limiter.check(key, max_requests, window_seconds)
+
+
+async def rate_limited(send, retry_after: int):
+    await send_json(send, {"error": f"Hız sınırı aşıldı. {retry_after}sn bekleyin."}, 429,
+                    {'Retry-After': retry_after})
+
+
+class AsyncApp:
+    """Çerçevesiz, küçük ASGI uygulaması (route sayısı az ve sabit)"""
+
+    def __init__(self):
+        self.db = AsyncDatabase()
+        self.chatbot = get_chatbot_manager()
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/health/live'): self.liveness,
+            ('GET', '/health/ready'): self.readiness,
+            ('GET', '/metrics'): self.metrics,
+            ('POST', '/api/chatbot'): self.chatbot_api,
+            ('POST', '/gateway-sms'): self.gateway_sms,
+            ('POST', '/gateway-sms/batch'): self.gateway_sms_batch,
+            ('GET', '/api/sms-stream'): self.sms_stream,
+            ('GET', '/api/export/sms'): self.export_sms,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        request = Request(scope, receive)
+        handler = self.routes.get((request.method, request.path))
+        route = request.path if handler is not None else 'unmatched'
+        if handler is None and request.method == 'GET' and request.path.startswith(STATIC_REPLY_PREFIX):
+            handler, route = self.chatbot_static_reply, STATIC_REPLY_PREFIX + '<action>'
+        started = time.perf_counter()
+
+        async def timed_send(message):
+            # Flask'taki after_request ile aynı nokta: yanıt başlığı (SSE için ilk bayt)
+            if message['type'] == 'http.response.start':
+                observe_request(route, request.method, message['status'], started)
+            await send(message)
+
+        if handler is None:
+            await send_json(timed_send, {"error": "Bulunamadı"}, 404)
+            return
+        try:
+            await handler(request, timed_send)
+        except Exception as e:
+            log.error('asgi_error', path=request.path, error=str(e))
+            await send_json(timed_send, {"error": "İşlem başarısız"}, 500)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if sms_event_bus.feeds_cache:
+                    # Önbelleği LISTEN bağlantısı ısıtır ve besler (bkz. sms_events)
+                    sms_event_bus.start()
+                    await self.db.start()
+                else:
+                    await self.db.start(on_ready=self.warm_cache)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.to_thread(ingest_queue.drain, float(os.environ.get('INGEST_DRAIN_TIMEOUT', 10)))
+                await asyncio.to_thread(session_tracker.flush)
+                await self.db.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def warm_cache(self):
+        if recent_sms_cache is None or self.db.pool is None:
+            return
+        started = time.monotonic()
+        try:
+            since = datetime.utcnow() - timedelta(seconds=recent_sms_cache.window_seconds)
+            rows = await self.db.fetch(WARM_SMS_SQL, (since,), 'warm_sms')
+            recent_sms_cache.warm(tuple(row) for row in rows)
+            log.info('sms_cache_warmed', rows=len(rows), seconds=round(time.monotonic() - started, 3))
+        except Exception as e:
+            log.warning('sms_cache_warm_failed', error=str(e))
+
+    # --- Route'lar ---
+    async def liveness(self, request, send):
+        await send_json(send, {"status": "alive"})
+
+    async def readiness(self, request, send):
+        ready, body = readiness(db_probe.stats(), self.db.stats(), ingest_queue.stats())
+        await send_json(send, body, 200 if ready else 503)
+
+    async def health(self, request, send):
+        probe = db_probe.stats()
+        db_status = "connected" if probe['ok'] else "disconnected"
+        await send_json(send, {
+            "status": "healthy" if db_status == "connected" else "degraded",
+            "service": "Shipliyo SMS Backend",
+            "mode": "asgi",
+            "database": db_status,
+            "db_probe": probe,
+            "pool": self.db.stats(),
+            "sms_cache": recent_sms_cache.stats() if recent_sms_cache else {"enabled": False},
+            "ingest": ingest_queue.stats(),
+            "rate_limit": rate_limiter.stats(),
+            "sms_events": sms_event_bus.stats(),
+            "ip": request.client_ip,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    async def metrics(self, request, send):
+        body, content_type = render_metrics()
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', content_type.encode())]})
+        await send({'type': 'http.response.body', 'body': body.encode('utf-8')})
+
+    async def chatbot_api(self, request, send):
+        allowed, retry_after = await check_rate_limit(f"chatbot:{request.client_ip}", 30, 60)
+        if not allowed:
+            await rate_limited(send, retry_after)
+            return
+
+        data = await request.json() or {}
+        msg = data.get('message', '').strip().lower()
+        language = request.language(data.get('language'))
+        session_tracker.touch(data.get('session_id'), language)
+
+        action = self.chatbot.resolve_action(msg, language)
+        if action in STATIC_ACTIONS:
+            await send_static_reply(request, send, self.chatbot.cached_static_reply(action, language))
+            return
+        await send_json(send, await self.lookup_reply(msg, action, language))
+
+    async def chatbot_static_reply(self, request, send):
+        """Flask modundaki /api/chatbot/reply/<action> ile aynı"""
+        action = request.path[len(STATIC_REPLY_PREFIX):]
+        if action not in STATIC_ACTIONS:
+            await send_json(send, {"error": "Bulunamadı"}, 404)
+            return
+        requested = request.args.get('language')
+        await send_static_reply(request, send, self.chatbot.cached_static_reply(action, request.language(requested)),
+                                vary_language=explicit_language(requested) is None)
+
+    async def lookup_reply(self, message: str, action: str, language: str) -> Dict:
+        """ChatbotManager.lookup_reply'ın DB sorgularını await eden karşılığı"""
+        if action == 'site':
+            return await self.recent_sms_by_site(message, 120, language)
+        return await self.reference_code(message, language)
+
+    async def recent_sms_by_site(self, site: str, seconds: int, language: str) -> Dict:
+        time_threshold = datetime.utcnow() - timedelta(seconds=seconds)
+        rows = self.chatbot.cached_recent_sms(site, time_threshold)
+        source = "memory"
+        if not rows:
+            source = "postgresql"
+            try:
+                rows = [tuple(row) for row in await self.db.fetch(*recent_sms_query(site, time_threshold), 'recent_sms')]
+            except Exception as e:
+                log.error('recent_sms_query_failed', site=site, error=str(e))
+                return self.chatbot.no_recent_sms_reply(site, seconds, language, "error")
+        return self.chatbot.recent_sms_reply(site, rows, source, seconds, language)
+
+    async def reference_code(self, ref_code: str, language: str) -> Dict:
+        time_threshold = reference_threshold()
+        found_sms = self.chatbot.cached_reference(ref_code, time_threshold)
+        source = "memory"
+        if not found_sms:
+            source = "postgresql"
+            try:
+                found_sms = await self.db.fetchrow(SMS_BY_REF_CODE_SQL, (ref_code.upper(), time_threshold),
+                                                   'sms_by_ref_code')
+                if not found_sms:
+                    found_sms = await self.db.fetchrow(SMS_BY_BODY_SQL, (f'%{ref_code}%', time_threshold),
+                                                       'sms_by_body')
+            except Exception as e:
+                log.error('reference_query_failed', error=str(e))
+                return self.chatbot.reference_reply(None, "error", language)
+        return self.chatbot.reference_reply(tuple(found_sms) if found_sms else None, source, language)
+
+    async def gateway_guard(self, request, send) -> bool:
+        allowed, retry_after = await check_rate_limit(f"gateway:{request.client_ip}", 60, 60)
+        if not allowed:
+            await rate_limited(send, retry_after)
+            return False
+        if not is_allowed_user_agent(request.headers.get('user-agent', '')):
+            await send_json(send, {"error": "Yetkisiz erişim"}, 403)
+            return False
+        if not request.is_json:
+            await send_json(send, {"error": "JSON gerekli"}, 400)
+            return False
+        return True
+
+    async def gateway_sms(self, request, send):
+        if not await self.gateway_guard(request, send):
+            return
+        data = await request.json()
+        log.sampled('sms_received', device=(data or {}).get('deviceId'), sender=(data or {}).get('from'))
+
+        item, status, error = prepare_sms(data, time.monotonic())
+        if status == "duplicate":
+            await send_json(send, {"status": "duplicate", "message": "Zaten işlendi"})
+            return
+        if item is None:
+            await send_json(send, {"error": error}, 400)
+            return
+
+        if ingest_queue.submit(item):
+            remember_sms([item])
+            await send_json(send, {"status": "success", "message": "SMS kuyruğa alındı",
+                                   "processed": False, "queued": True})
+            return
+
+        try:
+            inserted = await asyncio.to_thread(ingest_queue.process_now, [item])
+        except IngestError:
+            await send_json(send, {"error": "Veritabanı bağlantısı kurulamadı"}, 500)
+            return
+        remember_sms([item])
+        if not inserted:
+            await send_json(send, {"status": "duplicate", "message": "Zaten işlendi"})
+            return
+        await send_json(send, {"status": "success", "message": "SMS işlendi", "processed": True})
+
+    async def gateway_sms_batch(self, request, send):
+        if not await self.gateway_guard(request, send):
+            return
+        messages = batch_messages(await request.json())
+        if messages is None:
+            await send_json(send, {"error": "SMS listesi gerekli"}, 400)
+            return
+        if len(messages) > GATEWAY_BATCH_MAX:
+            await send_json(send, {"error": f"Tek istekte en fazla {GATEWAY_BATCH_MAX} SMS gönderilebilir"}, 413)
+            return
+
+        log.info('sms_batch_received', count=len(messages))
+        items, results = prepare_batch(messages, time.monotonic())
+        inserted = set()
+        if items:
+            try:
+                inserted = await asyncio.to_thread(ingest_queue.process_now, items)
+            except IngestError:
+                await send_json(send, {"error": "Veritabanı bağlantısı kurulamadı"}, 500)
+                return
+            remember_sms(items)
+        await send_json(send, batch_summary(messages, results, inserted))
+
+    async def export_sms(self, request, send):
+        """Flask modundaki /api/export/sms ile aynı; psycopg2 named cursor parça başına thread'de okunur"""
+        if not check_export_token(request.headers.get('authorization')):
+            await send_json(send, {"error": "Yetkisiz"}, 401)
+            return
+        try:
+            params = export_params(request.args)
+        except ExportError as e:
+            await send_json(send, {"error": str(e)}, 400)
+            return
+
+        try:
+            stream = await asyncio.to_thread(stream_export, **params)
+        except Exception as e:
+            log.error('sms_export_failed', error=str(e))
+            await send_json(send, {"error": "Dışa aktarım başlatılamadı"}, 500)
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (key.lower().encode(), value.encode()) for key, value in export_headers(params['export_format']).items()
+        ]})
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.to_thread(next, stream, None)
+                except Exception:
+                    # Hata kaydı gönderildi ve loglandı; gövde sonlandırılmaz, istemci kesintiyi görür
+                    return
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            await asyncio.to_thread(stream.close)
+
+    async def sms_stream(self, request, send):
+        """Flask modundaki /api/sms-stream ile aynı olaylar; her bekleyen istemci bir coroutine"""
+        allowed, retry_after = await check_rate_limit(f"stream:{request.client_ip}", 30, 60)
+        if not allowed:
+            await rate_limited(send, retry_after)
+            return
+
+        site = request.args.get('site', '').strip().lower()
+        if site not in site_payloads():
+            await send_json(send, {"error": "Geçersiz site"}, 400)
+            return
+        language = request.language(request.args.get('language'))
+        try:
+            wait = stream_wait(request.args.get('timeout'))
+        except ValueError:
+            await send_json(send, {"error": "Geçersiz timeout"}, 400)
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        async def write(chunk: str, more: bool = True):
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': more})
+
+        # İstemci bağlantıyı kapatırsa beklemeyi hemen bırak
+        disconnected = asyncio.ensure_future(self._wait_disconnect(request))
+        subscription = sms_event_bus.subscribe_async(site)
+        try:
+            await write("retry: 5000\n\n")
+            cached = latest_cached_event(site)
+            if cached:
+                await write(format_sse('sms', self.chatbot.sms_event_reply(cached, language)), False)
+                return
+
+            deadline = time.monotonic() + wait
+            while not disconnected.done():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    await write(format_sse('timeout', {"site": site, "seconds": int(wait)}), False)
+                    return
+                getter = asyncio.ensure_future(subscription.get(min(remaining, SMS_STREAM_HEARTBEAT)))
+                await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    return
+                event = getter.result()
+                if event is None:
+                    await write(": ping\n\n")
+                    continue
+                await write(format_sse('sms', self.chatbot.sms_event_reply(event, language)), False)
+                return
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+    @staticmethod
+    async def _wait_disconnect(request):
+        while True:
+            message = await request.receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+
+app = AsyncApp()
+register_default_stats(app.db.stats)
+registry.register_stats('shipliyo_db_probe', db_probe.stats)
+registry.register_stats('shipliyo_sms_partitions', partition_maintainer.stats)
+registry.register_stats('shipliyo_chat_sessions', session_tracker.stats)
+registry.register_stats('shipliyo_rule_pack', rule_pack_watcher.stats)
+registry.register_stats('shipliyo_sender_index', sender_index.stats)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 8000))
+    print(f"🚀 ASGI sunucu {port} portunda başlatılıyor...")
+    uvicorn.run(app, host='0.0.0.0', port=port, log_level='warning')
@@ -0,0 +1,63 @@
+"""
+ChatbotManager mikro-benchmark'ı - mesaj başına CPU süresi.
+
+İki modu karşılaştırır:
+  per_request : her mesajda ChatbotManager() kurulur (eski app.py davranışı)
+  shared      : get_chatbot_manager() ile tek örnek paylaşılır
+
+Yalnızca veritabanına gitmeyen mesajlar ölçülür (menü, yardım, intent tespiti).
+Eski bir checkout ile karşılaştırmak için aynı komutu o ağaçta çalıştırın:
+
+    python -m benchmarks.bench_chatbot --iterations 20000
+"""
+import argparse
+import time
+
+import chatbot_manager
+
+MESSAGES = [
+    ('get_code', 'tr'),
+    ('help', 'tr'),
+    ('get_address', 'tr'),
+    ('merhaba', 'tr'),
+    ('kod istiyorum', 'tr'),
+    ('yardım lazım', 'tr'),
+    ('adresim nedir', 'tr'),
+    ('искам код', 'bg'),
+    ('помощ', 'bg'),
+    ('what can you do', 'en'),
+    ('i want my delivery address', 'en'),
+    ('hello there', 'en'),
+]
+
+
+def _run(handler_factory, iterations):
+    started = time.process_time()
+    for i in range(iterations):
+        message, language = MESSAGES[i % len(MESSAGES)]
+        handler_factory().handle_message(message, 'bench', language)
+    return time.process_time() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    modes = {'per_request': chatbot_manager.ChatbotManager}
+    get_manager = getattr(chatbot_manager, 'get_chatbot_manager', None)
+    if get_manager is not None:
+        modes['shared'] = get_manager
+
+    # Isınma
+    for factory in modes.values():
+        _run(factory, 200)
+
+    print(f"{'mod':<12} {'toplam (s)':>11} {'mesaj başına (µs)':>18}")
+    for name, factory in modes.items():
+        elapsed = _run(factory, args.iterations)
+        print(f"{name:<12} {elapsed:>11.3f} {elapsed / args.iterations * 1e6:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Uygulama modülünün import (soğuk başlangıç) süresi.
+
+Her tekrar yeni bir Python sürecinde `import app` çalıştırır; süreyi, import
+sırasında DB havuzunun açılıp açılmadığını ve -X importtime ile en pahalı
+modülleri raporlar. Varsayılan DATABASE_URL erişilemeyen bir adrestir:
+import süresi DB'nin durumundan bağımsız olmalıdır.
+
+    python -m benchmarks.bench_import --repeat 5 --max-ms 500
+
+--max-ms verilirse medyan bu değeri aşınca 1 ile çıkar (CI'da kullanılabilir).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# connect_timeout=10 ile yanıt vermeyen adres (yavaş/erişilemeyen DB benzetimi)
+UNREACHABLE_DB = 'postgresql://shipliyo:x@10.255.255.1:5432/shipliyo?connect_timeout=10'
+
+PROBE = (
+    "import time; started = time.perf_counter(); import {module}; "
+    "elapsed = (time.perf_counter() - started) * 1000; "
+    "import database; print(f'{{elapsed:.1f}} {{database._pool is not None}}')"
+)
+
+
+def run_once(module, env):
+    result = subprocess.run([sys.executable, '-c', PROBE.format(module=module)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'import başarısız')
+    elapsed, pool_opened = result.stdout.strip().splitlines()[-1].split()
+    return float(elapsed), pool_opened == 'True'
+
+
+def top_modules(module, env, limit):
+    """-X importtime çıktısından kümülatif süreye göre en pahalı modüller (µs)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Modülün kendisi (derinlik 0) ve doğrudan import ettikleri (derinlik 1)
+        if depth <= 1:
+            rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='app veya asgi_app')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=UNREACHABLE_DB,
+                        help='Varsayılan: erişilemeyen adres; gerçek DB için $DATABASE_URL verin')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, help='Medyan import süresi üst sınırı')
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, DATABASE_URL=args.database_url, LOG_LEVEL='WARNING', AUTO_MIGRATE='0')
+    timings = []
+    pool_opened = False
+    for _ in range(args.repeat):
+        elapsed, opened = run_once(args.module, env)
+        timings.append(elapsed)
+        pool_opened = pool_opened or opened
+
+    median = statistics.median(timings)
+    print(f"import {args.module}: medyan {median:.1f}ms  min {min(timings):.1f}ms  "
+          f"max {max(timings):.1f}ms  ({args.repeat} süreç)")
+    print(f"import sırasında DB havuzu açıldı mı: {'EVET' if pool_opened else 'hayır'}")
+
+    print(f"\n{'kümülatif ms':>13} {'kendi ms':>9}  modül")
+    for cumulative_us, self_us, name in top_modules(args.module, env, args.top):
+        print(f"{cumulative_us / 1000:>13.1f} {self_us / 1000:>9.1f}  {name}")
+
+    if pool_opened or (args.max_ms is not None and median > args.max_ms):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Intent yönlendirici benchmark'ı: etiketli mesaj derlemi üzerinde doğruluk ve
+mesaj başına süre.
+
+Karşılaştırılanlar:
+  legacy       : eski detect_intent döngüsü (intent başına any(keyword in message))
+  router       : IntentRouter, widget'ın gönderdiği dil ile
+  router_auto  : IntentRouter, dil verilmeden (SMSParser.detect_language)
+  regex_alt    : aynı kelimelerden tek regex alternation (finditer, en öncelikli eşleşme)
+
+    python -m benchmarks.bench_intent --iterations 200
+"""
+import argparse
+import random
+import re
+import time
+from collections import Counter
+
+from chatbot_manager import INTENT_KEYWORDS, INTENT_ROUTER, REFERENCE_CODE_RE
+
+# (mesaj, widget dili, beklenen intent)
+LABELED = [
+    # Türkçe
+    ('kod istiyorum', 'tr', 'get_code'),
+    ('onay kodu lazım', 'tr', 'get_code'),
+    ('doğrulama kodumu gönderir misin', 'tr', 'get_code'),
+    ('trendyol kodu', 'tr', 'get_code'),
+    ('numara almak istiyorum', 'tr', 'get_code'),
+    ('adresim ne', 'tr', 'get_address'),
+    ('teslimat adresi', 'tr', 'get_address'),
+    ('adres al', 'tr', 'get_address'),
+    ('yardım', 'tr', 'help'),
+    ('yardim edermisin', 'tr', 'help'),
+    ('bu nasıl çalışıyor', 'tr', 'help'),
+    ('ne yapabilirsin', 'tr', 'help'),
+    ('merhaba', 'tr', 'unknown'),
+    ('teşekkürler', 'tr', 'unknown'),
+    ('iyi günler', 'tr', 'unknown'),
+    # Bulgarca
+    ('искам код', 'bg', 'get_code'),
+    ('потвърдителен код моля', 'bg', 'get_code'),
+    ('кодът не дойде', 'bg', 'get_code'),
+    ('адресът ми', 'bg', 'get_address'),
+    ('доставка до адрес', 'bg', 'get_address'),
+    ('помощ', 'bg', 'help'),
+    ('как работи това', 'bg', 'help'),
+    ('здравейте', 'bg', 'unknown'),
+    ('благодаря', 'bg', 'unknown'),
+    # İngilizce
+    ('i want my code', 'en', 'get_code'),
+    ('verification code please', 'en', 'get_code'),
+    ('get me the number', 'en', 'get_code'),
+    ('my address', 'en', 'get_address'),
+    ('delivery details', 'en', 'get_address'),
+    ('help', 'en', 'help'),
+    ('how does this work', 'en', 'help'),
+    ('what can you do', 'en', 'help'),
+    ('hello there', 'en', 'unknown'),
+    ('thanks a lot', 'en', 'unknown'),
+    # Widget dili ile mesaj dili farklı (ör. arayüz Türkçe, kullanıcı İngilizce yazıyor)
+    ('code please', 'tr', 'get_code'),
+    ('delivery address', 'tr', 'get_address'),
+    ('искам код', 'tr', 'get_code'),
+    ('помощ', 'en', 'help'),
+    ('kod istiyorum', 'en', 'get_code'),
+    ('adresim', 'bg', 'get_address'),
+    # Referans kodları
+    ('a1b2c3', 'tr', 'reference_code'),
+    ('qq12', 'tr', 'reference_code'),
+    ('x9y8z7', 'en', 'reference_code'),
+    ('get12a', 'en', 'reference_code'),
+    ('ab12', 'bg', 'reference_code'),
+]
+
+FILLERS = {
+    'tr': ('lütfen', 'acil', 'şimdi', 'hemen'),
+    'bg': ('моля', 'спешно', 'сега'),
+    'en': ('please', 'asap', 'now'),
+}
+
+
+def build_corpus(size, seed=11):
+    """Etiketli mesajlar + dolgu kelimeli türevler (referans kodları olduğu gibi kalır)"""
+    rng = random.Random(seed)
+    corpus = list(LABELED)
+    while len(corpus) < size:
+        message, language, intent = rng.choice(LABELED)
+        if intent != 'reference_code':
+            filler = rng.choice(FILLERS[language])
+            message = f'{message} {filler}' if rng.random() < 0.5 else f'{filler} {message}'
+        corpus.append((message, language, intent))
+    return corpus
+
+
+def legacy_detect_intent(message, language):
+    for intent, keywords_by_lang in INTENT_KEYWORDS.items():
+        if any(keyword in message for keyword in keywords_by_lang.get(language, ())):
+            return intent
+    if REFERENCE_CODE_RE.match(message):
+        return 'reference_code'
+    return 'unknown'
+
+
+def build_regex_alternation():
+    compiled = {}
+    languages = {language for by_language in INTENT_KEYWORDS.values() for language in by_language}
+    for language in languages:
+        groups = '|'.join(
+            f'(?P<i{index}>' + '|'.join(map(re.escape, by_language.get(language, ()) or ('\x00',))) + ')'
+            for index, by_language in enumerate(INTENT_KEYWORDS.values())
+        )
+        compiled[language] = re.compile(groups)
+    intents = tuple(INTENT_KEYWORDS)
+
+    def classify(message, language):
+        best = None
+        pattern = compiled.get(language)
+        if pattern is not None:
+            for match in pattern.finditer(message):
+                if best is None or match.lastindex < best:
+                    best = match.lastindex
+        if best is not None:
+            return intents[best - 1]
+        if REFERENCE_CODE_RE.match(message):
+            return 'reference_code'
+        return 'unknown'
+    return classify
+
+
+def evaluate(name, classify, corpus, iterations):
+    results = [classify(message, language) for message, language, _ in corpus]
+    correct = sum(1 for result, (_, _, expected) in zip(results, corpus) if result == expected)
+    misses = Counter((expected, result) for result, (_, _, expected) in zip(results, corpus) if result != expected)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for message, language, _ in corpus:
+            classify(message, language)
+    elapsed = time.perf_counter() - started
+    per_message_ns = elapsed / (iterations * len(corpus)) * 1e9
+    return name, correct / len(corpus), per_message_ns, misses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=2000, help='Derlem boyutu (etiketli + türev)')
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.size)
+    contenders = [
+        ('legacy', legacy_detect_intent),
+        ('router', INTENT_ROUTER.classify),
+        ('router_auto', lambda message, _language: INTENT_ROUTER.classify(message, None)),
+        ('regex_alt', build_regex_alternation()),
+    ]
+
+    print(f"derlem: {len(corpus)} mesaj ({len(LABELED)} etiketli + türevler)")
+    print(f"{'yöntem':<12} {'doğruluk':>9} {'ns/mesaj':>10} {'mesaj/sn':>12}  en sık hatalar (beklenen→bulunan)")
+    for name, classify in contenders:
+        name, accuracy, per_message_ns, misses = evaluate(name, classify, corpus, args.iterations)
+        top = ', '.join(f'{expected}→{result} x{count}' for (expected, result), count in misses.most_common(3))
+        print(f"{name:<12} {accuracy:>9.1%} {per_message_ns:>10.0f} {1e9 / per_message_ns:>12,.0f}  {top}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+SMSParser.parse_sms benchmark'ı.
+
+Tek geçişli derlenmiş motoru, eski sıralı `re.search` döngüleriyle
+(aşağıdaki legacy_parse_sms, önceki uygulamanın birebir kopyası)
+aynı corpus üzerinde karşılaştırır ve tüm sonuçların aynı olduğunu doğrular.
+
+    python -m benchmarks.bench_parser --size 3000 --rounds 5
+"""
+import argparse
+import re
+import time
+
+from sms_corpus import generate_corpus
+from sms_parser import SMSParser
+
+
+def legacy_parse_sms(sms_body, language='tr'):
+    """Önceki SMSParser.parse_sms uygulaması (referans davranış)"""
+    sms_lower = sms_body.lower()
+
+    def detect_site():
+        for site, keywords in SMSParser.SITE_KEYWORDS.items():
+            lang_keywords = keywords.get(language, keywords.get('en', []))
+            for keyword in lang_keywords:
+                if keyword in sms_lower:
+                    return site
+        return 'other'
+
+    def extract_ref_code():
+        patterns = SMSParser.REF_PATTERNS.get(language, SMSParser.REF_PATTERNS['en'])
+        for pattern in patterns:
+            match = re.search(pattern, sms_lower)
+            if match:
+                return match.group(1).upper()
+        return None
+
+    def extract_verification_code():
+        patterns = SMSParser.VERIFICATION_PATTERNS.get(language, SMSParser.VERIFICATION_PATTERNS['en'])
+        for pattern in patterns:
+            match = re.search(pattern, sms_lower)
+            if match:
+                return match.group(1)
+        return None
+
+    return {
+        'original_body': sms_body,
+        'raw': sms_body,
+        'language': language,
+        'site': detect_site(),
+        'ref_code': extract_ref_code(),
+        'verification_code': extract_verification_code(),
+        'code': extract_verification_code(),
+        'has_reference': bool(extract_ref_code())
+    }
+
+
+def _time(parse, corpus, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for body, language in corpus:
+            parse(body, language)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.size)
+    sms_parser = SMSParser()
+
+    # Doğruluk: her SMS için (ve corpus dışı dillerle) sonuçlar aynı olmalı
+    mismatches = 0
+    for body, language in corpus:
+        for lang in (language, 'tr', 'en', 'bg', 'de'):
+            if sms_parser.parse_sms(body, lang) != legacy_parse_sms(body, lang):
+                mismatches += 1
+    if mismatches:
+        raise SystemExit(f"❌ {mismatches} sonuç eski uygulamadan farklı")
+
+    legacy = _time(legacy_parse_sms, corpus, args.rounds)
+    current = _time(sms_parser.parse_sms, corpus, args.rounds)
+
+    print(f"corpus: {len(corpus)} SMS, en iyi {args.rounds} tur, sonuçlar birebir aynı")
+    print(f"{'uygulama':<10} {'toplam (ms)':>12} {'SMS başına (µs)':>16}")
+    for name, elapsed in (('legacy', legacy), ('compiled', current)):
+        print(f"{name:<10} {elapsed * 1000:>12.2f} {elapsed / len(corpus) * 1e6:>16.2f}")
+    print(f"hızlanma: {legacy / current:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Sunucu modları karşılaştırması: Flask (gunicorn gthread) ve ASGI (uvicorn + asyncpg).
+
+Her mod için:
+  1. Sunucu yerel Postgres'e (DATABASE_URL) karşı başlatılır.
+  2. --streams kadar widget /api/sms-stream ile SMS beklemeye başlar.
+  3. Bu bağlantılar açıkken --requests kadar /api/chatbot isteği
+     --concurrency eşzamanlılıkla gönderilir (menü, site, referans kodu karışık).
+  4. Bir gateway SMS'i gönderilir; kaç bekleyen istemcinin kodu aldığı sayılır.
+
+    python -m benchmarks.bench_serving --streams 1000 --requests 500 --concurrency 50
+
+Gthread modunda her açık akış bir thread tutar; thread'ler dolunca yeni
+istekler sıraya girer. ASGI modunda bekleyen akışlar yalnızca coroutine'dir.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.load import EventStream, Server, client_headers, http_request, latency_summary
+
+CHATBOT_MESSAGES = ('help', 'get_code', 'trendyol', 'hepsiburada', 'other', 'merhaba', 'a1b2c3', 'kod istiyorum')
+
+
+async def _open_streams(port, count, wait_seconds, open_timeout):
+    streams = [
+        EventStream(port, f'/api/sms-stream?site=n11&timeout={wait_seconds}', client_headers(index))
+        for index in range(count)
+    ]
+    results = await asyncio.gather(*(stream.open(open_timeout) for stream in streams), return_exceptions=True)
+    accepted = [stream for stream, result in zip(streams, results)
+                if not isinstance(result, BaseException) and stream.status == 200]
+    return streams, accepted
+
+
+async def _chatbot_load(port, total, concurrency, timeout):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            message = CHATBOT_MESSAGES[index % len(CHATBOT_MESSAGES)]
+            started = time.perf_counter()
+            try:
+                status, _ = await http_request(port, 'POST', '/api/chatbot', {'message': message},
+                                               client_headers(100000 + index), timeout)
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_summary(latencies, errors, time.perf_counter() - started)
+
+
+async def _fan_out(port, accepted, timeout):
+    body = f'N11 dogrulama kodunuz {random.randint(100000, 999999)}'
+    # Eski zaman damgası: sonraki koşuların akışları bu SMS'i önbellekten hemen almasın
+    timestamp = (datetime.utcnow() - timedelta(minutes=10)).isoformat() + 'Z'
+    try:
+        await http_request(port, 'POST', '/gateway-sms',
+                           {'from': 'N11', 'body': body, 'timestamp': timestamp},
+                           {'User-Agent': 'Shipliyo-SMS-Gateway'}, timeout)
+    except Exception:
+        return 0, None  # Sunucu gateway isteğini de kabul edemedi
+    started = time.perf_counter()
+    results = await asyncio.gather(*(stream.next_event(timeout) for stream in accepted), return_exceptions=True)
+    delivered = sum(1 for result in results if result == 'sms')
+    return delivered, round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _run_mode(mode, args):
+    with Server(mode, args.port, workers=args.workers, threads=args.threads,
+                env={'INGEST_MODE': 'async', 'SMS_EVENTS_BACKEND': 'postgres' if args.workers > 1 else 'memory'},
+                log_path=f'/tmp/bench_serving_{mode}.log'):
+        streams, accepted = await _open_streams(args.port, args.streams, args.stream_wait, args.open_timeout)
+        try:
+            chatbot = await _chatbot_load(args.port, args.requests, args.concurrency, args.request_timeout)
+            delivered, fan_out_ms = await _fan_out(args.port, accepted, args.request_timeout)
+        finally:
+            for stream in streams:
+                stream.close()
+    return {
+        'mode': mode,
+        'streams_open': len(accepted),
+        'sms_delivered': delivered,
+        'fan_out_ms': fan_out_ms,
+        **chatbot,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='flask,asgi')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=32, help='gthread worker başına thread')
+    parser.add_argument('--streams', type=int, default=1000)
+    parser.add_argument('--stream-wait', type=int, default=60)
+    parser.add_argument('--open-timeout', type=float, default=5)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--request-timeout', type=float, default=10)
+    args = parser.parse_args(argv)
+
+    rows = [asyncio.run(_run_mode(mode, args)) for mode in args.modes.split(',')]
+
+    columns = ('mode', 'streams_open', 'sms_delivered', 'fan_out_ms', 'ok', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms')
+    print(' '.join(f'{column:>13}' for column in columns))
+    for row in rows:
+        print(' '.join(f'{str(row[column]):>13}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Yük testleri için ortak yardımcılar: bağımlılıksız asyncio HTTP istemcisi,
+sunucu başlatma (Flask/gunicorn veya ASGI/uvicorn) ve gecikme istatistikleri.
+"""
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_COMMANDS = {
+    # Procfile ile aynı worker sınıfı; süreç/thread sayısı parametre
+    'flask': lambda port, workers, threads: [
+        sys.executable, '-m', 'gunicorn', 'app:app', '--worker-class', 'gthread',
+        '--workers', str(workers), '--threads', str(threads), '--bind', f'127.0.0.1:{port}',
+    ],
+    'asgi': lambda port, workers, threads: [
+        sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(workers), '--log-level', 'warning',
+    ],
+}
+
+
+class Server:
+    """Test süresince arka planda çalışan uygulama süreci"""
+
+    def __init__(self, mode: str, port: int, workers: int = 1, threads: int = 32,
+                 env: Optional[Dict[str, str]] = None, log_path: Optional[str] = None):
+        self.mode = mode
+        self.port = port
+        self.command = SERVER_COMMANDS[mode](port, workers, threads)
+        self.env = dict(os.environ, **(env or {}))
+        self.log_path = log_path or os.devnull
+        self.process = None
+
+    def __enter__(self):
+        self._log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(self.command, cwd=ROOT, env=self.env,
+                                        stdout=self._log, stderr=subprocess.STDOUT)
+        self.wait_ready()
+        return self
+
+    def wait_ready(self, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.mode} sunucusu başlamadan kapandı (log: {self.log_path})")
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{self.port}/health', timeout=1).read()
+                return
+            except Exception:
+                time.sleep(0.2)
+        raise RuntimeError(f"{self.mode} sunucusu {timeout} sn içinde hazır olmadı")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+
+
+# --- HTTP istemcisi ---
+def _request_bytes(method: str, path: str, port: int, body: Optional[bytes], headers: Dict[str, str]) -> bytes:
+    lines = [f'{method} {path} HTTP/1.1', f'Host: 127.0.0.1:{port}', 'Connection: close']
+    for key, value in headers.items():
+        lines.append(f'{key}: {value}')
+    if body is not None:
+        lines.append(f'Content-Length: {len(body)}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+
+def _dechunk(data: bytes) -> bytes:
+    out = []
+    while data:
+        size_line, _, rest = data.partition(b'\r\n')
+        size = int(size_line.split(b';')[0] or b'0', 16)
+        if size == 0:
+            break
+        out.append(rest[:size])
+        data = rest[size + 2:]
+    return b''.join(out)
+
+
+async def _read_head(reader) -> Tuple[int, Dict[str, str]]:
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    return status, headers
+
+
+async def http_request(port: int, method: str, path: str, payload=None,
+                       headers: Optional[Dict[str, str]] = None, timeout: float = 10) -> Tuple[int, bytes]:
+    """Tek istek (Connection: close). Zaman aşımında asyncio.TimeoutError fırlatır."""
+    headers = dict(headers or {})
+    body = None
+    if payload is not None:
+        body = json.dumps(payload).encode('utf-8')
+        headers.setdefault('Content-Type', 'application/json')
+
+    async def run():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(_request_bytes(method, path, port, body, headers))
+            await writer.drain()
+            status, response_headers = await _read_head(reader)
+            data = await reader.read()
+            if response_headers.get('transfer-encoding') == 'chunked':
+                data = _dechunk(data)
+            return status, data
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(run(), timeout)
+
+
+class EventStream:
+    """Açık tutulan SSE bağlantısı (bekleyen widget)"""
+
+    def __init__(self, port: int, path: str, headers: Optional[Dict[str, str]] = None):
+        self.port = port
+        self.path = path
+        self.headers = headers or {}
+        self.status = None
+        self.reader = None
+        self.writer = None
+
+    async def open(self, timeout: float):
+        async def run():
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+            self.writer.write(_request_bytes('GET', self.path, self.port, None, self.headers))
+            await self.writer.drain()
+            self.status, _ = await _read_head(self.reader)
+        await asyncio.wait_for(run(), timeout)
+
+    async def next_event(self, timeout: float) -> Optional[str]:
+        """Sıradaki 'event:' adını döndürür (ping yorumları atlanır)"""
+        async def run():
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    return None
+                text = line.decode('utf-8', 'replace')
+                if 'event:' in text:
+                    return text.split('event:', 1)[1].strip()
+        return await asyncio.wait_for(run(), timeout)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# --- İstatistik ---
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return float('nan')
+    # En yakın sıra (nearest-rank) yöntemi
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    """Gecikmeler saniye cinsinden; özet milisaniye"""
+    values = sorted(latencies)
+    return {
+        'requests': len(values) + errors,
+        'ok': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else float('nan'),
+    }
+
+
+def client_headers(index: int) -> Dict[str, str]:
+    """Her sanal istemciye ayrı IP: hız sınırı gerçek kullanıcılar gibi istemci başına işler"""
+    return {'X-Forwarded-For': f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'}
@@ -0,0 +1,302 @@
+"""
+Tekrarlanabilir yük testi: kaydedilmiş (veya üretilmiş) trafiği uygulamaya
+karşı oynatır, route başına p50/p95/p99 gecikme ve throughput raporlar ve
+sonucu regresyon karşılaştırması için JSON olarak saklar.
+
+Trafik kaydı JSONL'dir (satır başına bir istek):
+    {"at": 0.125, "tag": "bubble_site", "method": "POST", "path": "/api/chatbot",
+     "client": 17, "body": {"message": "trendyol"}}
+  - at     : kaydın başından itibaren saniye (--speed ile ölçeklenir; 0 = beklemeden)
+  - tag    : raporda gruplanan istek türü
+  - client : sanal istemci no (ayrı X-Forwarded-For; hız sınırı istemci başına işler)
+  - body içindeki "{{now}}" oynatma anındaki UTC zamanla değiştirilir, böylece
+    gateway SMS'leri her koşuda yenidir (content_hash tekrarına düşmez).
+
+Örnekler:
+    # Sentetik kayıt üret (gateway patlamaları, baloncuk tıklamaları, referans aramaları)
+    python -m benchmarks.loadtest record --duration 30 --rps 80 --out /tmp/traffic.jsonl
+
+    # Flask modunu başlatıp kaydı oynat, sonucu sakla
+    python -m benchmarks.loadtest run --traffic /tmp/traffic.jsonl --mode flask
+
+    # Önceki sonuçla karşılaştır (p95 %20'den fazla kötüleşirse çıkış kodu 1)
+    python -m benchmarks.loadtest run --traffic /tmp/traffic.jsonl --mode asgi \\
+        --compare benchmarks/results/<önceki>.json --max-regression 20
+
+Gerçek bir Postgres gerekir: başlatılan sunucu DATABASE_URL'deki veritabanına
+bağlanır (şema `python manage.py migrate` ile kurulmuş olmalıdır) ve gateway
+SMS'lerini oraya yazar; sahte/bellek içi bir veritabanı sağlanmaz. DATABASE_URL
+yoksa `run` başlamadan çıkar. --port ile zaten çalışan bir sunucu da
+hedeflenebilir (--mode none). Sonuçlar benchmarks/results/ altına yazılır
+(git'e eklenmez; karşılaştırma için saklanacak sonuç elle kopyalanır).
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.load import ROOT, Server, client_headers, http_request, latency_summary
+from database import get_database_url
+from sms_corpus import generate_corpus
+from sms_parser import SMSParser
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+GATEWAY_HEADERS = {'User-Agent': 'Shipliyo-SMS-Gateway'}
+GATEWAY_DEVICES = 20          # gateway istemcileri (telefonlar) ayrı IP'lerden gelir
+GATEWAY_CLIENT_BASE = 50000   # sanal istemci numaralarında gateway aralığı
+
+SITE_BUBBLES = ('trendyol', 'hepsiburada', 'n11', 'other')
+MENU_MESSAGES = ('get_code', 'help', 'merhaba', 'kod istiyorum', 'get_address')
+
+
+# --- Kayıt üretimi ---
+def generate_traffic(duration: float, rps: float, seed: int = 7, burst_every: float = 2.0,
+                     burst_size: int = 15, batch_every: float = 10.0, batch_size: int = 50) -> List[Dict]:
+    """
+    Gerçekçi karışım: her `burst_every` saniyede bir gateway SMS patlaması,
+    arada widget trafiği (menü, site baloncuğu, daha önce gelmiş SMS'lerin
+    referans kodlarıyla arama) ve ara sıra yeniden bağlanan gateway'in toplu gönderimi.
+    """
+    rng = random.Random(seed)
+    parser = SMSParser()
+    corpus = iter(generate_corpus(size=int(duration * rps) + 1000, seed=seed))
+    known_refs = []   # (gönderim zamanı, referans kodu)
+    events = []
+
+    def sms_body(device, sent_at):
+        body, language = next(corpus)
+        ref = parser.parse_sms(body, language)['ref_code']
+        if ref:
+            known_refs.append((sent_at, ref.lower()))
+        return {'from': f'GW{device}', 'body': body, 'timestamp': '{{now}}', 'deviceId': f'device-{device}'}
+
+    # Gateway patlamaları
+    at = 0.0
+    while at < duration:
+        device = rng.randrange(GATEWAY_DEVICES)
+        for index in range(burst_size):
+            events.append({'at': round(at + index * 0.01, 3), 'tag': 'gateway_single', 'method': 'POST',
+                           'path': '/gateway-sms', 'client': GATEWAY_CLIENT_BASE + device,
+                           'headers': GATEWAY_HEADERS, 'body': sms_body(device, at)})
+        at += burst_every
+
+    # Toplu gönderimler
+    at = batch_every / 2
+    while at < duration:
+        device = rng.randrange(GATEWAY_DEVICES)
+        events.append({'at': round(at, 3), 'tag': 'gateway_batch', 'method': 'POST',
+                       'path': '/gateway-sms/batch', 'client': GATEWAY_CLIENT_BASE + device,
+                       'headers': GATEWAY_HEADERS, 'body': [sms_body(device, at) for _ in range(batch_size)]})
+        at += batch_every
+
+    # Widget trafiği (Poisson varış); referans aramaları yalnızca o ana kadar gelmiş SMS'leri sorar
+    known_refs.sort()
+    at = 0.0
+    while True:
+        at += rng.expovariate(rps)
+        if at >= duration:
+            break
+        roll = rng.random()
+        if roll < 0.45:
+            tag, message = 'bubble_site', rng.choice(SITE_BUBBLES)
+        elif roll < 0.75 and known_refs and known_refs[0][0] + 1 < at:
+            arrived = bisect.bisect_left(known_refs, (at - 1,))
+            tag, message = 'reference_lookup', known_refs[rng.randrange(arrived)][1]
+        else:
+            tag, message = 'menu', rng.choice(MENU_MESSAGES)
+        events.append({'at': round(at, 3), 'tag': tag, 'method': 'POST', 'path': '/api/chatbot',
+                       'client': rng.randrange(5000), 'body': {'message': message}})
+
+    events.sort(key=lambda event: event['at'])
+    return events
+
+
+def load_traffic(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --- Oynatma ---
+def _fill_now(value, now: str):
+    if value == '{{now}}':
+        return now
+    if isinstance(value, dict):
+        return {key: _fill_now(item, now) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill_now(item, now) for item in value]
+    return value
+
+
+async def replay(port: int, events: List[Dict], speed: float, concurrency: int, timeout: float) -> Dict:
+    """
+    speed > 0: istekler kayıttaki zamanlarında (at / speed) gönderilir (açık döngü);
+    sunucu yavaşlasa da gelen yük azalmaz. speed = 0: `concurrency` worker ile
+    beklemeden (kapalı döngü) en yüksek throughput ölçülür.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    statuses = defaultdict(lambda: defaultdict(int))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(event):
+        tag = event.get('tag', event['path'])
+        headers = dict(client_headers(event.get('client', 0)), **event.get('headers', {}))
+        body = _fill_now(event.get('body'), datetime.utcnow().isoformat() + 'Z')
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status, _ = await http_request(port, event['method'], event['path'], body, headers, timeout)
+            except Exception:
+                errors[tag] += 1
+                statuses[tag]['timeout'] += 1
+                return
+            statuses[tag][str(status)] += 1
+            if status < 400:
+                latencies[tag].append(time.perf_counter() - started)
+            else:
+                errors[tag] += 1
+
+    started = time.perf_counter()
+    if speed > 0:
+        tasks = []
+        for event in events:
+            delay = event.get('at', 0) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(event)))
+        await asyncio.gather(*tasks)
+    else:
+        await asyncio.gather(*(send(event) for event in events))
+    elapsed = time.perf_counter() - started
+
+    routes = {tag: dict(latency_summary(latencies[tag], errors[tag], elapsed), statuses=dict(statuses[tag]))
+              for tag in sorted(set(latencies) | set(errors))}
+    all_latencies = [value for values in latencies.values() for value in values]
+    routes['_all'] = latency_summary(all_latencies, sum(errors.values()), elapsed)
+    return {'elapsed_seconds': round(elapsed, 2), 'routes': routes}
+
+
+# --- Sonuçlar ---
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def save_result(result: Dict, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(out_dir, f"{stamp}-{result['mode']}-{result['revision']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def print_report(result: Dict):
+    columns = ('ok', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+    print(f"mod={result['mode']} revizyon={result['revision']} süre={result['elapsed_seconds']}s")
+    print(f"{'route':<18}" + ''.join(f'{column:>10}' for column in columns))
+    for tag, summary in result['routes'].items():
+        print(f'{tag:<18}' + ''.join(f'{summary[column]:>10}' for column in columns))
+
+
+def compare(result: Dict, baseline: Dict, max_regression: float) -> bool:
+    """p95 gecikmesi baseline'a göre max_regression yüzdesinden fazla kötüleşen route varsa False"""
+    ok = True
+    print(f"\nKarşılaştırma: {baseline.get('revision')} → {result['revision']} (p95)")
+    for tag, summary in result['routes'].items():
+        before = baseline.get('routes', {}).get(tag)
+        if not before or not before.get('p95_ms') or before['p95_ms'] != before['p95_ms']:
+            continue
+        change = (summary['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+        marker = ''
+        if change > max_regression:
+            marker = '  ⚠️ REGRESYON'
+            ok = False
+        print(f"{tag:<18}{before['p95_ms']:>10} → {summary['p95_ms']:>10} ms  ({change:+.1f}%){marker}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record = sub.add_parser('record', help='Sentetik trafik kaydı üretir')
+    record.add_argument('--duration', type=float, default=30)
+    record.add_argument('--rps', type=float, default=80, help='Widget isteği / sn')
+    record.add_argument('--seed', type=int, default=7)
+    record.add_argument('--out', required=True)
+
+    run = sub.add_parser('run', help='Trafiği oynatır ve sonuçları kaydeder')
+    run.add_argument('--traffic', help='JSONL trafik kaydı (verilmezse varsayılan karışım üretilir)')
+    run.add_argument('--mode', choices=('flask', 'asgi', 'none'), default='flask')
+    run.add_argument('--port', type=int, default=8766)
+    run.add_argument('--workers', type=int, default=1)
+    run.add_argument('--threads', type=int, default=32)
+    run.add_argument('--speed', type=float, default=1.0, help='Kayıt hızı çarpanı; 0 = beklemeden')
+    run.add_argument('--concurrency', type=int, default=200)
+    run.add_argument('--timeout', type=float, default=10)
+    run.add_argument('--out-dir', default=RESULTS_DIR)
+    run.add_argument('--compare', help='Karşılaştırılacak önceki sonuç JSON dosyası')
+    run.add_argument('--max-regression', type=float, default=20, help='İzin verilen p95 artışı (%%)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        events = generate_traffic(args.duration, args.rps, args.seed)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        print(f"✅ {len(events)} istek yazıldı: {args.out}")
+        return 0
+
+    if args.mode != 'none' and not get_database_url()[0]:
+        print("❌ DATABASE_URL gerekli: yük testi gerçek bir Postgres'e karşı çalışır")
+        return 2
+
+    events = load_traffic(args.traffic) if args.traffic else generate_traffic(30, 80)
+
+    async def run_against_server():
+        return await replay(args.port, events, args.speed, args.concurrency, args.timeout)
+
+    if args.mode == 'none':
+        measured = asyncio.run(run_against_server())
+    else:
+        with Server(args.mode, args.port, workers=args.workers, threads=args.threads,
+                    log_path=f'/tmp/loadtest_{args.mode}.log'):
+            measured = asyncio.run(run_against_server())
+
+    result = {
+        'mode': args.mode,
+        'revision': _git_revision(),
+        'recorded_at': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'traffic': args.traffic or 'generated:30s@80rps',
+        'requests': len(events),
+        'speed': args.speed,
+        'workers': args.workers,
+        'threads': args.threads,
+        **measured,
+    }
+    print_report(result)
+    print(f"\n💾 Sonuç: {save_result(result, args.out_dir)}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,177 +1,219 @@
-import re
+import hashlib
+import json
 import os
-import time
-from sms_parser import SMSParser
+import re
+import threading
+from types import MappingProxyType
+from sms_parser import SMSParser, active_rules
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import psycopg2
-from psycopg2 import OperationalError
-from response_manager import ResponseManager
+from typing import Dict, List, NamedTuple, Optional
+from database import get_db_connection, release_db_connection
+from intent_router import IntentRouter
+from logs import get_logger
+from metrics import DB_QUERY_SECONDS
+from response_manager import RESPONSES, ResponseManager
+from sms_cache import recent_sms_cache
+
+log = get_logger('chatbot')
+
+# Intent keyword mapping - modül yüklenirken bir kez kurulur, her mesajda yeniden oluşturulmaz
+INTENT_KEYWORDS = MappingProxyType({
+    'get_code': MappingProxyType({
+        'tr': ('kod', 'kodu', 'onay', 'doğrulama', 'numara', 'almak', 'istiyorum'),
+        'bg': ('код', 'кодът', 'кодове', 'потвърдителен', 'искам', 'получи'),
+        'en': ('code', 'verification', 'number', 'want', 'get')
+    }),
+    'get_address': MappingProxyType({
+        'tr': ('adres', 'adresi', 'teslimat', 'adresim', 'adres al'),
+        'bg': ('адрес', 'адресът', 'доставка', 'адреса ми', 'получи адрес'),
+        'en': ('address', 'delivery', 'my address', 'get address')
+    }),
+    'help': MappingProxyType({
+        'tr': ('yardım', 'yardim', 'help', 'nasıl', 'ne yapabilir'),
+        'bg': ('помощ', 'помогнете', 'help', 'как', 'какво'),
+        'en': ('help', 'yardım', 'how', 'what can you do')
+    })
+})
+
+REFERENCE_CODE_RE = re.compile(r'^[a-zA-Z0-9]{4,6}$')
+
+# Widget baloncuklarının gönderdiği sabit payload'lar: tek sözlük araması ile eyleme gider.
+# Site payload'ları aktif kural paketine göre değişir (bkz. site_payloads)
+PAYLOAD_ACTIONS = MappingProxyType({
+    'get_code': 'get_code',
+    'help': 'help',
+    'get_address': 'get_address',
+})
+
+# Serbest metin için intent yönlendirici (dil verilmezse SMSParser.detect_language ile tespit)
+INTENT_ROUTER = IntentRouter(INTENT_KEYWORDS, REFERENCE_CODE_RE, SMSParser().detect_language)
+
+
+
+def site_payloads() -> frozenset:
+    """Site baloncuklarının payload'ları: aktif paketteki baloncuklu siteler + 'other'"""
+    return active_rules().site_payloads
+
+
+def main_sites() -> tuple:
+    """Kendi baloncuğu olan siteler; 'other' baloncuğu bunların dışındaki tüm SMS'leri kapsar"""
+    return active_rules().bubble_sites
+
+
+def site_title(site: Optional[str]) -> str:
+    """Yanıtlarda gösterilen site adı (örn. 'ciceksepeti' -> 'Çiçeksepeti')"""
+    return active_rules().site_title(site)
+
+# Okuma sorgularının döndürdüğü sütunlar (bkz. _row_to_parsed)
+SMS_COLUMNS = "body, timestamp, site, verification_code, ref_code, language"
+
+# Okuma sorguları - her biri create_tables'daki bir index'e karşılık gelir.
+# check_query_plans() bu sorgularda sequential scan olmadığını doğrular.
+# Site sorguları parse alanları doldurulmamış eski satırları (site IS NULL) da
+# getirir; bunların sitesi okumada bulunup recent_sms_reply'da süzülür.
+RECENT_SMS_BY_SITE_SQL = (  # idx_sms_messages_site_timestamp
+    f"SELECT {SMS_COLUMNS} FROM sms_messages "
+    "WHERE (site = %s OR site IS NULL) AND timestamp >= %s ORDER BY timestamp DESC LIMIT 10"
+)
+RECENT_SMS_OTHER_SQL = (  # idx_sms_messages_timestamp (+ site filtresi)
+    f"SELECT {SMS_COLUMNS} FROM sms_messages "
+    "WHERE timestamp >= %s AND (site <> ALL(%s) OR site IS NULL) ORDER BY timestamp DESC LIMIT 10"
+)
+SMS_BY_REF_CODE_SQL = (  # idx_sms_messages_ref_code_timestamp
+    f"SELECT {SMS_COLUMNS} FROM sms_messages "
+    "WHERE ref_code = %s AND timestamp >= %s ORDER BY timestamp DESC LIMIT 1"
+)
+SMS_BY_BODY_SQL = (  # idx_sms_messages_body_trgm (pg_trgm yoksa idx_sms_messages_timestamp)
+    f"SELECT {SMS_COLUMNS} FROM sms_messages "
+    "WHERE body ILIKE %s AND timestamp >= %s ORDER BY timestamp DESC LIMIT 1"
+)
+
+# Açılışta önbelleği dolduran sorgu (idx_sms_messages_timestamp)
+WARM_SMS_SQL = f"SELECT {SMS_COLUMNS} FROM sms_messages WHERE timestamp >= %s ORDER BY timestamp"
+
+ADDRESS_RESPONSES = MappingProxyType({
+    'tr': "Teslimat adresiniz için lütfen telefon numaranızın son 9 hanesini girin (örn: 111222333)",
+    'en': "For your delivery address, please enter the last 9 digits of your phone number (eg: 111222333)", 
+    'bg': "За вашия адрес за доставка, моля въведете последните 9 цифри от телефонния си номер (напр: 111222333)"
+})
+
+# Yalnızca dile bağlı (DB gerektirmeyen) yanıtlar; açılışta dil başına bir kez serileştirilir
+STATIC_ACTIONS = ('get_code', 'help', 'get_address', 'main_menu')
+
+# Statik yanıtlar yalnızca deploy ile değişir; süre dolunca ETag ile yeniden doğrulanır
+STATIC_REPLY_MAX_AGE = int(os.environ.get('STATIC_REPLY_MAX_AGE', 3600))
+
+
+class StaticReply(NamedTuple):
+    body: bytes     # JSON gövdesi (bir kez serileştirilmiş)
+    etag: str       # tırnaklı, güçlü ETag
+    cache_control: str
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match başlığı (virgüllü liste, W/ önekli veya '*') verilen ETag'i kapsıyor mu"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.replace('W/', '', 1) == etag:
+            return True
+    return False
+
 
 class ChatbotManager:
     def __init__(self):
         self.sms_parser = SMSParser()
         self.response_manager = ResponseManager()
+        self.sms_cache = recent_sms_cache
+        # Dil başına tablolar açılışta bir kez kurulur: statik yanıtlar burada,
+        # intent tabloları INTENT_ROUTER'da, parse motorları aktif kural paketinde
+        # (active_rules() ilk çağrıda paketin tüm dillerini derler)
+        self._static_lock = threading.Lock()
+        self._static_rules = active_rules()
+        self.static_replies = self._build_static_replies()
+
+    def _build_static_replies(self) -> Dict[tuple, StaticReply]:
+        replies = {}
+        for language in RESPONSES:
+            for action in STATIC_ACTIONS:
+                body = json.dumps(self.static_reply(action, language), ensure_ascii=False,
+                                  separators=(',', ':')).encode('utf-8')
+                replies[(action, language)] = StaticReply(
+                    body,
+                    '"%s"' % hashlib.sha1(body).hexdigest()[:20],
+                    f'public, max-age={STATIC_REPLY_MAX_AGE}',
+                )
+        return MappingProxyType(replies)
+
+    def cached_static_reply(self, action: str, language: str) -> StaticReply:
+        """Önceden serileştirilmiş yanıt; bilinmeyen diller ResponseManager gibi 'tr'ye düşer"""
+        if language not in RESPONSES:
+            language = 'tr'
+        if self._static_rules is not active_rules():
+            self._refresh_static_replies()
+        return self.static_replies[(action, language)]
+
+    def _refresh_static_replies(self):
+        """Kural paketi değişti: site baloncukları (ve ETag'leri) yeni paketle yeniden kurulur"""
+        with self._static_lock:
+            rules = active_rules()
+            if self._static_rules is not rules:
+                self.static_replies = self._build_static_replies()
+                self._static_rules = rules
 
     def get_db_connection(self):
         """
-        PostgreSQL bağlantısı oluştur (Akıllı Versiyon)
-        Önce Private (İç) ağı dener, bulamazsa Public (Dış) ağı dener.
+        PostgreSQL bağlantısı döndürür.
+        Bağlantılar süreç geneli havuzdan gelir (bkz. database.py): URL tespiti,
+        retry ve 'SET TIME ZONE' her fiziksel bağlantıda yalnızca bir kez yapılır.
+        İşi biten bağlantı release_db_connection() ile havuza iade edilmelidir.
         """
-        
-        # 1. ADIM: Doğru URL'i Tespit Etme Stratejisi
-        db_url = None
-        connection_source = "Unknown"
-
-        # Seçenek A: Direkt Private URL var mı?
-        if os.environ.get('DATABASE_PRIVATE_URL'):
-            db_url = os.environ.get('DATABASE_PRIVATE_URL')
-            connection_source = "DATABASE_PRIVATE_URL (Gizli Ağ)"
-        
-        # Seçenek B: Railway'in otomatik verdiği PG değişkenleri var mı? (En Sağlıklısı)
-        elif os.environ.get('PGHOST') and 'ballast' not in os.environ.get('PGHOST', ''):
-            try:
-                # PG değişkenlerinden URL oluştur
-                pghost = os.environ.get('PGHOST')
-                pguser = os.environ.get('PGUSER')
-                pgpass = os.environ.get('PGPASSWORD')
-                pgport = os.environ.get('PGPORT')
-                pgdb = os.environ.get('PGDATABASE')
-                
-                if pghost and pguser and pgdb:
-                    db_url = f"postgres://{pguser}:{pgpass}@{pghost}:{pgport}/{pgdb}"
-                    connection_source = "PG Variables (Otomatik İç Ağ)"
-            except Exception as e:
-                print(f"⚠️ PG Değişkenleri ile URL oluşturulamadı: {e}")
-
-        # Seçenek C: Hiçbiri yoksa, eldeki (muhtemelen Public/Ballast) URL'i kullan
-        if not db_url:
-            db_url = os.environ.get('DATABASE_URL')
-            connection_source = "DATABASE_URL (Mevcut Ayar)"
-
-        if not db_url:
-            print("❌ HATA: Hiçbir veritabanı adresi bulunamadı!")
-            self._print_debug_vars() # Hangi değişkenler var görelim
-            return None
-        
-        # Eğer hala 'ballast' kullanıyorsak uyarı ver
-        if 'ballast' in db_url:
-            print(f"⚠️ UYARI: Hala Public Proxy ({connection_source}) kullanılıyor. Bağlantı kopabilir.")
-        else:
-            print(f"✅ İYİ HABER: Internal Network ({connection_source}) kullanılıyor.")
-
-        # SSL modunu ayarla
-        if "sslmode" not in db_url:
-            symbol = "&" if "?" in db_url else "?"
-            db_url += f"{symbol}sslmode=require"
-
-        # 2. ADIM: Bağlantı Denemesi (Retry Mekanizması)
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                conn = psycopg2.connect(
-                    db_url,
-                    keepalives=1,
-                    keepalives_idle=30,
-                    keepalives_interval=10,
-                    keepalives_count=5,
-                    connect_timeout=10
-                )
-                
-                # TIMEZONE SENKRONİZASYONU
-                cur = conn.cursor()
-                cur.execute("SET TIME ZONE 'Europe/Istanbul'")
-                cur.close()
-                conn.commit()
-                
-                return conn
-            
-            except OperationalError as e:
-                print(f"⚠️ Chatbot DB Bağlantı hatası (Deneme {attempt+1}/{max_retries}): {e}")
-                print(f"🔗 Denenen Kaynak: {connection_source}")
-                time.sleep(1)
-            except Exception as e:
-                print(f"❌ Kritik PostgreSQL bağlantı hatası: {e}")
-                return None
-        
-        # 3. ADIM: Tüm denemeler başarısızsa Dedektif Modunu çalıştır
-        print("❌ Chatbot: Veritabanına bağlanılamadı.")
-        self._print_debug_vars()
-        return None
-
-    def _print_debug_vars(self):
-        """Hata anında ortamdaki veritabanı değişkenlerini (değerlerini gizleyerek) listeler"""
-        print("🔍 --- DEDEKTİF MODU: Mevcut Çevre Değişkenleri ---")
-        try:
-            keys = [k for k in os.environ.keys() if 'PG' in k or 'DB' in k or 'DATABASE' in k or 'RAILWAY' in k]
-            if not keys:
-                print("⚠️ Hiçbir veritabanı değişkeni (PG*, DATABASE*) bulunamadı!")
-            for k in keys:
-                val = os.environ[k]
-                # Değerin içeriğini gizle ama ipucu ver (örn: ballast var mı?)
-                hint = "Private/Internal IP"
-                if "ballast" in val: hint = "PUBLIC PROXY (Sorunlu)"
-                elif val.startswith("postgres://"): hint = "Connection String"
-                print(f"   🔑 {k}: [{hint}]")
-            print("------------------------------------------------")
-        except:
-            pass
-
-    def detect_intent(self, message: str, language: str) -> str:
-        """Mesajın intent'ini tespit eder"""
-        message_lower = message.lower().strip()
-        
-        # Intent keyword mapping
-        intent_keywords = {
-            'get_code': {
-                'tr': ['kod', 'kodu', 'onay', 'doğrulama', 'numara', 'almak', 'istiyorum'],
-                'bg': ['код', 'кодът', 'кодове', 'потвърдителен', 'искам', 'получи'],
-                'en': ['code', 'verification', 'number', 'want', 'get']
-            },
-            'get_address': {
-                'tr': ['adres', 'adresi', 'teslimat', 'adresim', 'adres al'],
-                'bg': ['адрес', 'адресът', 'доставка', 'адреса ми', 'получи адрес'],
-                'en': ['address', 'delivery', 'my address', 'get address']
-            },
-            'help': {
-                'tr': ['yardım', 'yardim', 'help', 'nasıl', 'ne yapabilir'],
-                'bg': ['помощ', 'помогнете', 'help', 'как', 'какво'],
-                'en': ['help', 'yardım', 'how', 'what can you do']
-            }
-        }
-        
-        for intent, keywords_by_lang in intent_keywords.items():
-            keywords = keywords_by_lang.get(language, [])
-            if any(keyword in message_lower for keyword in keywords):
-                return intent
-        
-        if re.match(r'^[a-zA-Z0-9]{4,6}$', message_lower):
-            return 'reference_code'
-        
-        return 'unknown'
+        return get_db_connection()
+
+    def detect_intent(self, message: str, language: Optional[str]) -> str:
+        """Mesajın intent'ini tespit eder (bkz. intent_router.IntentRouter)"""
+        return INTENT_ROUTER.classify(message.lower().strip(), language)
 
     def handle_message(self, message: str, session_id: str, language: str = 'tr') -> Dict:
         """Gelen mesajı işler ve uygun yanıtı döndürür"""
         message = message.strip().lower()
-        
-        if message == 'get_code':
-            return self._handle_site_selection_bubbles(language)
-        elif message == 'help':
-            return self._handle_help_request(language)
-        elif message in ['trendyol', 'hepsiburada', 'n11', 'other']:
+        action = self.resolve_action(message, language)
+        if action in STATIC_ACTIONS:
+            return self.static_reply(action, language)
+        return self.lookup_reply(message, action, language)
+
+    def lookup_reply(self, message: str, action: str, language: str) -> Dict:
+        """SMS araması gerektiren eylemler ('site', 'reference_code'); mesaj normalize edilmiş olmalı"""
+        if action == 'site':
             return self.get_recent_sms_by_site(message, 120, language)
-        elif message == 'get_address':
-            return self._handle_address_request(language)
+        return self._handle_reference_code(message, language)
+
+    def resolve_action(self, message: str, language: str) -> str:
+        """
+        Normalize edilmiş mesajın hangi işleyiciye gideceğini belirler.
+        'site' ve 'reference_code' SMS araması gerektirir; diğerleri static_reply ile yanıtlanır.
+        """
+        action = PAYLOAD_ACTIONS.get(message)
+        if action is not None:
+            return action
+        if message in site_payloads():
+            return 'site'
 
-        intent = self.detect_intent(message, language)
-        if intent == 'reference_code':
-            return self._handle_reference_code(message, language)
-        elif intent == 'get_code':
+        intent = INTENT_ROUTER.classify(message, language)
+        if intent in ('reference_code', 'get_code', 'help'):
+            return intent
+        return 'main_menu'
+
+    def static_reply(self, action: str, language: str) -> Dict:
+        """DB gerektirmeyen yanıtlar"""
+        if action == 'get_code':
             return self._handle_site_selection_bubbles(language)
-        elif intent == 'help':
+        elif action == 'help':
             return self._handle_help_request(language)
-        else:
-            return self._handle_main_menu(language)
+        elif action == 'get_address':
+            return self._handle_address_request(language)
+        return self._handle_main_menu(language)
     
     def _handle_main_menu(self, language: str) -> Dict:
         return {
@@ -193,55 +235,81 @@ class ChatbotManager:
         """Referans kodu ile SMS arama"""
         conn = None
         try:
-            conn = self.get_db_connection()
-            if not conn:
-                raise Exception("DB Bağlantısı yok")
-
-            time_threshold = datetime.now() - timedelta(hours=2)
-            cur = conn.cursor()
-            
-            cur.execute(
-                "SELECT * FROM sms_messages WHERE body ILIKE %s AND timestamp >= %s ORDER BY timestamp DESC LIMIT 1",
-                (f'%{ref_code}%', time_threshold)
-            )
-            found_sms = cur.fetchone()
-            cur.close()
-            
-            if found_sms:
-                sms_dict = {
-                    'body': found_sms[2],  # body sütunu
-                    'timestamp': found_sms[3]  # timestamp sütunu
-                }
-                parsed_sms = self.sms_parser.parse_sms(sms_dict['body'], language)
-                return {
-                    "success": True,
-                    "response": self.response_manager.get_response('reference_found', language).format(
-                        site=parsed_sms['site'].title(),
-                        code=parsed_sms['verification_code']
-                    ),
-                    "response_type": "direct",
-                    "data": parsed_sms,
-                    "source": "postgresql"
-                }
-            
-            return {
-                "success": False,
-                "response": self.response_manager.get_response('no_reference', language),
-                "response_type": "direct",
-                "source": "postgresql"
-            }
+            # SMS zamanları UTC saklanır
+            time_threshold = reference_threshold()
+            source = "memory"
+
+            # Önce bellekteki son SMS penceresi (ingest sırasında çıkarılmış ref_code)
+            found_sms = self.cached_reference(ref_code, time_threshold)
+            if not found_sms:
+                source = "postgresql"
+                conn = self.get_db_connection()
+                if not conn:
+                    raise Exception("DB Bağlantısı yok")
+
+                cur = conn.cursor()
+                with DB_QUERY_SECONDS.time(query='sms_by_ref_code'):
+                    cur.execute(SMS_BY_REF_CODE_SQL, (ref_code.upper(), time_threshold))
+                    found_sms = cur.fetchone()
+                if not found_sms:
+                    # Kod SMS'te başka bir biçimde geçiyorsa gövde içinde ara
+                    with DB_QUERY_SECONDS.time(query='sms_by_body'):
+                        cur.execute(SMS_BY_BODY_SQL, (f'%{ref_code}%', time_threshold))
+                        found_sms = cur.fetchone()
+                cur.close()
+
+            return self.reference_reply(found_sms, source, language)
                 
         except Exception as e:
-            print(f"❌ PostgreSQL sorgu hatası (_handle_reference_code): {e}")
+            log.error('reference_query_failed', error=str(e))
+            return self.reference_reply(None, "error", language)
+        finally:
+            release_db_connection(conn)
+
+    def cached_reference(self, ref_code: str, since: datetime):
+        return self.sms_cache.find_by_ref(ref_code.upper(), since) if self.sms_cache else None
+
+    def reference_reply(self, found_sms, source: str, language: str) -> Dict:
+        """Referans araması sonucunu (SMS_COLUMNS satırı veya None) yanıta çevirir"""
+        if found_sms:
+            parsed_sms = self._row_to_parsed(found_sms, language)
             return {
-                "success": False,
-                "response": self.response_manager.get_response('no_reference', language),
+                "success": True,
+                "response": self.response_manager.get_response('reference_found', language).format(
+                    site=site_title(parsed_sms['site']),
+                    code=parsed_sms['verification_code']
+                ),
                 "response_type": "direct",
-                "source": "error"
+                "data": parsed_sms,
+                "source": source
             }
-        finally:
-            if conn: conn.close()
+
+        return {
+            "success": False,
+            "response": self.response_manager.get_response('no_reference', language),
+            "response_type": "direct",
+            "source": "error" if source == "error" else "postgresql"
+        }
     
+    def _row_to_parsed(self, row, language: str) -> Dict:
+        """
+        SMS_COLUMNS sırasındaki satırı parse_sms çıktısı biçimine çevirir.
+        Parse sütunları boş olan eski satırlar (reparse öncesi) yerinde parse edilir.
+        """
+        body, _timestamp, site, verification_code, ref_code, sms_language = row
+        if site is None:
+            return self.sms_parser.parse_sms(body, language)
+        return {
+            'original_body': body,
+            'raw': body,
+            'language': sms_language,
+            'site': site,
+            'ref_code': ref_code,
+            'verification_code': verification_code,
+            'code': verification_code,
+            'has_reference': bool(ref_code)
+        }
+
     def _handle_help_request(self, language: str) -> Dict:
         return {
             "success": True,
@@ -257,126 +325,218 @@ class ChatbotManager:
         }
 
     def _get_address_response(self, language: str) -> str:
-        responses = {
-            'tr': "Teslimat adresiniz için lütfen telefon numaranızın son 9 hanesini girin (örn: 111222333)",
-            'en': "For your delivery address, please enter the last 9 digits of your phone number (eg: 111222333)", 
-            'bg': "За вашия адрес за доставка, моля въведете последните 9 цифри от телефонния си номер (напр: 111222333)"
-        }
-        return responses.get(language, responses['tr'])
+        return ADDRESS_RESPONSES.get(language, ADDRESS_RESPONSES['tr'])
     
     def get_recent_sms_by_site(self, site: str, seconds: int = 120, language: str = 'tr') -> Dict:
         conn = None
         try:
-            print(f"🔍 ARAMA: Site='{site}', Saniye={seconds}")
-            
             # UTC zamanını kullan
             time_threshold = datetime.utcnow() - timedelta(seconds=seconds)
-            
-            conn = self.get_db_connection()
-            if not conn:
-                # Veritabanı yoksa graceful fail
-                return {
-                    "success": False,
-                    "response": self.response_manager.get_response('no_recent_sms', language).format(
-                        site=site.title(),
-                        seconds=seconds
-                    ),
-                    "response_type": "direct",
-                    "source": "postgresql_error"
-                }
-
-            cur = conn.cursor()
-            
-            if site == 'other':
-                cur.execute(
-                    "SELECT * FROM sms_messages WHERE body NOT ILIKE %s AND body NOT ILIKE %s AND body NOT ILIKE %s AND timestamp >= %s ORDER BY timestamp DESC LIMIT 10",
-                    ('%trendyol%', '%hepsiburada%', '%n11%', time_threshold)
-                )
-            else:
-                site_patterns = {
-                    'trendyol': '%trendyol%',
-                    'hepsiburada': '%hepsiburada%', 
-                    'n11': '%n11%'
-                }
-                search_pattern = site_patterns.get(site, f'%{site}%')
-                
-                cur.execute(
-                    "SELECT * FROM sms_messages WHERE body ILIKE %s AND timestamp >= %s ORDER BY timestamp DESC LIMIT 10",
-                    (search_pattern, time_threshold)
-                )
+            source = "memory"
 
-            recent_sms = cur.fetchall()
-            cur.close()
-            # conn.close() burada değil, finally bloğunda yapılacak
+            # Önce bellekteki son SMS penceresi; boş sonuç DB'ye düşer
+            recent_sms = self.cached_recent_sms(site, time_threshold)
+            if not recent_sms:
+                source = "postgresql"
+                conn = self.get_db_connection()
+                if not conn:
+                    # Veritabanı yoksa graceful fail
+                    return self.no_recent_sms_reply(site, seconds, language, "postgresql_error")
 
-            print(f"📨 Bulunan SMS sayısı: {len(recent_sms)}")
+                cur = conn.cursor()
+                with DB_QUERY_SECONDS.time(query='recent_sms'):
+                    cur.execute(*recent_sms_query(site, time_threshold))
+                    recent_sms = cur.fetchall()
+                cur.close()
+                # conn.close() burada değil, finally bloğunda yapılacak
 
-            if not recent_sms:
-                return {
-                    "success": False,
-                    "response": self.response_manager.get_response('no_recent_sms', language).format(
-                        site=site.title(),
-                        seconds=seconds
-                    ),
-                    "response_type": "direct",
-                    "source": "postgresql"
-                }
-
-            parsed_sms_list = []
-            for sms in recent_sms:
-                try:
-                    sms_dict = {
-                        'body': sms[2],  # body sütunu
-                        'timestamp': sms[3]  # timestamp sütunu
-                    }
-                    parsed_sms = self.sms_parser.parse_sms(sms_dict['body'], language)
-                    # Raw body'yi de ekleyelim ki parser hata verirse görelim
-                    parsed_sms['raw'] = sms_dict['body']
-                    parsed_sms_list.append(parsed_sms)
-                except Exception as parse_error:
-                    print(f"⚠️ SMS Parse Hatası: {parse_error}")
-                    continue
-
-            if len(parsed_sms_list) == 1:
-                sms = parsed_sms_list[0]
-                return {
-                    "success": True,
-                    "response": self.response_manager.get_response('reference_found', language).format(
-                        site=sms['site'].title(),
-                        code=sms['verification_code']
-                    ),
-                    "response_type": "direct",
-                    "data": sms,
-                    "source": "postgresql"
-                }
-            else:
-                # Çoklu sonuç
-                sms_details = [
-                    {"site": sms['site'].title(), "code": sms['verification_code'], "raw": sms.get('raw', '')}
-                    for sms in parsed_sms_list
-                ]
-                response_text = self.response_manager.get_response('multiple_sms_found', language).format(
-                    count=len(parsed_sms_list),
-                    seconds=seconds
-                )
-                return {
-                    "success": True,
-                    "response": response_text,
-                    "response_type": "list",
-                    "sms_list": sms_details,
-                    "source": "postgresql"
-                }
+            return self.recent_sms_reply(site, recent_sms, source, seconds, language)
 
         except Exception as e:
-            print(f"❌ PostgreSQL sorgu hatası (get_recent_sms): {e}")
+            log.error('recent_sms_query_failed', site=site, error=str(e))
+            return self.no_recent_sms_reply(site, seconds, language, "error")
+        finally:
+            release_db_connection(conn)
+
+    def cached_recent_sms(self, site: str, since: datetime) -> List:
+        if not self.sms_cache:
+            return []
+        exclude_sites = main_sites() if site == 'other' else None
+        return self.sms_cache.recent_by_site(site, since, 10, exclude_sites)
+
+    def no_recent_sms_reply(self, site: str, seconds: int, language: str, source: str) -> Dict:
+        return {
+            "success": False,
+            "response": self.response_manager.get_response('no_recent_sms', language).format(
+                site=site_title(site),
+                seconds=seconds
+            ),
+            "response_type": "direct",
+            "source": source
+        }
+
+    def recent_sms_reply(self, site: str, recent_sms: List, source: str, seconds: int, language: str) -> Dict:
+        """Site araması sonucunu (SMS_COLUMNS satırları, en yeniden eskiye) yanıta çevirir"""
+        log.debug('recent_sms_lookup', site=site, seconds=seconds, found=len(recent_sms), source=source)
+
+        if not recent_sms:
+            return self.no_recent_sms_reply(site, seconds, language, "postgresql")
+
+        parsed_sms_list = []
+        for sms in recent_sms:
+            try:
+                parsed = self._row_to_parsed(sms, language)
+            except Exception as parse_error:
+                log.warning('sms_row_parse_failed', error=str(parse_error))
+                continue
+            # Eski (site IS NULL) satırların sitesi ancak parse edilince belli olur
+            if site_matches(parsed['site'], site):
+                parsed_sms_list.append(parsed)
+
+        if not parsed_sms_list:
+            return self.no_recent_sms_reply(site, seconds, language, source)
+
+        if len(parsed_sms_list) == 1:
+            sms = parsed_sms_list[0]
             return {
-                "success": False,
-                "response": self.response_manager.get_response('no_recent_sms', language).format(
-                    site=site.title(),
-                    seconds=seconds
+                "success": True,
+                "response": self.response_manager.get_response('reference_found', language).format(
+                    site=site_title(sms['site']),
+                    code=sms['verification_code']
                 ),
                 "response_type": "direct",
-                "source": "error"
+                "data": sms,
+                "source": source
             }
-        finally:
-            if conn: conn.close()
\ No newline at end of file
+
+        # Çoklu sonuç
+        sms_details = [
+            {"site": site_title(sms['site']), "code": sms['verification_code'], "raw": sms.get('raw', '')}
+            for sms in parsed_sms_list
+        ]
+        response_text = self.response_manager.get_response('multiple_sms_found', language).format(
+            count=len(parsed_sms_list),
+            seconds=seconds
+        )
+        return {
+            "success": True,
+            "response": response_text,
+            "response_type": "list",
+            "sms_list": sms_details,
+            "source": source
+        }
+
+    def sms_event_reply(self, event: Dict, language: str) -> Dict:
+        """SSE ile itilen SMS olayına widget'ın göstereceği yanıt metnini ekler"""
+        return dict(event, response=self.response_manager.get_response('reference_found', language).format(
+            site=site_title(event['site']),
+            code=event['verification_code']
+        ))
+
+
+def reference_threshold() -> datetime:
+    """Referans aramasının geriye baktığı an (2 saat, UTC)"""
+    return datetime.utcnow() - timedelta(hours=2)
+
+
+def site_matches(sms_site: Optional[str], site: str) -> bool:
+    """SMS'in sitesi aranan siteye uyuyor mu ('other': ana siteler dışındaki her şey)"""
+    if site == 'other':
+        return sms_site not in main_sites()
+    return sms_site == site
+
+
+def recent_sms_query(site: str, since: datetime) -> tuple:
+    """Site araması için (sql, parametreler)"""
+    if site == 'other':
+        return RECENT_SMS_OTHER_SQL, (since, list(main_sites()))
+    return RECENT_SMS_BY_SITE_SQL, (site, since)
+
+
+# --- Uygulama geneli tekil örnek ---
+_manager = None
+_manager_pid = None
+_manager_lock = threading.Lock()
+
+
+def get_chatbot_manager() -> ChatbotManager:
+    """
+    Süreç başına tek ChatbotManager döndürür.
+    Yönetici soket/bağlantı tutmaz (DB erişimi havuz üzerinden), bu yüzden gunicorn
+    --preload ile ebeveynde oluşturulup worker'lara fork ile aktarılması güvenlidir;
+    yine de pid değişirse worker kendi örneğini kurar.
+    """
+    global _manager, _manager_pid
+    pid = os.getpid()
+    if _manager is not None and _manager_pid == pid:
+        return _manager
+
+    with _manager_lock:
+        if _manager is None or _manager_pid != pid:
+            _manager = ChatbotManager()
+            _manager_pid = pid
+        return _manager
+
+
+def warm_sms_cache(cache=None) -> int:
+    """
+    Bellekteki son SMS penceresini DB'den doldurur (uygulama açılışında).
+    Yüklenen satır sayısını döndürür; DB yoksa önbellek soğuk kalır ve
+    sorgular doğrudan DB'ye gider.
+    """
+    cache = cache or recent_sms_cache
+    if cache is None:
+        return 0
+    conn = get_db_connection()
+    if not conn:
+        return 0
+    try:
+        cur = conn.cursor()
+        cur.execute(WARM_SMS_SQL, (datetime.utcnow() - timedelta(seconds=cache.window_seconds),))
+        rows = cur.fetchall()
+        cur.close()
+        conn.rollback()
+        cache.warm(rows)
+        return len(rows)
+    finally:
+        release_db_connection(conn)
+
+
+def check_query_plans(conn) -> List[str]:
+    """
+    Okuma sorgularının EXPLAIN planlarını kontrol eder ve sms_messages üzerinde
+    sequential scan kullanan sorguların adlarını döndürür (boş liste = başarılı).
+
+    Küçük tablolarda planlayıcı seq scan'i zaten ucuz bulacağı için kontrol
+    enable_seqscan = off ile yapılır: uygun bir index yoksa planlayıcı yine
+    de Seq Scan seçmek zorunda kalır.
+    """
+    threshold = datetime.utcnow() - timedelta(hours=2)
+    queries = {
+        'recent_sms_by_site': (RECENT_SMS_BY_SITE_SQL, ('trendyol', threshold)),
+        'recent_sms_other': (RECENT_SMS_OTHER_SQL, (threshold, list(main_sites()))),
+        'sms_by_ref_code': (SMS_BY_REF_CODE_SQL, ('A1B2C3', threshold)),
+        'sms_by_body': (SMS_BY_BODY_SQL, ('%A1B2C3%', threshold)),
+    }
+
+    failures = []
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, (sql, params) in queries.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+            if _has_seq_scan(plan[0]['Plan']):
+                failures.append(name)
+    finally:
+        cur.close()
+        conn.rollback()
+    return failures
+
+
+def _has_seq_scan(node: Dict) -> bool:
+    # Bölümlü tabloda taranan ilişkiler bölümlerdir (sms_messages_p20250101, sms_messages_default)
+    relation = node.get('Relation Name') or ''
+    if node.get('Node Type') == 'Seq Scan' and (relation == 'sms_messages' or relation.startswith('sms_messages_')):
+        return True
+    return any(_has_seq_scan(child) for child in node.get('Plans', ()))
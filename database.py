@@ -0,0 +1,422 @@
+import os
+import time
+import threading
+from collections import deque
+
+import psycopg2
+from psycopg2 import OperationalError
+from psycopg2 import extensions
+
+from logs import get_logger
+from metrics import DB_CONNECT_SECONDS
+
+log = get_logger('database')
+
+
+class PoolExhaustedError(Exception):
+    """Havuzda belirtilen süre içinde boş bağlantı bulunamadı"""
+
+
+def get_database_url() -> tuple:
+    """
+    Veritabanı URL'ini tespit eder.
+    Önce Private (İç) ağı dener, bulamazsa Public (Dış) ağı dener.
+    (db_url, connection_source) döndürür.
+    """
+    db_url = None
+    connection_source = "Unknown"
+
+    # Seçenek A: Direkt Private URL var mı?
+    if os.environ.get('DATABASE_PRIVATE_URL'):
+        db_url = os.environ.get('DATABASE_PRIVATE_URL')
+        connection_source = "DATABASE_PRIVATE_URL (Gizli Ağ)"
+
+    # Seçenek B: Railway'in otomatik verdiği PG değişkenleri var mı?
+    elif os.environ.get('PGHOST') and 'ballast' not in os.environ.get('PGHOST', ''):
+        pghost = os.environ.get('PGHOST')
+        pguser = os.environ.get('PGUSER')
+        pgpass = os.environ.get('PGPASSWORD')
+        pgport = os.environ.get('PGPORT')
+        pgdb = os.environ.get('PGDATABASE')
+
+        if pghost and pguser and pgdb:
+            db_url = f"postgres://{pguser}:{pgpass}@{pghost}:{pgport}/{pgdb}"
+            connection_source = "PG Variables (Otomatik İç Ağ)"
+
+    # Seçenek C: Hiçbiri yoksa, eldeki (muhtemelen Public/Ballast) URL'i kullan
+    if not db_url:
+        db_url = os.environ.get('DATABASE_URL')
+        connection_source = "DATABASE_URL (Mevcut Ayar)"
+
+    if not db_url:
+        return None, connection_source
+
+    # SSL modunu ayarla
+    if "sslmode" not in db_url:
+        symbol = "&" if "?" in db_url else "?"
+        db_url += f"{symbol}sslmode=require"
+
+    return db_url, connection_source
+
+
+def print_debug_vars():
+    """Hata anında ortamdaki veritabanı değişkenlerini (değerlerini gizleyerek) listeler"""
+    print("🔍 --- DEDEKTİF MODU: Mevcut Çevre Değişkenleri ---")
+    try:
+        keys = [k for k in os.environ.keys() if 'PG' in k or 'DB' in k or 'DATABASE' in k or 'RAILWAY' in k]
+        if not keys:
+            print("⚠️ Hiçbir veritabanı değişkeni (PG*, DATABASE*) bulunamadı!")
+        for k in keys:
+            val = os.environ[k]
+            # Değerin içeriğini gizle ama ipucu ver (örn: ballast var mı?)
+            hint = "Private/Internal IP"
+            if "ballast" in val: hint = "PUBLIC PROXY (Sorunlu)"
+            elif val.startswith("postgres://"): hint = "Connection String"
+            print(f"   🔑 {k}: [{hint}]")
+        print("------------------------------------------------")
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe, sınırlı boyutlu PostgreSQL bağlantı havuzu.
+
+    - En az `min_size`, en fazla `max_size` fiziksel bağlantı tutar.
+    - Havuz doluysa `checkout_timeout` saniye boyunca boş bağlantı bekler.
+    - Uzun süre boşta kalan bağlantılar verilmeden önce `SELECT 1` ile kontrol edilir.
+    - Oturum ayarları (TIME ZONE vb.) her fiziksel bağlantıda yalnızca bir kez uygulanır.
+    """
+
+    def __init__(self, db_url: str, min_size: int = 1, max_size: int = 10,
+                 checkout_timeout: float = 5.0, health_check_after: float = 30.0,
+                 max_lifetime: float = 1800.0, connect_retries: int = 3,
+                 session_settings: tuple = (), connect_kwargs: dict = None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Geçersiz havuz boyutu: min_size <= max_size ve max_size >= 1 olmalı")
+
+        self.db_url = db_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        self.connect_retries = connect_retries
+        self.session_settings = tuple(session_settings)
+        self.connect_kwargs = connect_kwargs or {}
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()        # (conn, created_at, last_used_at)
+        self._in_use = {}           # id(conn) -> (conn, created_at)
+        self._size = 0              # açık + açılmakta olan fiziksel bağlantı sayısı
+        self._closed = False
+        self._pid = os.getpid()
+
+        self.stats_counters = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'connect_failures': 0,
+            'checkouts': 0,
+            'checkout_waits': 0,
+            'checkout_timeouts': 0,
+            'health_check_failures': 0,
+            'connect_time_total': 0.0,
+        }
+
+        for _ in range(min_size):
+            try:
+                conn = self._open_connection()
+            except OperationalError:
+                break
+            with self._lock:
+                self._size += 1
+                now = time.monotonic()
+                self._idle.append((conn, now, now))
+
+    # --- Fiziksel bağlantı yönetimi ---
+    def _open_connection(self):
+        last_error = None
+        for attempt in range(self.connect_retries):
+            started = time.monotonic()
+            try:
+                conn = psycopg2.connect(self.db_url, **self.connect_kwargs)
+                if self.session_settings:
+                    cur = conn.cursor()
+                    for statement in self.session_settings:
+                        cur.execute(statement)
+                    cur.close()
+                    conn.commit()
+                elapsed = time.monotonic() - started
+                DB_CONNECT_SECONDS.observe(elapsed)
+                with self._lock:
+                    self.stats_counters['connections_created'] += 1
+                    self.stats_counters['connect_time_total'] += elapsed
+                return conn
+            except OperationalError as e:
+                last_error = e
+                with self._lock:
+                    self.stats_counters['connect_failures'] += 1
+                log.warning('db_connect_failed', attempt=attempt + 1, retries=self.connect_retries, error=str(e))
+                if attempt + 1 < self.connect_retries:
+                    time.sleep(min(0.2 * (2 ** attempt), 1.0))
+        raise last_error
+
+    def _close_connection(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self.stats_counters['connections_closed'] += 1
+            self._available.notify()
+
+    def _is_healthy(self, conn, created_at, last_used_at, now) -> bool:
+        if conn.closed:
+            return False
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if now - last_used_at < self.health_check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            with self._lock:
+                self.stats_counters['health_check_failures'] += 1
+            return False
+
+    # --- Dış API ---
+    def getconn(self, timeout: float = None):
+        """Havuzdan sağlıklı bir bağlantı alır, gerekirse yenisini açar"""
+        if os.getpid() != self._pid:
+            raise RuntimeError("ConnectionPool fork sonrası kullanılamaz; get_pool() ile yeni havuz alın")
+
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise PoolExhaustedError("Havuz kapatıldı")
+
+                entry = None
+                must_open = False
+                waited = False
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()  # LIFO: en sıcak bağlantı
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        must_open = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats_counters['checkout_timeouts'] += 1
+                        raise PoolExhaustedError(
+                            f"{timeout}sn içinde boş bağlantı bulunamadı (max_size={self.max_size})"
+                        )
+                    if not waited:
+                        self.stats_counters['checkout_waits'] += 1
+                        waited = True
+                    self._available.wait(remaining)
+
+            if must_open:
+                try:
+                    conn = self._open_connection()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._available.notify()
+                    raise
+                created_at = time.monotonic()
+            else:
+                conn, created_at, last_used_at = entry
+                if not self._is_healthy(conn, created_at, last_used_at, time.monotonic()):
+                    self._close_connection(conn)
+                    continue
+
+            with self._lock:
+                self._in_use[id(conn)] = (conn, created_at)
+                self.stats_counters['checkouts'] += 1
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Bağlantıyı havuza iade eder; bozuksa kapatır"""
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Bu havuza ait olmayan (ör. fork öncesi) bağlantı
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+
+        created_at = entry[1]
+        if not discard and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or conn.closed or self._closed:
+            self._close_connection(conn)
+            return
+
+        with self._lock:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._available.notify()
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _, _ in idle:
+            self._close_connection(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            in_use = len(self._in_use)
+            idle = len(self._idle)
+            size = self._size
+        created = counters['connections_created']
+        return {
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'size': size,
+            'in_use': in_use,
+            'idle': idle,
+            'saturation': round(in_use / self.max_size, 3),
+            'avg_connect_ms': round(counters.pop('connect_time_total') / created * 1000, 2) if created else None,
+            **counters,
+        }
+
+
+# --- Süreç geneli havuz ---
+_pool = None
+_pool_lock = threading.Lock()
+# Adres yapılandırılmamışsa sonuç süreç başına bir kez belirlenir (ortam değişkenleri
+# çalışırken değişmez); her bağlantı isteğinde yeniden denenip tanı bloğu basılmaz
+_unconfigured_pid = None
+
+
+def _build_pool():
+    db_url, connection_source = get_database_url()
+    if not db_url:
+        print("❌ HATA: Hiçbir veritabanı adresi bulunamadı!")
+        print_debug_vars()
+        return None
+
+    # Eğer hala 'ballast' kullanıyorsak uyarı ver
+    if 'ballast' in db_url:
+        log.warning('db_public_proxy', source=connection_source)
+    else:
+        log.info('db_internal_network', source=connection_source)
+
+    return ConnectionPool(
+        db_url,
+        min_size=int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+        max_size=int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        checkout_timeout=float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', 5)),
+        health_check_after=float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30)),
+        max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        session_settings=(
+            f"SET TIME ZONE '{os.environ.get('DB_TIMEZONE', 'Europe/Istanbul')}'",
+        ),
+        connect_kwargs={
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 5,
+            'connect_timeout': 10,
+        },
+    )
+
+
+def get_pool():
+    """
+    Süreç geneli havuzu döndürür (lazy). Gunicorn fork'undan sonra
+    her worker kendi havuzunu oluşturur; ebeveynden kalan soketler paylaşılmaz.
+    """
+    global _pool, _unconfigured_pid
+    pid = os.getpid()
+    pool = _pool
+    if pool is not None and pool._pid == pid:
+        return pool
+    if pool is None and _unconfigured_pid == pid:
+        return None
+
+    with _pool_lock:
+        if _pool is None or _pool._pid != pid:
+            if _pool is None and _unconfigured_pid == pid:
+                return None
+            _pool = _build_pool()
+            if _pool is None:
+                _unconfigured_pid = pid
+        return _pool
+
+
+def get_db_connection():
+    """Havuzdan bağlantı alır. Bağlantı yoksa None döner (eski davranışla uyumlu)."""
+    pool = get_pool()
+    if pool is None:
+        return None
+    try:
+        return pool.getconn()
+    except Exception as e:
+        log.error('db_checkout_failed', error=str(e))
+        return None
+
+
+def ping_database(timeout: float = 2.0):
+    """Havuzdaki bir bağlantıyla SELECT 1 çalıştırır; başarısızsa istisna fırlatır (bkz. health.db_probe)"""
+    pool = get_pool()
+    if pool is None:
+        raise OperationalError("Veritabanı adresi bulunamadı")
+    conn = pool.getconn(timeout=timeout)
+    discard = False
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchone()
+        cur.close()
+        conn.rollback()
+    except Exception:
+        discard = True
+        raise
+    finally:
+        pool.putconn(conn, discard=discard)
+
+
+def release_db_connection(conn, discard: bool = False):
+    """Bağlantıyı havuza iade eder (conn.close() yerine kullanılır)"""
+    if conn is None:
+        return
+    pool = _pool
+    if pool is None or pool._pid != os.getpid():
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return
+    pool.putconn(conn, discard=discard)
+
+
+def pool_stats() -> dict:
+    pool = _pool
+    if pool is None or pool._pid != os.getpid():
+        return {'initialized': False}
+    return {'initialized': True, **pool.stats()}
@@ -0,0 +1,63 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(from_number: str, body: str, timestamp: str, device_id: str) -> str:
+    """
+    Gateway SMS'inin içerik özeti. sms_dedup tablosundaki primary key sayesinde
+    aynı SMS'in tekrar gönderimi tüm worker'larda reddedilir.
+    """
+    raw = '\x1f'.join(str(part or '') for part in (from_number, body, timestamp, device_id))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class DedupCache:
+    """
+    Son `window_seconds` saniyede görülen özetlerin süreç içi ön önbelleği.
+
+    Özetler `bucket_seconds`'lık zaman kovalarında tutulur; süresi dolan kova
+    tek seferde atılır (her istekte tüm sözlüğü dolaşmak yerine). Kontrol,
+    sabit sayıdaki (window / bucket) kovaya bakar: O(1) amortize.
+    Kontrol (contains) ve kayıt (add) ayrıdır; özet yalnızca başarılı yazma
+    veya kuyruğa almadan sonra kaydedilir.
+    Kesin tekrar kontrolü veritabanındaki sms_dedup tablosundadır; bu önbellek
+    yalnızca bariz tekrarları DB'ye gitmeden eler.
+    """
+
+    def __init__(self, window_seconds: float = 60, bucket_seconds: float = 5):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = max(1, int(window_seconds // bucket_seconds))
+        self._buckets = OrderedDict()   # kova no -> set(özet)
+        self._lock = threading.Lock()
+
+    def _current_buckets(self) -> int:
+        """Süresi dolan kovaları atar ve şu anki kova numarasını döndürür (kilit altında çağrılır)"""
+        current = int(time.monotonic() // self.bucket_seconds)
+        oldest_allowed = current - self.bucket_count + 1
+        while self._buckets and next(iter(self._buckets)) < oldest_allowed:
+            self._buckets.popitem(last=False)
+        return current
+
+    def contains(self, key: str) -> bool:
+        """Özet pencere içinde kaydedildiyse True"""
+        with self._lock:
+            self._current_buckets()
+            return any(key in bucket for bucket in self._buckets.values())
+
+    def add(self, key: str):
+        """
+        Özeti kaydeder. Yalnızca SMS kuyruğa alındıktan veya yazıldıktan sonra
+        çağrılır: başarısız bir isteğin tekrar denemesi tekrar sayılmamalıdır.
+        """
+        with self._lock:
+            current = self._current_buckets()
+            bucket = self._buckets.get(current)
+            if bucket is None:
+                bucket = self._buckets[current] = set()
+            bucket.add(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(bucket) for bucket in self._buckets.values())
@@ -0,0 +1,228 @@
+"""
+sms_messages'ın akış halinde dışa aktarımı (denetim için).
+
+Satırlar named (server-side) cursor ile `chunk_size`'lık parçalar halinde
+okunur ve her parça NDJSON ya da CSV metnine çevrilip hemen verilir; bellek
+kullanımı tablo boyutundan bağımsızdır. Okuma REPEATABLE READ, READ ONLY
+tek bir transaction'dır: dışa aktarım başladığı anın tutarlı görüntüsüdür.
+
+Parse alanları (site, kod, ref) satırda yoksa (reparse edilmemiş eski
+satırlar) ya da reparse=True ise her parça SMSParser ile yeniden parse edilir;
+site ingest'teki gibi önce göndericiden çözülür.
+
+    GET /api/export/sms?format=csv&site=trendyol&since=2025-01-01&until=2025-02-01
+        Authorization: Bearer $EXPORT_TOKEN
+    python manage.py export --format ndjson --site trendyol --since 2025-01-01 > sms.ndjson
+"""
+import csv
+import hmac
+import io
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from psycopg2 import sql
+
+from database import get_db_connection, release_db_connection
+from logs import get_logger
+from senders import sender_index
+from sms_parser import SMSParser
+
+log = get_logger('export')
+
+# Boşsa HTTP üzerinden dışa aktarım kapalıdır (CLI her zaman çalışır)
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN', '')
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+FIELDS = ('id', 'timestamp', 'from_number', 'device_id', 'source', 'body',
+          'site', 'verification_code', 'ref_code', 'language')
+
+
+class ExportError(ValueError):
+    """Geçersiz dışa aktarım parametresi (HTTP 400)"""
+
+
+def check_token(authorization: Optional[str]) -> bool:
+    """`Authorization: Bearer <EXPORT_TOKEN>`; sabit zamanlı karşılaştırma"""
+    if not EXPORT_TOKEN or not authorization or not authorization.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(authorization[len('Bearer '):].encode(), EXPORT_TOKEN.encode())
+
+
+def parse_bound(value: Optional[str], name: str) -> Optional[datetime]:
+    """ISO tarih/zaman (naive UTC, sms_messages.timestamp ile aynı); boşsa None"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ExportError(f"Geçersiz {name}: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def export_params(args) -> Dict:
+    """İstek/komut argümanlarını (format, site, since, until) doğrular; hatada ExportError"""
+    export_format = args.get('format') or 'ndjson'
+    if export_format not in FORMATS:
+        raise ExportError(f"Geçersiz format: {export_format} (ndjson veya csv)")
+    return {
+        'export_format': export_format,
+        'site': (args.get('site') or '').strip().lower() or None,
+        'since': parse_bound(args.get('since'), 'since'),
+        'until': parse_bound(args.get('until'), 'until'),
+    }
+
+
+def export_headers(export_format: str) -> Dict[str, str]:
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    return {
+        'Content-Type': FORMATS[export_format],
+        'Content-Disposition': f'attachment; filename="sms-export-{stamp}.{export_format}"',
+        'X-Accel-Buffering': 'no',
+    }
+
+
+def build_query(site: Optional[str], since: Optional[datetime], until: Optional[datetime]):
+    """
+    Zaman aralığı bölüm budamasına (bkz. partitions.py) gider. Site filtresine
+    parse edilmemiş (site IS NULL) satırlar da dahil edilir; onlar parse
+    edildikten sonra Python tarafında elenir.
+    """
+    conditions = []
+    params = []
+    if site:
+        conditions.append(sql.SQL('(site = %s OR site IS NULL)'))
+        params.append(site)
+    if since:
+        conditions.append(sql.SQL('timestamp >= %s'))
+        params.append(since)
+    if until:
+        conditions.append(sql.SQL('timestamp < %s'))
+        params.append(until)
+    where = sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions) if conditions else sql.SQL('')
+    query = sql.SQL('SELECT {} FROM sms_messages{} ORDER BY timestamp, id').format(
+        sql.SQL(', ').join(map(sql.Identifier, FIELDS)), where)
+    return query, params
+
+
+def _fill_parsed(parser: SMSParser, record: Dict, reparse: bool):
+    if record['site'] is not None and not reparse:
+        return
+    # Site ingest'teki gibi önce göndericiden çözülür (bkz. senders.py)
+    parsed = parser.parse_sms(record['body'], parser.detect_language(record['body']),
+                              sender_index.lookup(record['from_number']))
+    for field in ('site', 'verification_code', 'ref_code', 'language'):
+        record[field] = parsed[field]
+
+
+def iter_sms_records(conn, site: Optional[str] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, chunk_size: int = EXPORT_CHUNK_SIZE,
+                     reparse: bool = False) -> Iterator[List[Dict]]:
+    """Satırları parça parça (liste halinde) veren generator; bağlantının transaction'ını kullanır"""
+    parser = SMSParser()
+    query, params = build_query(site, since, until)
+    # Öğrenilmiş gönderici eşlemesi (CLI'da arka plan yenilemesi yoktur)
+    sender_index.load(conn)
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    try:
+        cur = conn.cursor(name='sms_export')
+        cur.itersize = chunk_size
+        cur.execute(query, params)
+        chunk = []
+        # Named cursor'da iterasyon sunucudan itersize'lık FETCH'lerle ilerler
+        for row in cur:
+            record = dict(zip(FIELDS, row))
+            _fill_parsed(parser, record, reparse)
+            if site and record['site'] != site:
+                continue
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+
+
+def _format_ndjson(chunk: List[Dict]) -> str:
+    return ''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in chunk)
+
+
+def _format_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _format_chunk(export_format: str, chunk: List[Dict]) -> str:
+    if export_format == 'ndjson':
+        return _format_ndjson(chunk)
+    return _format_csv([record[field] for field in FIELDS] for record in chunk)
+
+
+def _format_error(export_format: str, error: Exception, rows: int) -> str:
+    """Yarıda kalan dışa aktarımın son kaydı; dosyayı okuyan eksik olduğunu görür"""
+    if export_format == 'ndjson':
+        return _format_ndjson([{'error': 'export_failed', 'message': str(error), 'rows': rows}])
+    return _format_csv([['#error', 'export_failed', str(error), rows]])
+
+
+def stream_export(export_format: str = 'ndjson', site: Optional[str] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, chunk_size: int = EXPORT_CHUNK_SIZE,
+                  reparse: bool = False) -> Iterator[str]:
+    """
+    Dışa aktarımı parça başına bir metin olarak veren iterator döndürür
+    (argümanlar export_params ile doğrulanmış olmalıdır).
+
+    Bağlantı, sorgu ve ilk parça yanıt başlamadan önce burada alınır: bu
+    adımdaki hata istisna olarak çağırana gider (HTTP 500), eksik ama tamam
+    görünen bir dosya oluşmaz. Havuzdan alınan bağlantı dışa aktarım boyunca
+    tutulur; istemci bağlantıyı keserse (iterator kapatılırsa) havuza geri verilir.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+    try:
+        records = iter_sms_records(conn, site, since, until, chunk_size, reparse)
+        first = next(records, None)
+    except Exception:
+        release_db_connection(conn)
+        raise
+    return _stream_chunks(conn, records, first, export_format, site)
+
+
+def _stream_chunks(conn, records: Iterator[List[Dict]], first: Optional[List[Dict]],
+                   export_format: str, site: Optional[str]) -> Iterator[str]:
+    """
+    Akış ortasında okuma hatası olursa son kayıt olarak hata satırı yazılır,
+    error düzeyinde loglanır ve istisna yeniden fırlatılır: HTTP yanıtı
+    sonlandırılmadan kesilir, CLI hata koduyla çıkar.
+    """
+    rows = 0
+    try:
+        if export_format == 'csv':
+            yield _format_csv([FIELDS])
+        chunk = first
+        while chunk is not None:
+            yield _format_chunk(export_format, chunk)
+            rows += len(chunk)
+            chunk = next(records, None)
+    except Exception as e:
+        log.error('sms_export_failed', format=export_format, site=site, rows=rows, error=str(e))
+        yield _format_error(export_format, e, rows)
+        raise
+    finally:
+        records.close()
+        release_db_connection(conn)
+    log.info('sms_export', format=export_format, site=site, rows=rows)
@@ -0,0 +1,182 @@
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from dedup import DedupCache, content_hash
+from ingest import IngestItem
+from logs import get_logger
+from metrics import SMS_DUPLICATES_TOTAL
+
+log = get_logger('gateway')
+
+# Gateway isteklerinin ortak doğrulama/dönüştürme adımları.
+# Flask (app.py) ve asyncio (asgi_app.py) sunucuları aynı kuralları kullanır.
+
+ALLOWED_USER_AGENTS = ('Shipliyo-SMS-Gateway', 'Android', 'Dalvik')
+
+# Tek istekte kabul edilen en fazla SMS (çevrimdışı kalan gateway'lerin toplu gönderimi)
+GATEWAY_BATCH_MAX = int(os.environ.get('GATEWAY_BATCH_MAX', 500))
+
+# Tekrar kontrolü: kesin kontrol sms_dedup tablosunda (content_hash primary key);
+# bu süreç içi önbellek bariz tekrarları DB'ye gitmeden eler.
+DEDUP_WINDOW_SECONDS = int(os.environ.get('DEDUP_WINDOW_SECONDS', 60))
+sms_duplicate_cache = DedupCache(window_seconds=DEDUP_WINDOW_SECONDS)
+
+
+def check_sms_duplicate(sms_hash):
+    if sms_duplicate_cache.contains(sms_hash):
+        SMS_DUPLICATES_TOTAL.inc(stage='memory')
+        log.sampled('sms_duplicate', hash=sms_hash[:16])
+        return True
+    return False
+
+
+def remember_sms(items):
+    """
+    Kuyruğa alınmış ya da yazılmış (veya DB'de zaten bulunan) SMS'lerin
+    özetlerini kaydeder. Doğrulama ya da yazma hatasında çağrılmaz; böylece
+    gateway'in tekrar denemesi reddedilmez.
+    """
+    for item in items:
+        sms_duplicate_cache.add(item.content_hash)
+
+
+def parse_sms_timestamp(timestamp) -> Optional[datetime]:
+    """
+    Gateway zaman damgasını naive UTC datetime'a çevirir; ISO 8601 metni ya da
+    epoch (saniye veya milisaniye, sayı ya da rakam dizisi) kabul edilir.
+    Havuzdaki bağlantılar 'Europe/Istanbul' saat dilimindedir; tz-aware değer
+    göndermek saklanan değeri oturum ayarına bağlı kılardı. Okuma tarafı
+    (get_recent_sms_by_site) utcnow() ile karşılaştırdığı için UTC saklıyoruz.
+
+    Değer boşsa ya da çözülemiyorsa None döner; SMS yine kabul edilir ve
+    alınma anıyla saklanır (bkz. prepare_sms).
+    """
+    if isinstance(timestamp, bool):
+        return None
+    if isinstance(timestamp, str) and timestamp.strip().isdigit():
+        timestamp = int(timestamp.strip())
+    if isinstance(timestamp, (int, float)):
+        # 10^11 saniyeden büyük değerler (yıl 5138 sonrası) milisaniyedir
+        seconds = timestamp / 1000 if abs(timestamp) >= 1e11 else timestamp
+        try:
+            return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(timestamp, str) or not timestamp.strip():
+        return None
+    try:
+        sms_ts = datetime.fromisoformat(timestamp.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if sms_ts.tzinfo is not None:
+        sms_ts = sms_ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return sms_ts
+
+
+def validate_phone_number(phone):
+    if not phone: return False
+    pattern = r'^\+?[1-9]\d{1,14}$'
+    return re.match(pattern, phone) is not None
+
+
+def validate_message_content(message):
+    if not message or len(message.strip()) == 0:
+        return False, "Boş mesaj gönderilemez"
+    if len(message) > 1000:
+        return False, "Mesaj çok uzun (max 1000 karakter)"
+    return True, ""
+
+
+def is_allowed_user_agent(user_agent):
+    for allowed in ALLOWED_USER_AGENTS:
+        if allowed in user_agent:
+            return True
+    log.warning('gateway_user_agent_rejected', user_agent=user_agent)
+    return False
+
+
+def prepare_sms(message: Dict, enqueued_at: float) -> Tuple[Optional[IngestItem], str, str]:
+    """
+    Gateway'den gelen tek SMS'i kuyruğa/yazmaya hazır IngestItem'a çevirir.
+    (item, durum, hata) döndürür; durum 'ok', 'duplicate' veya 'invalid'dir.
+    """
+    if not isinstance(message, dict):
+        return None, "invalid", "Geçersiz SMS"
+
+    from_number = str(message.get('from', '')).strip()
+    body = str(message.get('body', '')).strip()
+    timestamp = message.get('timestamp', '')
+    device_id = message.get('deviceId', 'android_gateway')
+
+    sms_ts = parse_sms_timestamp(timestamp)
+    dedup_stamp = timestamp
+    if sms_ts is None:
+        # Çözülemeyen zaman damgası OTP'yi kaybettirmesin: SMS alınma anıyla
+        # saklanır. Özet ham değeri, değer hiç yoksa alınma anının kovasını
+        # kapsar; tekrar denemeler sms_dedup'ta yine çakışır.
+        sms_ts = datetime.utcnow()
+        if timestamp is None or timestamp == '':
+            dedup_stamp = f'received:{int(time.time() // DEDUP_WINDOW_SECONDS)}'
+        log.sampled('sms_timestamp_fallback', value=str(timestamp)[:40])
+
+    sms_hash = content_hash(from_number, body, dedup_stamp, device_id)
+    if check_sms_duplicate(sms_hash):
+        return None, "duplicate", ""
+
+    is_valid_msg, msg_error = validate_message_content(body)
+    if not is_valid_msg:
+        return None, "invalid", msg_error
+
+    return IngestItem(from_number, body, device_id, sms_ts, enqueued_at, sms_hash), "ok", ""
+
+
+def batch_messages(data) -> Optional[list]:
+    """Toplu gövdeden SMS listesini çıkarır: [...] veya {"messages": [...]}"""
+    messages = data.get('messages') if isinstance(data, dict) else data
+    if not isinstance(messages, list) or not messages:
+        return None
+    return messages
+
+
+def prepare_batch(messages: list, enqueued_at: float) -> Tuple[list, list]:
+    """Toplu gönderimdeki SMS'leri hazırlar: (yazılacak item'lar, SMS başına sonuçlar)"""
+    results = []
+    items = []
+    seen = set()
+    for index, message in enumerate(messages):
+        item, status, error = prepare_sms(message, enqueued_at)
+        if item is not None and item.content_hash in seen:
+            item, status, error = None, "duplicate", ""
+        if item is None:
+            result = {"index": index, "status": status}
+            if error:
+                result["error"] = error
+            results.append(result)
+            continue
+        seen.add(item.content_hash)
+        items.append(item)
+        results.append({"index": index, "status": "stored", "hash": item.content_hash})
+    return items, results
+
+
+def batch_summary(messages: list, results: list, inserted: set) -> Dict:
+    """
+    Toplu gönderim yanıtı. DB'de zaten bulunanlar (başka worker / önceki
+    gönderim) 'stored' yerine 'duplicate' olarak işaretlenir.
+    """
+    for result in results:
+        sms_hash = result.pop("hash", None)
+        if sms_hash is not None and sms_hash not in inserted:
+            result["status"] = "duplicate"
+
+    return {
+        "status": "success",
+        "received": len(messages),
+        "stored": len(inserted),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "invalid": sum(1 for r in results if r["status"] == "invalid"),
+        "results": results
+    }
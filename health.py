@@ -0,0 +1,148 @@
+"""
+Liveness / readiness kontrolleri.
+
+- /health/live : süreç ayakta mı; hiçbir G/Ç yapmaz.
+- /health/ready: arka planda HEALTH_PROBE_INTERVAL saniyede bir havuzdan alınan
+  bağlantıyla çalışan `SELECT 1` sonucunu (önbellekteki son değeri) havuz
+  doluluğu ve ingest kuyruğu gecikmesiyle birlikte değerlendirir.
+
+Sağlık denetleyicisi ne sıklıkla sorarsa sorsun veritabanına giden istek
+sayısı aralık başına birdir ve yeni bağlantı açılmaz.
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+HEALTH_PROBE_INTERVAL = float(os.environ.get('HEALTH_PROBE_INTERVAL', 10))
+# Son başarılı sorgu bundan eskiyse hazır değil (varsayılan: 3 kaçırılmış yoklama)
+HEALTH_MAX_QUERY_AGE = float(os.environ.get('HEALTH_MAX_QUERY_AGE', HEALTH_PROBE_INTERVAL * 3))
+HEALTH_MAX_INGEST_LAG = float(os.environ.get('HEALTH_MAX_INGEST_LAG', 30))
+HEALTH_MAX_POOL_SATURATION = float(os.environ.get('HEALTH_MAX_POOL_SATURATION', 1.0))
+
+
+class DatabaseProbe:
+    """
+    Periyodik DB yoklamasının son sonucunu tutar.
+    Flask modunda lazy başlatılan bir daemon thread (fork sonrası her worker'da
+    yeniden), ASGI modunda lifespan'de başlatılan bir coroutine yoklar.
+    """
+
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.checks = 0
+        self.failures = 0
+        self.last_checked_at = None         # time.monotonic()
+        self.last_success_at = None         # time.monotonic()
+        self.last_latency_ms = None
+        self.last_error = None
+
+    # --- Sonuç kaydı ---
+    def record(self, started: float, error: Optional[Exception] = None):
+        now = time.monotonic()
+        with self._lock:
+            self.checks += 1
+            self.last_checked_at = now
+            if error is None:
+                self.last_success_at = now
+                self.last_latency_ms = round((now - started) * 1000, 2)
+                self.last_error = None
+            else:
+                self.failures += 1
+                self.last_error = str(error)
+
+    def run_once(self, check: Callable[[], None]):
+        started = time.monotonic()
+        try:
+            check()
+        except Exception as e:
+            self.record(started, e)
+        else:
+            self.record(started)
+
+    # --- Yoklayıcılar ---
+    def ensure_thread(self, check: Callable[[], None]):
+        """İlk çağrıda bir kez senkron yoklar (sonuç hemen dolu olsun), sonra thread'e bırakır"""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            first = self._pid != pid
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, args=(check,), name='db-probe', daemon=True)
+            self._thread.start()
+        if first:
+            self.run_once(check)
+
+    def _run(self, check: Callable[[], None]):
+        while True:
+            time.sleep(self.interval)
+            self.run_once(check)
+
+    async def run_async(self, check: Callable[[], Awaitable]):
+        """ASGI lifespan'inde task olarak çalışır; iptal edilene kadar yoklar"""
+        while True:
+            started = time.monotonic()
+            try:
+                await check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.record(started, e)
+            else:
+                self.record(started)
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'ok': self.last_success_at is not None and self.last_success_at == self.last_checked_at,
+                'interval_seconds': self.interval,
+                'checks': self.checks,
+                'failures': self.failures,
+                'latency_ms': self.last_latency_ms,
+                'last_query_age_seconds': round(now - self.last_success_at, 1) if self.last_success_at else None,
+                'last_check_age_seconds': round(now - self.last_checked_at, 1) if self.last_checked_at else None,
+                'last_error': self.last_error,
+            }
+
+
+def readiness(probe: Dict, pool: Dict, ingest: Dict) -> Tuple[bool, Dict]:
+    """(hazır mı, yanıt gövdesi); eşikler HEALTH_* ortam değişkenleriyle ayarlanır"""
+    reasons: List[str] = []
+
+    query_age = probe['last_query_age_seconds']
+    if query_age is None or query_age > HEALTH_MAX_QUERY_AGE:
+        reasons.append('database')
+
+    saturation = pool.get('saturation')
+    if saturation is not None and saturation >= HEALTH_MAX_POOL_SATURATION:
+        reasons.append('pool_saturated')
+
+    ingest_lag = ingest['oldest_pending_seconds']
+    if ingest_lag > HEALTH_MAX_INGEST_LAG or ingest['depth'] >= ingest['capacity']:
+        reasons.append('ingest_lag')
+
+    ready = not reasons
+    return ready, {
+        'status': 'ready' if ready else 'not_ready',
+        'reasons': reasons,
+        'database': probe,
+        'pool_saturation': saturation,
+        'ingest_lag_seconds': ingest_lag,
+        'ingest_depth': ingest['depth'],
+        'last_query_age_seconds': query_age,
+        'timestamp': datetime.now().isoformat(),
+    }
+
+
+# Süreç geneli yoklama sonucu
+db_probe = DatabaseProbe()
@@ -0,0 +1,405 @@
+import atexit
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from psycopg2.extras import execute_values
+
+from database import get_db_connection, release_db_connection
+from logs import get_logger
+from metrics import DB_QUERY_SECONDS, SMS_DUPLICATES_TOTAL, SMS_INGESTED_TOTAL, SMS_SITE_RESOLVED_TOTAL
+from senders import sender_index
+from sms_cache import recent_sms_cache
+from sms_events import sms_event_bus
+from sms_parser import SMSParser
+
+log = get_logger('ingest')
+
+
+class IngestItem(NamedTuple):
+    from_number: str
+    body: str
+    device_id: str
+    timestamp: datetime
+    enqueued_at: float  # time.monotonic()
+    content_hash: str   # dedup.content_hash(); sms_messages üzerinde unique
+
+
+class IngestError(Exception):
+    """SMS'ler veritabanına yazılamadı"""
+
+
+INSERT_SMS_SQL = '''
+    INSERT INTO sms_messages
+    (from_number, body, device_id, processed, source, timestamp,
+     site, verification_code, ref_code, language, content_hash)
+    VALUES %s
+    ON CONFLICT DO NOTHING
+    RETURNING content_hash
+'''
+
+# Tekrar kontrolünün kesin kaydı (bkz. schema.py sms_dedup)
+CLAIM_HASHES_SQL = '''
+    INSERT INTO sms_dedup (content_hash) VALUES %s
+    ON CONFLICT DO NOTHING
+    RETURNING content_hash
+'''
+
+
+def parse_for_ingest(parser: SMSParser, body: str, from_number: Optional[str] = None) -> Dict:
+    """
+    Gelen SMS'i otomatik tespit edilen dilde parse eder. Site önce göndericiden
+    çözülür (bkz. senders.py); gövde yalnızca bilinmeyen göndericilerde taranır.
+    """
+    site = sender_index.lookup(from_number)
+    SMS_SITE_RESOLVED_TOTAL.inc(method='body' if site is None else 'sender')
+    return parser.parse_sms(body, parser.detect_language(body), site)
+
+
+def build_sms_row(item: IngestItem, parsed: Dict) -> tuple:
+    return (item.from_number, item.body, item.device_id, False, 'android_gateway', item.timestamp,
+            parsed['site'], parsed['verification_code'], parsed['ref_code'], parsed['language'],
+            item.content_hash)
+
+
+def build_sms_event(item: IngestItem, parsed: Dict) -> Dict:
+    """Bekleyen istemcilere (SSE) itilen olay; ham SMS gövdesi gönderilmez"""
+    return {
+        'site': parsed['site'],
+        'verification_code': parsed['verification_code'],
+        'ref_code': parsed['ref_code'],
+        'language': parsed['language'],
+        'timestamp': item.timestamp.isoformat(),
+    }
+
+
+def insert_sms_rows(cur, rows: List[tuple]) -> List[tuple]:
+    """
+    Satırları tek bir çok satırlı INSERT ile yazar (commit çağırana aittir).
+    Gerçekten eklenen satırların RETURNING sonuçlarını döndürür. Özetler önce
+    sms_dedup'ta sahiplenilir: daha önce görülmüş ya da partide tekrar eden
+    content_hash'li satırlar (alınma anıyla saklananlar dahil) atlanır.
+    """
+    unique = list({row[-1]: row for row in reversed(rows)}.values())[::-1]
+    if not unique:
+        return []
+    claimed = {r[0] for r in execute_values(cur, CLAIM_HASHES_SQL, [(row[-1],) for row in unique],
+                                             page_size=len(unique), fetch=True)}
+    fresh = [row for row in unique if row[-1] in claimed]
+    if not fresh:
+        return []
+    return execute_values(cur, INSERT_SMS_SQL, fresh, page_size=len(fresh), fetch=True)
+
+
+class IngestQueue:
+    """
+    /gateway-sms için arka plan yazma hattı.
+
+    İstek yalnızca doğrulama yapıp SMS'i kuyruğa koyar ve hemen yanıt döner.
+    Arka plandaki tek worker thread kuyruktan `batch_size`'a kadar SMS toplar,
+    parse eder, tek INSERT + commit ile yazar ve ardından son işlemleri
+    (bellekteki SMS önbelleğini besleme, bekleyen istemcilere olay itme) yapar.
+
+    Yazılamayan parti atılmaz (gateway ACK aldığı için tekrar göndermez):
+    max_retries denemeden sonra yerel bir JSONL dosyasına (spill_path) eklenir
+    ve worker boşta kaldıkça artan aralıklarla oradan yeniden yazılır. Dosyayı
+    aynı anda tek süreç işler (dosya adı atomik olarak değiştirilerek alınır).
+
+    Not: SMS commit edilmeden önce ACK verildiği için süreç aniden ölürse
+    kuyruktaki SMS'ler kaybolabilir; normal kapanışta drain() kuyruğu boşaltır.
+    """
+
+    def __init__(self, batch_size: int = 100, max_size: int = 10000,
+                 flush_interval: float = 0.05, retry_delay: float = 1.0, max_retries: int = 5,
+                 enabled: bool = True, spill_path: Optional[str] = None, replay_max_delay: float = 60.0):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.spill_path = spill_path
+        self.replay_max_delay = replay_max_delay
+        self._replay_delay = retry_delay
+        self._next_replay_at = 0.0     # time.monotonic()
+
+        self.parser = SMSParser()
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        self.enqueued = 0
+        self.inserted = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_lag_seconds = None
+        self.last_success_at = None
+
+    # --- Dış API ---
+    def submit(self, item: IngestItem) -> bool:
+        """
+        SMS'i kuyruğa koyar. Kuyruk kapalıysa (INGEST_MODE=sync), doluysa veya
+        kapanıyorsa False döner; çağıran process_now() ile senkron yazmalıdır.
+        """
+        if not self.enabled or self._stopping.is_set():
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def process_now(self, items: List[IngestItem]) -> Set[str]:
+        """
+        Kuyruğu atlayarak SMS'leri istek thread'inde tek transaction ile yazar
+        (kuyruk dolu / sync mod / toplu gönderim). Eklenen SMS'lerin
+        content_hash kümesini döndürür; kümede olmayanlar tekrardır.
+        """
+        return self._process_batch(items)
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Yeni SMS kabulünü durdurur ve kuyruktaki SMS'lerin yazılmasını bekler"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return self._queue.empty()
+        thread.join(timeout)
+        drained = self._queue.empty() and not thread.is_alive()
+        if not drained:
+            log.warning('ingest_drain_incomplete', pending=self._queue.qsize())
+        return drained
+
+    def stats(self) -> dict:
+        oldest = None
+        with self._queue.mutex:
+            if self._queue.queue:
+                oldest = self._queue.queue[0].enqueued_at
+        with self._lock:
+            return {
+                'depth': self._queue.qsize(),
+                'capacity': self.max_size,
+                'oldest_pending_seconds': round(time.monotonic() - oldest, 3) if oldest else 0.0,
+                'last_lag_seconds': self.last_lag_seconds,
+                'enqueued': self.enqueued,
+                'inserted': self.inserted,
+                'spilled': self.spilled,
+                'replayed': self.replayed,
+                'spill_pending': self._spill_pending(),
+                'duplicates': self.duplicates,
+                'batches': self.batches,
+                'last_batch_size': self.last_batch_size,
+                'last_success_at': self.last_success_at,
+                'worker_alive': bool(self._thread and self._thread.is_alive() and self._pid == os.getpid()),
+            }
+
+    # --- Worker ---
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != pid or not self._thread.is_alive():
+                # Fork sonrası ebeveynin kuyruğu/thread'i bu süreçte geçersizdir
+                if self._pid != pid:
+                    self._queue = queue.Queue(maxsize=self.max_size)
+                self._pid = pid
+                self._thread = threading.Thread(target=self._run, name='sms-ingest', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                self._maybe_replay()
+                if self._stopping.is_set():
+                    return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            fresh = None
+            for attempt in range(self.max_retries):
+                try:
+                    fresh = self._write_batch(batch)
+                    break
+                except Exception as e:
+                    log.warning('ingest_write_failed', attempt=attempt + 1, retries=self.max_retries, error=str(e))
+                    if attempt + 1 < self.max_retries:
+                        time.sleep(self.retry_delay * (attempt + 1))
+            else:
+                self._spill(batch)
+
+            # Yazma commit edildikten sonra; hatası yazmayı tekrarlatmaz
+            if fresh is not None:
+                self._post_process(fresh)
+                self._maybe_replay()
+
+            for _ in batch:
+                self._queue.task_done()
+
+    def _process_batch(self, batch: List[IngestItem]) -> Set[str]:
+        """Partiyi yazar ve son işlemleri yapar; eklenen SMS'lerin content_hash kümesi"""
+        fresh = self._write_batch(batch)
+        self._post_process(fresh)
+        return {item.content_hash for item, _result in fresh}
+
+    def _write_batch(self, batch: List[IngestItem]) -> List[Tuple[IngestItem, Dict]]:
+        """Partiyi tek transaction'da yazar; gerçekten eklenen (item, parse sonucu) çiftleri"""
+        parsed = [parse_for_ingest(self.parser, item.body, item.from_number) for item in batch]
+        rows = [build_sms_row(item, result) for item, result in zip(batch, parsed)]
+
+        conn = get_db_connection()
+        if not conn:
+            raise IngestError("Veritabanı bağlantısı kurulamadı")
+        try:
+            cur = conn.cursor()
+            with DB_QUERY_SECONDS.time(query='insert_sms'):
+                inserted = {row[0] for row in insert_sms_rows(cur, rows)}
+            fresh = [(item, result) for item, result in zip(batch, parsed) if item.content_hash in inserted]
+            sms_event_bus.notify(cur, [dict(build_sms_event(item, result), body=item.body) for item, result in fresh])
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db_connection(conn)
+
+        now = time.monotonic()
+        with self._lock:
+            self.inserted += len(inserted)
+            self.duplicates += len(batch) - len(inserted)
+            self.batches += 1
+            self.last_batch_size = len(batch)
+            self.last_lag_seconds = round(max(now - item.enqueued_at for item in batch), 3)
+            self.last_success_at = datetime.utcnow().isoformat()
+        if len(batch) > len(inserted):
+            SMS_DUPLICATES_TOTAL.inc(len(batch) - len(inserted), stage='database')
+        return fresh
+
+    def _post_process(self, fresh: List[Tuple[IngestItem, Dict]]):
+        """Önbellek, metrik ve olaylar; hata yalnızca loglanır (SMS zaten yazılmıştır)"""
+        try:
+            self._feed(fresh)
+        except Exception as e:
+            log.error('ingest_post_process_failed', count=len(fresh), error=str(e))
+
+    def _feed(self, fresh: List[Tuple[IngestItem, Dict]]):
+        # postgres olay yolunda önbelleği (bu sürecinki dahil) LISTEN besler
+        if recent_sms_cache and not sms_event_bus.feeds_cache:
+            for item, result in fresh:
+                recent_sms_cache.add((item.body, item.timestamp, result['site'], result['verification_code'],
+                                      result['ref_code'], result['language']))
+        for _item, result in fresh:
+            SMS_INGESTED_TOTAL.inc(site=result['site'] or 'unknown')
+        sms_event_bus.publish(build_sms_event(item, result) for item, result in fresh)
+        log.debug('sms_batch_written', count=len(fresh))
+
+
+    # --- Yazılamayan partiler ---
+    def _spill(self, batch: List[IngestItem]):
+        """Partiyi yerel dosyaya ekler; dosyaya da yazılamazsa kuyruğa geri koymayı dener"""
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for item in batch:
+                    f.write(json.dumps({
+                        'from_number': item.from_number, 'body': item.body, 'device_id': item.device_id,
+                        'timestamp': item.timestamp.isoformat(), 'content_hash': item.content_hash,
+                    }, ensure_ascii=False, default=str) + '\n')
+        except OSError as e:
+            log.error('ingest_spill_failed', count=len(batch), path=self.spill_path, error=str(e))
+            requeued = 0
+            for item in batch:
+                try:
+                    self._queue.put_nowait(item)
+                    requeued += 1
+                except queue.Full:
+                    break
+            log.error('ingest_batch_requeued', count=requeued, lost=len(batch) - requeued)
+            return
+        with self._lock:
+            self.spilled += len(batch)
+        self._next_replay_at = time.monotonic() + self._replay_delay
+        log.error('ingest_batch_spilled', count=len(batch), path=self.spill_path)
+
+    def _spill_pending(self) -> bool:
+        return bool(self.spill_path) and os.path.exists(self.spill_path)
+
+    def _maybe_replay(self):
+        if not self._spill_pending() or time.monotonic() < self._next_replay_at:
+            return
+        if self.replay_spilled():
+            self._replay_delay = self.retry_delay
+        else:
+            self._replay_delay = min(self._replay_delay * 2, self.replay_max_delay)
+        self._next_replay_at = time.monotonic() + self._replay_delay
+
+    def replay_spilled(self) -> bool:
+        """
+        Dosyadaki SMS'leri parti parti yeniden yazar. Dosya önce süreç adına
+        yeniden adlandırılır (başka süreç aynı anda almaz); yazılamayan kalan
+        SMS'ler dosyaya geri eklenir. Dosya boşaldıysa True döner.
+        """
+        claimed = f'{self.spill_path}.{os.getpid()}.replay'
+        try:
+            os.replace(self.spill_path, claimed)
+        except FileNotFoundError:
+            return True
+        with open(claimed, encoding='utf-8') as f:
+            items = [IngestItem(record['from_number'], record['body'], record['device_id'],
+                                datetime.fromisoformat(record['timestamp']), time.monotonic(),
+                                record['content_hash'])
+                     for record in map(json.loads, filter(str.strip, f))]
+        written = 0
+        try:
+            for start in range(0, len(items), self.batch_size):
+                fresh = self._write_batch(items[start:start + self.batch_size])
+                written = start + self.batch_size
+                self._post_process(fresh)
+        except Exception as e:
+            log.warning('ingest_replay_failed', pending=len(items) - written, error=str(e))
+            self._spill(items[written:])
+            return False
+        finally:
+            os.remove(claimed)
+            with self._lock:
+                self.replayed += min(written, len(items))
+        log.info('ingest_replayed', count=len(items))
+        return True
+
+
+def _build_queue() -> IngestQueue:
+    ingest = IngestQueue(
+        batch_size=int(os.environ.get('INGEST_BATCH_SIZE', 100)),
+        max_size=int(os.environ.get('INGEST_QUEUE_SIZE', 10000)),
+        flush_interval=float(os.environ.get('INGEST_FLUSH_INTERVAL', 0.05)),
+        enabled=os.environ.get('INGEST_MODE', 'async') != 'sync',
+        spill_path=os.environ.get('INGEST_SPILL_PATH') or os.path.join(tempfile.gettempdir(), 'shipliyo-ingest-spill.jsonl'),
+    )
+    atexit.register(ingest.drain, float(os.environ.get('INGEST_DRAIN_TIMEOUT', 10)))
+    return ingest
+
+
+# Süreç geneli kuyruk; INGEST_MODE=sync ile SMS'ler istek içinde yazılır
+ingest_queue = _build_queue()
@@ -0,0 +1,88 @@
+"""
+Seviyeli, örneklemeli yapısal log (satır başına bir JSON nesnesi, stdout).
+
+    log = get_logger('gateway')
+    log.sampled('sms_received', device='device-1')   # sık olay: LOG_SAMPLE_RATE oranında
+    log.error('gateway_error', error=str(e))         # hatalar her zaman
+
+- LOG_LEVEL (varsayılan INFO): altındaki seviyeler için alanlar hiç hazırlanmaz.
+- LOG_SAMPLE_RATE (varsayılan 0.01): sampled() çağrılarının yazılma oranı;
+  kayıtta sample_rate alanı bulunur, sayım için 1/oran ile çarpılır.
+  Kesin sayılar /metrics'tedir; log yalnızca örnek olay içindir.
+"""
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+
+_ROOT = 'shipliyo'
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname.lower(),
+            'logger': record.name[len(_ROOT) + 1:] or record.name,
+            'event': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _configure() -> logging.Logger:
+    root = logging.getLogger(_ROOT)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JSONFormatter())
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False  # gunicorn/uvicorn kök logger'ında tekrar yazılmasın
+    return root
+
+
+def redirect(stream):
+    """Log satırlarını başka bir akışa yazar (ör. stdout'a veri basan komutlarda stderr)"""
+    for handler in _configure().handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(stream)
+
+
+class EventLogger:
+    """Olay adı + anahtar/değer alanları; alanlar yalnızca seviye açıksa serileştirilir"""
+
+    def __init__(self, name: str):
+        _configure()
+        self._logger = logging.getLogger(f'{_ROOT}.{name}')
+
+    def _log(self, level: int, event: str, fields: dict):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={'fields': fields})
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def sampled(self, event: str, rate: float = None, **fields):
+        """İstek başına olan sık olaylar: INFO seviyesinde, `rate` oranında yazılır"""
+        rate = LOG_SAMPLE_RATE if rate is None else rate
+        if not self._logger.isEnabledFor(logging.INFO) or (rate < 1 and random.random() >= rate):
+            return
+        self._logger.log(logging.INFO, event, extra={'fields': dict(fields, sample_rate=rate)})
+
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(name)
@@ -0,0 +1,415 @@
+"""
+Shipliyo bakım komutları.
+
+    python manage.py migrate
+    python manage.py partitions [--convert]
+    python manage.py reparse [--chunk-size 1000] [--workers 4] [--language tr] [--only-missing]
+    python manage.py explain
+    python manage.py export [--format ndjson|csv] [--site trendyol] [--since 2025-01-01] [--until ...] [--output dosya]
+    python manage.py rules status|export|validate|activate [paket.json] [--db-sample 2000] [--max-slowdown 1.5]
+    python manage.py senders learn|show
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+from database import get_db_connection, release_db_connection
+from sms_parser import SMSParser
+
+
+def _write_parsed(conn, cur, values) -> int:
+    """Parse sonuçlarını tek bir çok satırlı UPDATE ile yazar ve commit eder"""
+    execute_values(cur, '''
+        UPDATE sms_messages AS s
+        SET site = v.site, verification_code = v.verification_code,
+            ref_code = v.ref_code, language = v.language
+        FROM (VALUES %s) AS v(id, site, verification_code, ref_code, language)
+        WHERE s.id = v.id
+    ''', values, page_size=len(values))
+    conn.commit()
+    return len(values)
+
+
+def reparse_sms(chunk_size: int = 1000, workers: int = 1, language: str = None,
+                only_missing: bool = False) -> int:
+    """
+    sms_messages tablosunu server-side cursor ile parça parça okur, SMS'leri
+    parse_many ile yeniden parse eder ve sonuçları parça başına tek UPDATE ile yazar.
+    Site, ingest'teki gibi önce göndericiden (sender_index) çözülür.
+    only_missing=True ise yalnızca henüz parse edilmemiş (site IS NULL) satırlar işlenir.
+    Güncellenen satır sayısını döndürür.
+    """
+    read_conn = get_db_connection()
+    write_conn = get_db_connection()
+    if not read_conn or not write_conn:
+        release_db_connection(read_conn)
+        release_db_connection(write_conn)
+        raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+
+    from senders import sender_index
+
+    use_configured_rules()
+    parser = SMSParser()
+    updated = 0
+    started = time.monotonic()
+    try:
+        # Site ingest'teki gibi önce göndericiden çözülür (öğrenilmiş eşleme DB'den)
+        sender_index.load(read_conn)
+
+        # Named cursor: satırlar sunucuda kalır, istemciye itersize'lık parçalarla gelir
+        read_cur = read_conn.cursor(name='sms_reparse')
+        read_cur.itersize = chunk_size
+        where = "WHERE site IS NULL" if only_missing else ""
+        read_cur.execute(f"SELECT id, from_number, body FROM sms_messages {where} ORDER BY id")
+
+        # parse_many tek bir akış olarak beslenir; workers > 1 ise process havuzu
+        # tüm komut boyunca bir kez kurulur. id'ler sırayla ayrı kuyrukta taşınır.
+        pending_ids = deque()
+
+        def bodies():
+            for sms_id, from_number, body in read_cur:
+                pending_ids.append(sms_id)
+                yield body, sender_index.lookup(from_number)
+
+        write_cur = write_conn.cursor()
+        values = []
+        for result in parser.parse_many(bodies(), language, workers=workers, chunk_size=chunk_size):
+            values.append((pending_ids.popleft(), result['site'], result['verification_code'],
+                           result['ref_code'], result['language']))
+            if len(values) >= chunk_size:
+                updated += _write_parsed(write_conn, write_cur, values)
+                values = []
+                print(f"   ↻ {updated} SMS yeniden parse edildi ({time.monotonic() - started:.1f}sn)")
+        if values:
+            updated += _write_parsed(write_conn, write_cur, values)
+
+        read_cur.close()
+        write_cur.close()
+        read_conn.rollback()
+    except Exception:
+        write_conn.rollback()
+        read_conn.rollback()
+        raise
+    finally:
+        release_db_connection(read_conn)
+        release_db_connection(write_conn)
+
+    print(f"✅ Toplam {updated} SMS güncellendi ({time.monotonic() - started:.1f}sn)")
+    return updated
+
+
+def migrate_schema() -> int:
+    """Şemayı kurar (bkz. schema.py); bağlantı yoksa veya zorunlu adım başarısızsa 1 döndürür"""
+    from schema import migrate
+
+    print("🔍 Veritabanı ortam değişkenleri:")
+    for key in os.environ:
+        if 'PG' in key or 'DB' in key or 'DATABASE' in key:
+            hint = "⚠️ PUBLIC PROXY (Sorunlu)" if 'ballast' in os.environ[key] else "✅ Private/Internal"
+            print(f"   🔑 {key}: [{hint}]")
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Tablolar oluşturulamadı: Bağlantı yok.")
+        return 1
+    started = time.monotonic()
+    try:
+        warnings = migrate(conn)
+    except Exception as e:
+        print(f"❌ Tablo oluşturma hatası: {e}")
+        return 1
+    finally:
+        release_db_connection(conn)
+
+    for warning in warnings:
+        print(f"⚠️ {warning}")
+    print(f"✅ PostgreSQL tabloları hazır ({time.monotonic() - started:.2f}sn).")
+    return 0
+
+
+def maintain_partitions(convert: bool = False) -> int:
+    """
+    sms_messages bölüm bakımı (bkz. partitions.py); zamanlanmış görevden de
+    çalıştırılabilir. convert=True ise bölümlenmemiş eski tabloyu önce taşır.
+    """
+    from partitions import SMS_PARTITION_INTERVAL, SMS_RETENTION_ACTION, SMS_RETENTION_DAYS, maintain
+    from schema import convert_to_partitioned
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+    try:
+        if convert:
+            started = time.monotonic()
+            converted = convert_to_partitioned(conn)
+            if converted['converted']:
+                print(f"✅ sms_messages bölümlü tabloya taşındı: {converted['rows']} satır "
+                      f"({time.monotonic() - started:.1f}sn). Eski tablo: {converted['legacy_table']} "
+                      f"(kontrol ettikten sonra DROP TABLE ile silin)")
+            else:
+                print("ℹ️ sms_messages zaten bölümlü.")
+        result = maintain(conn)
+    finally:
+        release_db_connection(conn)
+
+    if result.get('skipped'):
+        print("ℹ️ Başka bir süreç bölüm bakımı yapıyor, atlandı.")
+        return 0
+    if not result['partitioned']:
+        print("❌ sms_messages bölümlenmemiş; önce: python manage.py partitions --convert")
+        return 1
+    print(f"✅ Bölüm bakımı ({SMS_PARTITION_INTERVAL}, saklama {SMS_RETENTION_DAYS} gün, {SMS_RETENTION_ACTION}): "
+          f"{result['partitions']} bölüm, oluşturulan: {', '.join(result['created']) or '-'}, "
+          f"süresi dolan: {', '.join(result['expired']) or '-'}")
+    return 0
+
+
+def explain_queries() -> int:
+    """Okuma sorgularında sequential scan varsa 1, yoksa 0 döndürür (CI'da kullanılabilir)"""
+    from chatbot_manager import check_query_plans
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+    try:
+        failures = check_query_plans(conn)
+    finally:
+        release_db_connection(conn)
+
+    if failures:
+        print(f"❌ Sequential scan kullanan sorgular: {', '.join(failures)}")
+        return 1
+    print("✅ Tüm okuma sorguları index kullanıyor.")
+    return 0
+
+
+def export_sms(args) -> int:
+    """SMS geçmişini akış halinde dosyaya / stdout'a yazar (bkz. export.py)"""
+    from export import ExportError, export_params, stream_export
+    from logs import redirect
+
+    if not args.output:
+        redirect(sys.stderr)  # stdout yalnızca veri
+    if args.reparse:
+        use_configured_rules()
+    try:
+        params = export_params(vars(args))
+    except ExportError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    try:
+        stream = stream_export(chunk_size=args.chunk_size, reparse=args.reparse, **params)
+    except Exception as e:
+        print(f"❌ Dışa aktarım başlatılamadı: {e}", file=sys.stderr)
+        return 1
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for chunk in stream:
+            out.write(chunk)
+    except Exception as e:
+        print(f"❌ Dışa aktarım yarıda kaldı: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+def use_configured_rules():
+    """Komut, çalışan uygulamayla aynı kural paketiyle parse etsin (bkz. rules.py)"""
+    from rules import load_configured
+    from sms_parser import activate_rules
+
+    rules = activate_rules(load_configured())
+    print(f"📐 Kural paketi: {rules.version} ({rules.checksum}, {rules.source})", file=sys.stderr)
+
+
+def _print_report(report):
+    print(f"📊 {report['messages']} mesaj: mevcut {report['baseline_ns'] / 1000:.1f}µs/mesaj, "
+          f"aday {report['candidate_ns'] / 1000:.1f}µs/mesaj ({report['slowdown']}x)")
+    print(f"   Yeni bulunan alanlar: {report['improvements']} mesaj, gerileme: {len(report['regressions'])} mesaj")
+    for change, count in report['site_changes'].items():
+        print(f"   site {change}: {count}")
+    print("   Aday paketin site dağılımı: " + ', '.join(f"{site}={count}" for site, count in report['site_counts'].items()))
+    for regression in report['regressions'][:5]:
+        print(f"   ❌ [{regression['language']}] {regression['body'][:80]!r}: "
+              f"{regression['baseline']} -> {regression['candidate']}")
+
+
+def manage_rules(args) -> int:
+    """
+    Kural paketleri (bkz. rules.py): status, export (mevcut paketi JSON olarak
+    yazar), validate (adayı mevcut paketle karşılaştırır) ve activate
+    (doğrulamadan geçen adayı RULE_PACK_SOURCE kaynağına yayımlar; çalışan
+    süreçler RULE_PACK_RELOAD_INTERVAL içinde yeni paketi devreye alır).
+    """
+    from rules import (
+        RULE_PACK_MAX_SLOWDOWN, RULE_PACK_PATH, RULE_PACK_SOURCE, RulePackError, check_report, evaluate,
+        load_configured, load_file, pack_summary, publish_db, sample_corpus, write_file,
+    )
+    from sms_parser import RulePack, builtin_rule_data
+
+    try:
+        current = load_configured()
+    except RulePackError as e:
+        print(f"⚠️ Mevcut paket okunamadı, yerleşik paket kullanılıyor: {e}", file=sys.stderr)
+        current = RulePack(builtin_rule_data())
+
+    if args.action == 'status':
+        print(f"📐 Kaynak: {RULE_PACK_SOURCE}" + (f" ({RULE_PACK_PATH})" if RULE_PACK_SOURCE == 'file' else ''))
+        print(json.dumps(pack_summary(current), ensure_ascii=False, indent=2))
+        return 0
+    if args.action == 'export':
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            json.dump(current.data, out, ensure_ascii=False, indent=2)
+            out.write('\n')
+        finally:
+            if args.output:
+                out.close()
+        return 0
+
+    if not args.path:
+        print(f"❌ {args.action} için paket dosyası gerekli")
+        return 1
+    try:
+        candidate = load_file(args.path)
+    except RulePackError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"📐 Aday: {candidate.version} ({candidate.checksum}), mevcut: {current.version} ({current.checksum})")
+    print(f"   Siteler: {', '.join(candidate.sites)}; baloncuklu: {', '.join(candidate.bubble_sites)}")
+
+    report = evaluate(candidate, current, sample_corpus(args.sample, args.db_sample), args.rounds)
+    _print_report(report)
+    max_slowdown = args.max_slowdown if args.max_slowdown is not None else RULE_PACK_MAX_SLOWDOWN
+    problems = check_report(report, max_slowdown, args.allow_regressions)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✅ Doğrulama başarılı.")
+    if args.action == 'validate':
+        return 0
+
+    if candidate.checksum == current.checksum:
+        print("ℹ️ Paket zaten aktif.")
+        return 0
+    if RULE_PACK_SOURCE == 'file':
+        write_file(candidate.data, RULE_PACK_PATH)
+    elif RULE_PACK_SOURCE == 'db':
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+        try:
+            publish_db(conn, candidate)
+        except RulePackError as e:
+            print(f"❌ {e}")
+            return 1
+        finally:
+            release_db_connection(conn)
+    else:
+        print("❌ RULE_PACK_SOURCE=builtin: yayımlamak için file veya db kaynağı yapılandırın")
+        return 1
+    print(f"✅ {candidate.version} yayımlandı ({RULE_PACK_SOURCE}); süreçler izleme aralığında devreye alacak.")
+    return 0
+
+
+def manage_senders(action: str) -> int:
+    """Gönderici -> site indeksi (bkz. senders.py): learn (şimdi yeniden öğren) veya show"""
+    from senders import SENDER_LEARN_DAYS, SENDER_LEARN_SAMPLE, sender_index
+
+    use_configured_rules()
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+    try:
+        if action == 'learn':
+            result = sender_index.learn(conn, force=True)
+            if result is None:
+                print("ℹ️ Başka bir süreç öğreniyor, atlandı.")
+                return 0
+            print(f"✅ Son {SENDER_LEARN_DAYS} günün en fazla {SENDER_LEARN_SAMPLE} SMS'inden "
+                  f"{result['senders']} gönderici öğrenildi ({result['sample']} SMS, {result['seconds']}sn).")
+        sender_index.load(conn)
+    finally:
+        release_db_connection(conn)
+
+    for sender, entry in sorted(sender_index.mapping().items()):
+        print(f"   {sender:<16} {entry['site']:<14} {entry['source']}")
+    return 0
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Shipliyo bakım komutları")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('migrate', help="Tabloları ve index'leri oluştur (dağıtımda bir kez)")
+
+    partitions = subparsers.add_parser('partitions', help="sms_messages bölümlerini oluştur / süresi dolanları sil")
+    partitions.add_argument('--convert', action='store_true',
+                            help="Bölümlenmemiş eski sms_messages tablosunu bölümlü tabloya taşı")
+
+    reparse = subparsers.add_parser('reparse', help="sms_messages tablosunu yeniden parse et")
+    reparse.add_argument('--chunk-size', type=int, default=1000)
+    reparse.add_argument('--workers', type=int, default=1,
+                         help="1'den büyükse parse işi process havuzuna dağıtılır")
+    reparse.add_argument('--language', choices=['tr', 'bg', 'en'],
+                         help="Verilmezse her SMS için dil otomatik tespit edilir")
+    reparse.add_argument('--only-missing', action='store_true',
+                         help="Yalnızca parse sütunları boş olan (eski) satırları işle")
+
+    subparsers.add_parser('explain', help="Okuma sorgularında sequential scan olmadığını doğrula")
+
+    export = subparsers.add_parser('export', help="sms_messages'ı NDJSON/CSV olarak dışa aktar")
+    export.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    export.add_argument('--site')
+    export.add_argument('--since', help="ISO tarih/zaman (UTC), dahil")
+    export.add_argument('--until', help="ISO tarih/zaman (UTC), hariç")
+    export.add_argument('--chunk-size', type=int, default=2000)
+    export.add_argument('--reparse', action='store_true',
+                        help="Kayıtlı parse alanları yerine her SMS'i yeniden parse et")
+    export.add_argument('--output', help="Verilmezse stdout")
+
+    rules = subparsers.add_parser('rules', help="SMS parse kural paketlerini doğrula / yayımla")
+    rules.add_argument('action', choices=['status', 'export', 'validate', 'activate'])
+    rules.add_argument('path', nargs='?', help="Aday paket (validate/activate)")
+    rules.add_argument('--sample', type=int, default=3000, help="Üretilmiş corpus boyutu")
+    rules.add_argument('--db-sample', type=int, default=0, help="Corpus'a eklenecek son SMS sayısı (sms_messages)")
+    rules.add_argument('--rounds', type=int, default=3)
+    rules.add_argument('--max-slowdown', type=float, help="Varsayılan: RULE_PACK_MAX_SLOWDOWN")
+    rules.add_argument('--allow-regressions', action='store_true',
+                       help="Mevcut paketin bulduğu alanları kaybeden mesajlara rağmen yayımla")
+    rules.add_argument('--output', help="export için; verilmezse stdout")
+
+    senders = subparsers.add_parser('senders', help="Gönderici -> site indeksini öğren / göster")
+    senders.add_argument('action', choices=['learn', 'show'])
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        return migrate_schema()
+    if args.command == 'partitions':
+        return maintain_partitions(args.convert)
+    if args.command == 'reparse':
+        reparse_sms(args.chunk_size, args.workers, args.language, args.only_missing)
+    elif args.command == 'explain':
+        return explain_queries()
+    elif args.command == 'export':
+        return export_sms(args)
+    elif args.command == 'rules':
+        return manage_rules(args)
+    elif args.command == 'senders':
+        return manage_senders(args.action)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import re
+from typing import Iterable, Optional, Sequence, Tuple
+
+
+class PriorityMatcher:
+    """
+    Öncelik sıralı regex listesi için derlenmiş eşleştirici.
+
+    Sonuç, listeyi sırayla dolaşıp ilk eşleşen pattern'in `re.search`
+    sonucunu almakla birebir aynıdır; ancak pattern'ler bir kez derlenir ve
+    bağlı `search` metotları saklanır (her çağrıda re modülü önbelleğine
+    gidilmez).
+
+    Not: Tüm pattern'leri tek bir alternation'da birleştirmek de denendi;
+    CPython'un sre motorunda alternation literal-önek optimizasyonunu
+    kaybettiği için sıralı derlenmiş aramalardan ~2x yavaş ölçüldü.
+    """
+
+    def __init__(self, patterns: Sequence[str], priorities: Optional[Sequence[int]] = None):
+        patterns = list(patterns)
+        if priorities is None:
+            priorities = range(len(patterns))
+        priorities = list(priorities)
+        if len(priorities) != len(patterns):
+            raise ValueError("patterns ve priorities aynı uzunlukta olmalı")
+
+        self.patterns = tuple(patterns)
+        self._searchers = tuple(
+            (priority, re.compile(pattern).search)
+            for priority, pattern in sorted(zip(priorities, patterns), key=lambda item: item[0])
+        )
+
+    def search(self, text: str) -> Optional[Tuple[int, Tuple[Optional[str], ...]]]:
+        """
+        En öncelikli eşleşmeyi döndürür: (öncelik, pattern'in grupları).
+        Hiçbir pattern eşleşmezse None.
+        """
+        for priority, search in self._searchers:
+            match = search(text)
+            if match:
+                return priority, match.groups()
+        return None
+
+
+class KeywordMatcher:
+    """
+    Öncelikli düz metin anahtar kelimeleri için eşleştirici.
+
+    `search` metinde geçen anahtar kelimelerin en küçük önceliğini döndürür.
+    Derleme sırasında gereksiz kelimeler atılır: bir kelime, önceliği kendisinden
+    büyük olmayan başka bir kelimeyi içeriyorsa (ör. 'trendyol' ⊃ 'trend') o
+    kelime hiçbir zaman sonucu değiştiremez.
+    """
+
+    def __init__(self, keywords: Iterable[str], priorities: Iterable[int]):
+        pairs = sorted(set(zip(priorities, keywords)))
+        kept = []
+        for priority, keyword in pairs:
+            redundant = any(
+                other != keyword and other in keyword and other_priority <= priority
+                for other_priority, other in pairs
+            )
+            if not redundant:
+                kept.append((priority, keyword))
+        self.keywords = tuple(kept)
+
+    def search(self, text: str) -> Optional[int]:
+        for priority, keyword in self.keywords:
+            if keyword in text:
+                return priority
+        return None
@@ -0,0 +1,225 @@
+"""
+Bağımlılıksız Prometheus metrikleri (text exposition format 0.0.4).
+
+Süreç içi tek bir `registry` vardır; /metrics onu render eder. Histogram ve
+sayaçlar kilitli sözlüklerde tutulur; gözlem maliyeti birkaç mikrosaniyedir.
+Mevcut stats() sözlükleri (havuz, ingest kuyruğu, önbellek...) register_stats
+ile her scrape'te okunup gauge olarak yayınlanır, ayrıca sayaç tutulmaz.
+
+Not: Değerler süreç başınadır. Gunicorn birden çok worker ile çalışıyorsa her
+scrape bir worker'ın değerlerini görür; `pid` etiketi hangisi olduğunu gösterir.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Saniye cinsinden; bellek önbelleği (~µs) ile yavaş DB sorgusu (~sn) arasını kapsar
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PARSE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: 'Histogram', labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # etiketler -> [kova sayıları..., +Inf sayısı, toplam]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, **labels) -> _Timer:
+        """with HISTOGRAM.time(route='...'): bloğun süresini gözlemler"""
+        return _Timer(self, labels)
+
+    def collect(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        names = self.labelnames + ('le',)
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(values[-1])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._stats = []    # (önek, stats fonksiyonu)
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, stats: Callable[[], Dict]):
+        """stats() sözlüğünün sayısal alanlarını scrape anında `<prefix>_<alan>` gauge'ları olarak yayınlar"""
+        with self._lock:
+            self._stats = [entry for entry in self._stats if entry[0] != prefix] + [(prefix, stats)]
+
+    def _collect_stats(self, prefix: str, stats: Callable[[], Dict]) -> Iterable[str]:
+        try:
+            values = stats()
+        except Exception:
+            return
+        for field, value in values.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+            name = f'{prefix}_{field}'
+            yield f'# TYPE {name} gauge'
+            yield f'{name} {_format_value(value)}'
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            stats = list(self._stats)
+        lines = [
+            '# TYPE shipliyo_process_info gauge',
+            f'shipliyo_process_info{{pid="{os.getpid()}"}} 1',
+        ]
+        for metric in metrics:
+            lines.extend(metric.collect())
+        for prefix, function in stats:
+            lines.extend(self._collect_stats(prefix, function))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# --- Uygulama metrikleri ---
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'shipliyo_http_request_duration_seconds',
+    'Yanıt başlığı gönderilene kadar geçen süre (SSE için ilk bayt)',
+    ('route', 'method', 'status'),
+)
+DB_CONNECT_SECONDS = registry.histogram(
+    'shipliyo_db_connect_seconds', 'Yeni fiziksel PostgreSQL bağlantısı açma süresi',
+)
+DB_QUERY_SECONDS = registry.histogram(
+    'shipliyo_db_query_seconds', 'Uygulama sorgularının süresi', ('query',),
+)
+SMS_PARSE_SECONDS = registry.histogram(
+    'shipliyo_sms_parse_seconds', 'SMSParser.parse_sms süresi', ('language',), PARSE_BUCKETS,
+)
+SMS_INGESTED_TOTAL = registry.counter(
+    'shipliyo_sms_ingested_total', 'Veritabanına yazılan SMS sayısı', ('site',),
+)
+SMS_SITE_RESOLVED_TOTAL = registry.counter(
+    'shipliyo_sms_site_resolved_total', "Ingest'te sitenin nasıl çözüldüğü (sender: gönderici indeksi, body: gövde taraması)",
+    ('method',),
+)
+SMS_DUPLICATES_TOTAL = registry.counter(
+    'shipliyo_sms_duplicates_total', 'Elenen tekrar SMS sayısı (memory: süreç içi önbellek, database: sms_dedup)',
+    ('stage',),
+)
+
+
+def observe_request(route: str, method: str, status: int, started: float):
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=method, status=status)
+
+
+def render_metrics() -> Tuple[str, str]:
+    """(gövde, content-type)"""
+    return registry.render(), CONTENT_TYPE
+
+
+def register_default_stats(pool_stats: Optional[Callable[[], Dict]] = None):
+    """
+    Sunucuların ortak stats() kaynaklarını kaydeder. Import sırası döngüsü
+    olmasın diye (sms_parser bu modülü kullanır) modüller burada içeride alınır.
+    """
+    from ingest import ingest_queue
+    from security.rate_limiter import rate_limiter
+    from sms_cache import recent_sms_cache
+    from sms_events import sms_event_bus
+
+    if pool_stats is not None:
+        registry.register_stats('shipliyo_db_pool', pool_stats)
+    registry.register_stats('shipliyo_ingest', ingest_queue.stats)
+    registry.register_stats('shipliyo_rate_limit', rate_limiter.stats)
+    registry.register_stats('shipliyo_sms_events', sms_event_bus.stats)
+    if recent_sms_cache:
+        registry.register_stats('shipliyo_sms_cache', recent_sms_cache.stats)
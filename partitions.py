@@ -0,0 +1,274 @@
+"""
+sms_messages zaman bölümlemesi ve saklama süresi.
+
+sms_messages, `timestamp` (naive UTC) üzerinde PARTITION BY RANGE bir tablodur
+(bkz. schema.py). Okumaların hepsi son 2 dakika - 2 saatlik pencereye baktığı
+için planlayıcı yalnızca güncel bölümü (ve DEFAULT bölümü) tarar; index'ler
+bölüm başına olduğundan boyutları saklama süresiyle sınırlı kalır.
+
+Bakım (maintain):
+- önümüzdeki SMS_PARTITION_PREMAKE dönem için bölümleri önceden oluşturur;
+  DEFAULT bölüme düşmüş (cihaz saati ileri/geri) satırlar yeni bölüme taşınır,
+- SMS_RETENTION_DAYS verilmişse üst sınırı ondan eski bölümleri ayırır (DETACH)
+  ve arşiv için ayrı tablo olarak bırakır. Varsayılan süresiz saklamadır (0);
+  silme yalnızca SMS_RETENTION_ACTION=drop ile açıkça istenirse yapılır.
+
+Aynı anda tek bir süreç bakım yapar (pg_try_advisory_xact_lock); Flask/ASGI
+süreçlerinde SMS_PARTITION_MAINTENANCE_INTERVAL saniyede bir arka planda, ya da
+zamanlanmış görevden `python manage.py partitions` ile çalışır.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from database import get_db_connection, release_db_connection
+from logs import get_logger
+
+log = get_logger('partitions')
+
+SMS_PARTITION_INTERVAL = os.environ.get('SMS_PARTITION_INTERVAL', 'day')          # day | week
+SMS_PARTITION_PREMAKE = int(os.environ.get('SMS_PARTITION_PREMAKE', 3))
+SMS_RETENTION_DAYS = int(os.environ.get('SMS_RETENTION_DAYS', 0))                  # 0: süresiz sakla
+SMS_RETENTION_ACTION = os.environ.get('SMS_RETENTION_ACTION', 'detach')            # detach | drop
+# sms_dedup özetlerinin saklandığı süre (gateway tekrar denemelerinden uzun olmalı)
+SMS_DEDUP_RETENTION_HOURS = int(os.environ.get('SMS_DEDUP_RETENTION_HOURS', 48))
+# 0: süreç içi bakım kapalı (yalnızca manage.py partitions)
+SMS_PARTITION_MAINTENANCE_INTERVAL = float(os.environ.get('SMS_PARTITION_MAINTENANCE_INTERVAL', 3600))
+
+PARENT = 'sms_messages'
+DEFAULT_PARTITION = 'sms_messages_default'
+MAINTENANCE_LOCK_KEY = 0x5348_4951
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+Partition = Tuple[str, datetime, datetime]  # (ad, alt sınır dahil, üst sınır hariç)
+
+
+def period_step(interval: str = SMS_PARTITION_INTERVAL) -> timedelta:
+    return timedelta(days=7 if interval == 'week' else 1)
+
+
+def period_start(moment: datetime, interval: str = SMS_PARTITION_INTERVAL) -> datetime:
+    """Gün başı; haftalıkta haftanın pazartesisi"""
+    start = datetime(moment.year, moment.month, moment.day)
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def partition_name(start: datetime) -> str:
+    return f'{PARENT}_p{start:%Y%m%d}'
+
+
+def is_partitioned(cur) -> bool:
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (PARENT,))
+    row = cur.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions(cur) -> List[Partition]:
+    """Aralık bölümleri, alt sınıra göre sıralı (DEFAULT bölüm hariç)"""
+    cur.execute('''
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    ''', (PARENT,))
+    partitions = []
+    for name, bound in cur.fetchall():
+        match = _BOUND_RE.search(bound or '')
+        if match:
+            partitions.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _create_partition(cur, start: datetime, end: datetime) -> str:
+    """
+    Bölümü oluşturur. DEFAULT bölümde bu aralığa düşen satırlar varsa PostgreSQL
+    CREATE ... PARTITION OF'u reddeder; bu yüzden önce onlar çıkarılıp sonra
+    yeni bölüm üzerinden geri yazılır (aynı transaction içinde).
+    """
+    name = partition_name(start)
+    bounds = (start.isoformat(sep=' '), end.isoformat(sep=' '))
+    cur.execute(sql.SQL('''
+        CREATE TEMP TABLE sms_partition_moved AS
+        WITH moved AS (DELETE FROM {} WHERE timestamp >= %s AND timestamp < %s RETURNING *)
+        SELECT * FROM moved
+    ''').format(sql.Identifier(DEFAULT_PARTITION)), bounds)
+    moved = cur.rowcount
+    cur.execute(sql.SQL('CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)').format(
+        sql.Identifier(name), sql.Identifier(PARENT)), bounds)
+    if moved:
+        cur.execute(sql.SQL('INSERT INTO {} SELECT * FROM sms_partition_moved').format(sql.Identifier(PARENT)))
+    cur.execute('DROP TABLE sms_partition_moved')
+    return name
+
+
+def ensure_partitions(cur, now: datetime, since: Optional[datetime] = None) -> List[str]:
+    """`since` (varsayılan: şimdi) döneminden SMS_PARTITION_PREMAKE dönem sonrasına kadar eksik bölümleri oluşturur"""
+    step = period_step()
+    start = period_start(since or now)
+    until = period_start(now) + step * (SMS_PARTITION_PREMAKE + 1)
+    existing = list_partitions(cur)
+    created = []
+    while start < until:
+        end = start + step
+        # Aralık değişmişse (day <-> week) çakışan dönem atlanır; boşluklar DEFAULT'a düşer
+        if not any(low < end and start < high for _, low, high in existing):
+            created.append(_create_partition(cur, start, end))
+        start = end
+    return created
+
+
+def expire_partitions(cur, now: datetime) -> List[str]:
+    """
+    Tamamı saklama süresinden eski bölümleri ayırır; SMS_RETENTION_ACTION=drop
+    ise bunları ve DEFAULT bölümdeki eski satırları siler.
+    """
+    if SMS_RETENTION_DAYS <= 0:
+        return []
+    cutoff = now - timedelta(days=SMS_RETENTION_DAYS)
+    expired = []
+    for name, _, high in list_partitions(cur):
+        if high > cutoff:
+            break
+        cur.execute(sql.SQL('ALTER TABLE {} DETACH PARTITION {}').format(sql.Identifier(PARENT), sql.Identifier(name)))
+        if SMS_RETENTION_ACTION == 'drop':
+            cur.execute(sql.SQL('DROP TABLE {}').format(sql.Identifier(name)))
+        expired.append(name)
+    if SMS_RETENTION_ACTION == 'drop':
+        cur.execute(sql.SQL('DELETE FROM {} WHERE timestamp < %s').format(sql.Identifier(DEFAULT_PARTITION)), (cutoff,))
+    return expired
+
+
+def prune_dedup(cur, now: datetime) -> int:
+    """SMS_DEDUP_RETENTION_HOURS'tan eski tekrar kontrolü özetlerini siler"""
+    cur.execute('DELETE FROM sms_dedup WHERE seen_at < %s', (now - timedelta(hours=SMS_DEDUP_RETENTION_HOURS),))
+    return cur.rowcount
+
+
+def maintain(conn, now: Optional[datetime] = None) -> Dict:
+    """
+    Bölüm bakımını tek transaction'da yapar ve commit eder. Başka bir süreç
+    bakım yapıyorsa beklemeden {'skipped': True} döner; tablo bölümlenmemişse
+    {'partitioned': False}. Her iki durumda da eski sms_dedup özetleri silinir.
+    """
+    now = now or datetime.utcnow()
+    cur = conn.cursor()
+    try:
+        # DDL üst tabloda kısa süreli ACCESS EXCLUSIVE kilit alır; trafiği uzun süre bekletmesin
+        cur.execute("SET LOCAL lock_timeout = '5s'")
+        cur.execute('SELECT pg_try_advisory_xact_lock(%s)', (MAINTENANCE_LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return {'skipped': True}
+        dedup_pruned = prune_dedup(cur, now)
+        if not is_partitioned(cur):
+            conn.commit()
+            return {'partitioned': False, 'dedup_pruned': dedup_pruned}
+        created = ensure_partitions(cur, now)
+        expired = expire_partitions(cur, now)
+        partitions = len(list_partitions(cur))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return {'partitioned': True, 'created': created, 'expired': expired, 'partitions': partitions,
+            'dedup_pruned': dedup_pruned}
+
+
+class PartitionMaintainer:
+    """
+    Süreç içi periyodik bakım. Flask modunda lazy başlatılan bir daemon thread
+    (fork sonrası her worker'da; advisory lock sayesinde işi yalnızca biri yapar),
+    ASGI modunda lifespan'de başlatılan bir coroutine çalıştırır.
+    """
+
+    def __init__(self, interval: float = SMS_PARTITION_MAINTENANCE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.runs = 0
+        self.failures = 0
+        self.created_total = 0
+        self.expired_total = 0
+        self.partitions = None
+        self.last_run_at = None     # time.monotonic()
+        self.last_error = None
+
+    def run_once(self) -> Optional[Dict]:
+        conn = get_db_connection()
+        if not conn:
+            return None
+        try:
+            result = maintain(conn)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+            log.error('partition_maintenance_failed', error=str(e))
+            return None
+        finally:
+            release_db_connection(conn)
+
+        with self._lock:
+            self.runs += 1
+            self.last_run_at = time.monotonic()
+            self.last_error = None
+            if result.get('partitioned'):
+                self.created_total += len(result['created'])
+                self.expired_total += len(result['expired'])
+                self.partitions = result['partitions']
+        if result.get('created') or result.get('expired'):
+            log.info('partition_maintenance', created=result['created'], expired=result['expired'])
+        return result
+
+    def ensure_thread(self):
+        if self.interval <= 0:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='sms-partitions', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.run_once()
+            time.sleep(self.interval)
+
+    async def run_async(self):
+        """ASGI lifespan'inde task olarak çalışır; psycopg2 çağrıları thread'e devredilir"""
+        if self.interval <= 0:
+            return
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'failures': self.failures,
+                'created_total': self.created_total,
+                'expired_total': self.expired_total,
+                'partitions': self.partitions,
+                'last_run_age_seconds': round(time.monotonic() - self.last_run_at, 1) if self.last_run_at else None,
+                'last_error': self.last_error,
+            }
+
+
+# Süreç geneli bakım görevi
+partition_maintainer = PartitionMaintainer()
@@ -1,70 +1,156 @@
-class ResponseManager:
-    def __init__(self):
-        self.responses = {
-            'tr': {
-                'welcome': "Hoş geldiniz! Size nasıl yardımcı olabilirim?",
-                'reference_found': "✅ {site} onay kodunuz: {code}",
-                'no_reference': "❌ Bu referans koduyla mesaj bulunamadı",
-                'choose_site': "📱 Hangi siteden kod istiyorsunuz?",
-                'get_code_intent': "Lütfen SMS onay kodunu gönderin veya 'kod' yazın",
-                'site_options': "Lütfen bir site seçin:",
-                'invalid_choice': "❌ Geçersiz seçim. Lütfen listeden bir seçenek belirtin:",
-                'processing': "⏳ İsteğiniz işleniyor...",
-                'multiple_sms_found': "📨 Son {seconds} saniyede {count} mesaj bulundu:",
-                'no_recent_sms': "❌ Son {seconds} saniyede {site} mesajı bulunamadı",
-                'unknown_message': "🤔 Anlayamadım. Referans kodu girin veya 'kod' yazın.",
-                'help_response': '''
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional
+
+from sms_parser import active_rules
+
+
+# Yanıt tabloları modül seviyesinde bir kez oluşturulur ve salt-okunur tutulur;
+# ResponseManager örnekleri bu tabloları paylaşır, her istekte yeniden kurulmaz.
+_RESPONSES = {
+    'tr': {
+        'welcome': "Hoş geldiniz! Size nasıl yardımcı olabilirim?",
+        'reference_found': "✅ {site} onay kodunuz: {code}",
+        'no_reference': "❌ Bu referans koduyla mesaj bulunamadı",
+        'choose_site': "📱 Hangi siteden kod istiyorsunuz?",
+        'get_code_intent': "Lütfen SMS onay kodunu gönderin veya 'kod' yazın",
+        'site_options': "Lütfen bir site seçin:",
+        'invalid_choice': "❌ Geçersiz seçim. Lütfen listeden bir seçenek belirtin:",
+        'processing': "⏳ İsteğiniz işleniyor...",
+        'multiple_sms_found': "📨 Son {seconds} saniyede {count} mesaj bulundu:",
+        'no_recent_sms': "❌ Son {seconds} saniyede {site} mesajı bulunamadı",
+        'unknown_message': "🤔 Anlayamadım. Referans kodu girin veya 'kod' yazın.",
+        'help_response': '''
 📋 **Kullanım Kılavuzu:**
 • SMS onay kodunu doğrudan gönderin (örn: A1B2C3)
 • "kod" yazarak site seçimine gidin
 • "yardım" yazarak bu bilgiyi görün
 
-📍 **Desteklenen Siteler:** Trendyol, Hepsiburada, N11
+📍 **Desteklenen Siteler:** {sites}
                 '''
-            },
-            'bg': {
-                'welcome': "Добре дошли! Как мога да ви помогна?",
-                'reference_found': "✅ {site} потвърдителен код: {code}",
-                'no_reference': "❌ Не е намерено съобщение с този референтен код",
-                'choose_site': "📱 От кой сайт искате код?",
-                'get_code_intent': "Моля, изпратете SMS с код или напишете 'код'",
-                'site_options': "Моля, изберете сайт:",
-                'invalid_choice': "❌ Невалиден избор. Моля, изберете от списъка:",
-                'processing': "⏳ Обработвам вашата заявка...",
-                'multiple_sms_found': "📨 Намерени {count} съобщения през последните {seconds} секунди:",
-                'no_recent_sms': "❌ Не са намерени {site} съобщения през последните {seconds} секунди",
-                'unknown_message': "🤔 Не разбирам. Въведете референтен код или напишете 'код'.",
-                'help_response': '''
+    },
+    'bg': {
+        'welcome': "Добре дошли! Как мога да ви помогна?",
+        'reference_found': "✅ {site} потвърдителен код: {code}",
+        'no_reference': "❌ Не е намерено съобщение с този референтен код",
+        'choose_site': "📱 От кой сайт искате код?",
+        'get_code_intent': "Моля, изпратете SMS с код или напишете 'код'",
+        'site_options': "Моля, изберете сайт:",
+        'invalid_choice': "❌ Невалиден избор. Моля, изберете от списъка:",
+        'processing': "⏳ Обработвам вашата заявка...",
+        'multiple_sms_found': "📨 Намерени {count} съобщения през последните {seconds} секунди:",
+        'no_recent_sms': "❌ Не са намерени {site} съобщения през последните {seconds} секунди",
+        'unknown_message': "🤔 Не разбирам. Въведете референтен код или напишете 'код'.",
+        'help_response': '''
 📋 **Наръчник за употреба:**
 • Изпратете кода за потвърждение директно (напр: A1B2C3)
 • Напишете "код", за да изберете сайт
 • Напишете "помощ" за тази информация
 
-📍 **Поддържани сайтове:** Trendyol, Hepsiburada, N11
+📍 **Поддържани сайтове:** {sites}
                 '''
-            },
-            'en': {
-                'welcome': "Welcome! How can I help you?",
-                'reference_found': "✅ {site} verification code: {code}",
-                'no_reference': "❌ No message found with this reference code",
-                'choose_site': "📱 Which site do you want the code from?",
-                'get_code_intent': "Please send the SMS verification code or type 'code'",
-                'site_options': "Please select a site:",
-                'invalid_choice': "❌ Invalid choice. Please select from the list:",
-                'processing': "⏳ Processing your request...",
-                'multiple_sms_found': "📨 Found {count} messages in the last {seconds} seconds:",
-                'no_recent_sms': "❌ No {site} messages found in the last {seconds} seconds",
-                'unknown_message': "🤔 I don't understand. Enter a reference code or type 'code'.",
-                'help_response': '''
+    },
+    'en': {
+        'welcome': "Welcome! How can I help you?",
+        'reference_found': "✅ {site} verification code: {code}",
+        'no_reference': "❌ No message found with this reference code",
+        'choose_site': "📱 Which site do you want the code from?",
+        'get_code_intent': "Please send the SMS verification code or type 'code'",
+        'site_options': "Please select a site:",
+        'invalid_choice': "❌ Invalid choice. Please select from the list:",
+        'processing': "⏳ Processing your request...",
+        'multiple_sms_found': "📨 Found {count} messages in the last {seconds} seconds:",
+        'no_recent_sms': "❌ No {site} messages found in the last {seconds} seconds",
+        'unknown_message': "🤔 I don't understand. Enter a reference code or type 'code'.",
+        'help_response': '''
 📋 **Usage Guide:**
 • Send the verification code directly (eg: A1B2C3)
 • Type "code" to choose a site  
 • Type "help" for this information
 
-📍 **Supported Sites:** Trendyol, Hepsiburada, N11
+📍 **Supported Sites:** {sites}
                 '''
-            }
-        }
+    }
+}
+
+RESPONSES = MappingProxyType({
+    language: MappingProxyType(texts) for language, texts in _RESPONSES.items()
+})
+
+DEFAULT_LANGUAGE = 'tr'
+
+
+def explicit_language(requested: Optional[str]) -> Optional[str]:
+    """Açıkça istenen dil destekleniyorsa ana dili ('en-US' -> 'en'), değilse None"""
+    if requested:
+        language = requested.strip().lower().replace('_', '-').split('-')[0]
+        if language in RESPONSES:
+            return language
+    return None
+
+
+@lru_cache(maxsize=512)
+def negotiate_language(requested: Optional[str], accept_language: Optional[str] = None) -> str:
+    """
+    Yanıt dilini seçer: önce istemcinin açıkça gönderdiği dil (widget'ın
+    `language` alanı), yoksa Accept-Language başlığındaki en yüksek q değerli
+    desteklenen dil, o da yoksa Türkçe. 'en-US' gibi bölgeli değerler ana dile
+    indirgenir. Sonuç her zaman RESPONSES'taki bir dildir; başlık değerleri
+    tekrar ettiği için sonuç önbelleklenir.
+    """
+    language = explicit_language(requested)
+    if language:
+        return language
+
+    if accept_language:
+        candidates = []
+        for position, part in enumerate(accept_language.split(',')):
+            tag, _, params = part.strip().partition(';')
+            language = tag.strip().lower().split('-')[0]
+            if language not in RESPONSES:
+                continue
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    continue
+            if quality > 0:
+                candidates.append((-quality, position, language))
+        if candidates:
+            return min(candidates)[2]
+
+    return DEFAULT_LANGUAGE
+
+
+MAIN_MENU_BUBBLES = MappingProxyType({
+    'tr': (
+        {"title": "📱 Kod Al", "payload": "get_code"},
+        {"title": "❓ Yardım", "payload": "help"}
+    ),
+    'bg': (
+        {"title": "📱 Вземи код", "payload": "get_code"},
+        {"title": "❓ Помощ", "payload": "help"}
+    ),
+    'en': (
+        {"title": "📱 Get Code", "payload": "get_code"},
+        {"title": "❓ Help", "payload": "help"}
+    )
+})
+
+# Site baloncukları aktif kural paketinden gelir (bkz. sms_parser.RulePack);
+# 'other' baloncuğu paketteki baloncuklu sitelerin dışındaki tüm SMS'leri kapsar
+OTHER_SITE_BUBBLES = MappingProxyType({
+    'tr': {"title": "🔍 Diğer Siteler", "payload": "other"},
+    'bg': {"title": "🔍 Други сайтове", "payload": "other"},
+    'en': {"title": "🔍 Other Sites", "payload": "other"},
+})
+
+
+class ResponseManager:
+    def __init__(self):
+        self.responses = RESPONSES
 
     def get_response(self, key, language='tr', **kwargs):
         """Dil ve anahtara göre response döndürür"""
@@ -102,8 +188,10 @@ class ResponseManager:
         return list(self.responses.keys())
 
     def get_help_response(self, language='tr'):
-        """Yardım mesajını döndürür"""
-        return self.get_response('help_response', language)
+        """Yardım mesajını döndürür (desteklenen siteler aktif kural paketinden)"""
+        rules = active_rules()
+        return self.get_response('help_response', language,
+                                 sites=', '.join(rules.site_title(site) for site in rules.bubble_sites))
 
     def get_welcome_message(self, language='tr'):
         """Hoş geldin mesajını döndürür"""
@@ -124,45 +212,11 @@ class ResponseManager:
     # YENİ BALONCUK FONKSİYONLARI
     def get_main_menu_bubbles(self, language='tr'):
         """İlk ekran baloncukları"""
-        bubbles = {
-            'tr': [
-                {"title": "📱 Kod Al", "payload": "get_code"},
-                {"title": "❓ Yardım", "payload": "help"}
-            ],
-            'bg': [
-                {"title": "📱 Вземи код", "payload": "get_code"},
-                {"title": "❓ Помощ", "payload": "help"}
-            ],
-            'en': [
-                {"title": "📱 Get Code", "payload": "get_code"},
-                {"title": "❓ Help", "payload": "help"}
-            ]
-        }
-        return bubbles.get(language, bubbles['tr'])
+        return list(MAIN_MENU_BUBBLES.get(language, MAIN_MENU_BUBBLES['tr']))
 
     def get_site_bubbles(self, language='tr'):
         """Site seçim baloncukları"""
-        bubbles = {
-            'tr': [
-                {"title": "🛍️ Trendyol", "payload": "trendyol"},
-                {"title": "📦 Hepsiburada", "payload": "hepsiburada"},
-                {"title": "🏪 N11", "payload": "n11"},
-                {"title": "🔍 Diğer Siteler", "payload": "other"}
-            ],
-            'bg': [
-                {"title": "🛍️ Trendyol", "payload": "trendyol"},
-                {"title": "📦 Hepsiburada", "payload": "hepsiburada"},
-                {"title": "🏪 N11", "payload": "n11"},
-                {"title": "🔍 Други сайтове", "payload": "other"}
-            ],
-            'en': [
-                {"title": "🛍️ Trendyol", "payload": "trendyol"},
-                {"title": "📦 Hepsiburada", "payload": "hepsiburada"},
-                {"title": "🏪 N11", "payload": "n11"},
-                {"title": "🔍 Other Sites", "payload": "other"}
-            ]
-        }
-        return bubbles.get(language, bubbles['tr'])
+        return [*active_rules().site_bubbles, OTHER_SITE_BUBBLES.get(language, OTHER_SITE_BUBBLES['tr'])]
 
 
 # Test fonksiyonu - GÜNCELLENMİŞ
@@ -0,0 +1,492 @@
+"""
+SMS parse kural paketleri: yükleme, canlı değiştirme ve devreye almadan önce doğrulama.
+
+Kural paketi, SMSParser'ın yerleşik tablolarıyla aynı bilgiyi taşıyan bir JSON
+belgesidir (yerleşik paket için: python manage.py rules export):
+
+    {
+      "version": "2025-03-01",
+      "sites": [
+        {"id": "temu", "title": "Temu", "emoji": "🧡", "bubble": true, "senders": ["TEMU"],
+         "keywords": {"tr": ["temu"], "en": ["temu"]}}
+      ],
+      "ref_patterns": {"en": ["ref[:\\s]*([a-z0-9]{4,6})"]},
+      "verification_patterns": {"en": ["(\\d{5,6})"]}
+    }
+
+Sitelerin sırası önceliktir (ilk eşleşen site kazanır); her pattern'in ilk
+grubu yakalanan koddur; 'en' tabloları tanımsız diller için yedektir.
+`senders`, ingest'te gövde taramasından önce bakılan alfanümerik gönderici
+adlarıdır (bkz. senders.py).
+
+Kaynak RULE_PACK_SOURCE ile seçilir:
+- builtin: SMSParser sınıf tabloları (varsayılan),
+- file: RULE_PACK_PATH'teki JSON dosyası; değiştirilme zamanı izlenir,
+- db: rule_packs tablosundaki aktif satır; aktif özet (checksum) izlenir.
+
+Her süreç kaynağı RULE_PACK_RELOAD_INTERVAL saniyede bir kontrol eder; paket
+değiştiyse bir kez derlenip sms_parser.activate_rules() ile atomik olarak
+devreye alınır. Derlenemeyen paket loglanır ve mevcut paket çalışmaya devam eder.
+
+Yeni paket `python manage.py rules activate paket.json` ile yayımlanır: paket
+önce örnek bir corpus (üretilmiş + DB'deki son SMS'ler) üzerinde mevcut paketle
+karşılaştırılır; mevcut paketin bulduğu kod/site'yi kaybeden mesajlar ya da
+RULE_PACK_MAX_SLOWDOWN'dan fazla yavaşlama varsa yayımlanmaz.
+"""
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2.extras import Json
+
+from database import get_db_connection, release_db_connection
+from logs import get_logger
+from sms_corpus import generate_corpus
+from sms_parser import RulePack, SMSParser, active_rules, activate_rules, builtin_rule_data, normalize_sender
+
+log = get_logger('rules')
+
+RULE_PACK_SOURCE = os.environ.get('RULE_PACK_SOURCE', 'builtin')                  # builtin | file | db
+RULE_PACK_PATH = os.environ.get('RULE_PACK_PATH', 'rule_packs/active.json')
+RULE_PACK_RELOAD_INTERVAL = float(os.environ.get('RULE_PACK_RELOAD_INTERVAL', 10))  # 0: izleme kapalı
+# Doğrulamada yeni paketin mesaj başına süresi mevcut paketin en fazla bu katı olabilir
+RULE_PACK_MAX_SLOWDOWN = float(os.environ.get('RULE_PACK_MAX_SLOWDOWN', 1.5))
+
+SOURCES = ('builtin', 'file', 'db')
+
+SITE_ID_RE = re.compile(r'^[a-z0-9_]{2,32}$')
+LANGUAGE_RE = re.compile(r'^[a-z]{2}$')
+# Widget payload'larıyla çakışan site kimlikleri (bkz. chatbot_manager.PAYLOAD_ACTIONS)
+RESERVED_SITE_IDS = frozenset(('other', 'get_code', 'help', 'get_address', 'main_menu'))
+
+Corpus = List[Tuple[str, str]]  # (gövde, dil)
+
+
+class RulePackError(ValueError):
+    """Kural paketi okunamadı, geçersiz ya da doğrulamadan geçemedi"""
+
+
+# --- Yapı kontrolü ve derleme ---
+def _check_patterns(name: str, patterns, errors: List[str]):
+    if not isinstance(patterns, dict) or not patterns:
+        errors.append(f"{name}: dil -> pattern listesi sözlüğü olmalı")
+        return
+    if 'en' not in patterns:
+        errors.append(f"{name}: 'en' (yedek) tablosu zorunlu")
+    for language, items in patterns.items():
+        if not LANGUAGE_RE.match(str(language)):
+            errors.append(f"{name}: geçersiz dil kodu {language!r}")
+        if not isinstance(items, list) or not items:
+            errors.append(f"{name}.{language}: boş olmayan liste olmalı")
+            continue
+        for pattern in items:
+            try:
+                compiled = re.compile(pattern)
+            except (re.error, TypeError) as e:
+                errors.append(f"{name}.{language}: derlenemedi {pattern!r} ({e})")
+                continue
+            if compiled.groups < 1:
+                errors.append(f"{name}.{language}: {pattern!r} yakalama grubu içermiyor")
+
+
+def validate_structure(data) -> List[str]:
+    """Paket belgesinin biçim hatalarını döndürür (boş liste = geçerli)"""
+    if not isinstance(data, dict):
+        return ["Kural paketi bir JSON nesnesi olmalı"]
+    errors = []
+    version = data.get('version')
+    if not isinstance(version, str) or not version.strip() or len(version) > 64:
+        errors.append("version: boş olmayan (en fazla 64 karakter) metin olmalı")
+
+    sites = data.get('sites')
+    if not isinstance(sites, list) or not sites:
+        errors.append("sites: boş olmayan liste olmalı")
+        sites = []
+    seen = set()
+    seen_senders = set()
+    for position, site in enumerate(sites):
+        if not isinstance(site, dict):
+            errors.append(f"sites[{position}]: nesne olmalı")
+            continue
+        site_id = site.get('id')
+        if not isinstance(site_id, str) or not SITE_ID_RE.match(site_id) or site_id in RESERVED_SITE_IDS:
+            errors.append(f"sites[{position}].id: geçersiz veya ayrılmış kimlik {site_id!r}")
+        elif site_id in seen:
+            errors.append(f"sites[{position}].id: tekrar eden kimlik {site_id!r}")
+        seen.add(site_id)
+        for field in ('title', 'emoji'):
+            if site.get(field) is not None and not isinstance(site[field], str):
+                errors.append(f"sites[{position}].{field}: metin olmalı")
+        if not isinstance(site.get('bubble', False), bool):
+            errors.append(f"sites[{position}].bubble: true/false olmalı")
+        senders = site.get('senders', [])
+        if not isinstance(senders, list):
+            errors.append(f"sites[{position}].senders: liste olmalı")
+            senders = []
+        for sender in senders:
+            key = normalize_sender(sender) if isinstance(sender, str) else None
+            if key is None:
+                errors.append(f"sites[{position}].senders: alfanümerik gönderici adı değil {sender!r}")
+            elif key in seen_senders:
+                errors.append(f"sites[{position}].senders: başka bir sitede de tanımlı {sender!r}")
+            seen_senders.add(key)
+        keywords = site.get('keywords')
+        if not isinstance(keywords, dict) or not keywords:
+            errors.append(f"sites[{position}].keywords: dil -> anahtar kelime listesi sözlüğü olmalı")
+            continue
+        for language, items in keywords.items():
+            if not LANGUAGE_RE.match(str(language)):
+                errors.append(f"sites[{position}].keywords: geçersiz dil kodu {language!r}")
+            if not isinstance(items, list) or not all(isinstance(item, str) and item for item in items):
+                errors.append(f"sites[{position}].keywords.{language}: boş olmayan metin listesi olmalı")
+            elif any(item != item.lower() for item in items):
+                # Aramalar küçük harfe çevrilmiş gövdede yapılır
+                errors.append(f"sites[{position}].keywords.{language}: anahtar kelimeler küçük harf olmalı")
+
+    _check_patterns('ref_patterns', data.get('ref_patterns'), errors)
+    _check_patterns('verification_patterns', data.get('verification_patterns'), errors)
+    return errors
+
+
+def compile_pack(data, source: str) -> RulePack:
+    """Belgeyi doğrulayıp derler; hatada RulePackError"""
+    errors = validate_structure(data)
+    if errors:
+        raise RulePackError(f"{source}: " + '; '.join(errors[:10]))
+    try:
+        return RulePack(data, source)
+    except Exception as e:
+        raise RulePackError(f"{source}: derlenemedi ({e})")
+
+
+# --- Kaynaklar ---
+def load_file(path: str = RULE_PACK_PATH) -> RulePack:
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RulePackError(f"{path}: okunamadı ({e})")
+    return compile_pack(data, f'file:{path}')
+
+
+def write_file(data: Dict, path: str = RULE_PACK_PATH):
+    """Dosyayı atomik olarak değiştirir (izleyiciler yarım yazılmış dosya görmez)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.rule-pack-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+def active_db_checksum(conn) -> Optional[str]:
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT checksum FROM rule_packs WHERE active')
+        row = cur.fetchone()
+        conn.rollback()
+        return row[0] if row else None
+    finally:
+        cur.close()
+
+
+def load_db(conn) -> Optional[RulePack]:
+    """rule_packs'taki aktif paket; aktif satır yoksa None"""
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT version, pack FROM rule_packs WHERE active')
+        row = cur.fetchone()
+        conn.rollback()
+    finally:
+        cur.close()
+    if row is None:
+        return None
+    return compile_pack(row[1], f'db:{row[0]}')
+
+
+def publish_db(conn, rules: RulePack):
+    """Paketi rule_packs'a yazar ve tek transaction'da aktif yapar; sürümler değiştirilemez"""
+    cur = conn.cursor()
+    try:
+        cur.execute('''
+            INSERT INTO rule_packs (version, pack, checksum) VALUES (%s, %s, %s)
+            ON CONFLICT (version) DO NOTHING
+        ''', (rules.version, Json(rules.data), rules.checksum))
+        cur.execute('SELECT checksum FROM rule_packs WHERE version = %s', (rules.version,))
+        if cur.fetchone()[0] != rules.checksum:
+            raise RulePackError(f"{rules.version} sürümü farklı içerikle zaten kayıtlı; yeni bir version verin")
+        cur.execute('UPDATE rule_packs SET active = FALSE WHERE active AND version <> %s', (rules.version,))
+        cur.execute("UPDATE rule_packs SET active = TRUE, activated_at = (now() AT TIME ZONE 'UTC') "
+                    "WHERE version = %s", (rules.version,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def load_configured(source: str = RULE_PACK_SOURCE) -> RulePack:
+    """Yapılandırılmış kaynaktaki paket (devreye almaz); DB'de aktif paket yoksa yerleşik paket"""
+    if source == 'file':
+        return load_file()
+    if source == 'db':
+        conn = get_db_connection()
+        if not conn:
+            raise RulePackError("Veritabanı bağlantısı kurulamadı")
+        try:
+            rules = load_db(conn)
+        finally:
+            release_db_connection(conn)
+        if rules is not None:
+            return rules
+    return RulePack(builtin_rule_data())
+
+
+# --- Canlı değiştirme ---
+class RulePackWatcher:
+    """
+    Kaynağı periyodik kontrol edip değişen paketi devreye alır. Flask modunda
+    lazy başlatılan bir daemon thread (fork sonrası her worker'da), ASGI
+    modunda lifespan'de başlatılan bir coroutine çalıştırır. Kontrol ucuzdur:
+    dosyada os.stat, DB'de aktif satırın özeti; paket yalnızca değişince okunur.
+    """
+
+    def __init__(self, source: str = RULE_PACK_SOURCE, path: str = RULE_PACK_PATH,
+                 interval: float = RULE_PACK_RELOAD_INTERVAL):
+        self.source = source if source in SOURCES else 'builtin'
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._file_key = None
+        self.checks = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload_at = None  # time.monotonic()
+        self.last_compile_seconds = None
+        self.last_error = None
+        if source not in SOURCES:
+            log.error('rule_pack_source_invalid', source=source)
+
+    def check(self) -> bool:
+        """Kaynak değiştiyse paketi derleyip devreye alır; değiştirildiyse True"""
+        if self.source == 'builtin':
+            return False
+        with self._check_lock:
+            try:
+                started = time.perf_counter()
+                rules = self._load_changed()
+                compile_seconds = time.perf_counter() - started
+            except Exception as e:
+                with self._lock:
+                    self.checks += 1
+                    self.failures += 1
+                    self.last_error = str(e)
+                log.error('rule_pack_load_failed', source=self.source, error=str(e))
+                return False
+            with self._lock:
+                self.checks += 1
+                self.last_error = None
+            current = active_rules()
+            if rules is None or rules.checksum == current.checksum:
+                return False
+            activate_rules(rules)
+            with self._lock:
+                self.reloads += 1
+                self.last_reload_at = time.monotonic()
+                self.last_compile_seconds = round(compile_seconds, 4)
+            log.info('rule_pack_activated', version=rules.version, checksum=rules.checksum,
+                     previous=current.checksum, source=rules.source, sites=len(rules.sites),
+                     seconds=round(compile_seconds, 4))
+            return True
+
+    def _load_changed(self) -> Optional[RulePack]:
+        if self.source == 'file':
+            stat = os.stat(self.path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            if key == self._file_key:
+                return None
+            rules = load_file(self.path)
+            self._file_key = key
+            return rules
+
+        conn = get_db_connection()
+        if not conn:
+            raise RulePackError("Veritabanı bağlantısı kurulamadı")
+        try:
+            checksum = active_db_checksum(conn)
+            if checksum is None or checksum == active_rules().checksum:
+                return None
+            return load_db(conn)
+        finally:
+            release_db_connection(conn)
+
+    def ensure_thread(self):
+        if self.source == 'builtin' or self.interval <= 0:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='rule-pack-watch', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    async def run_async(self):
+        """ASGI lifespan'inde task olarak çalışır; dosya/DB okuması ve derleme thread'e devredilir"""
+        if self.source == 'builtin':
+            return
+        await asyncio.to_thread(self.check)
+        if self.interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.check)
+
+    def stats(self) -> Dict:
+        rules = active_rules()
+        with self._lock:
+            return {
+                'source': self.source,
+                'version': rules.version,
+                'checksum': rules.checksum,
+                'sites': len(rules.sites),
+                'checks': self.checks,
+                'reloads': self.reloads,
+                'failures': self.failures,
+                'last_compile_seconds': self.last_compile_seconds,
+                'last_reload_age_seconds': round(time.monotonic() - self.last_reload_at, 1) if self.last_reload_at else None,
+                'last_error': self.last_error,
+            }
+
+
+# Süreç geneli izleyici
+rule_pack_watcher = RulePackWatcher()
+
+
+# --- Devreye almadan önce doğrulama ---
+def sample_corpus(size: int = 3000, db_sample: int = 0) -> Corpus:
+    """
+    Üretilmiş corpus (sms_corpus.py) + DB'deki son `db_sample` SMS.
+    DB satırlarının dili kayıtlı değilse SMSParser.detect_language ile tespit edilir.
+    """
+    corpus = generate_corpus(size)
+    if db_sample <= 0:
+        return corpus
+    conn = get_db_connection()
+    if not conn:
+        raise RulePackError("Veritabanı bağlantısı kurulamadı")
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT body, language FROM sms_messages ORDER BY timestamp DESC LIMIT %s', (db_sample,))
+        rows = cur.fetchall()
+        cur.close()
+        conn.rollback()
+    finally:
+        release_db_connection(conn)
+    parser = SMSParser()
+    return corpus + [(body, language or parser.detect_language(body)) for body, language in rows]
+
+
+def _parse_corpus(rules: RulePack, corpus: Corpus) -> List[Tuple]:
+    """(site, ref_code, verification_code) listesi; SMSParser.parse_sms ile aynı adımlar"""
+    results = []
+    for body, language in corpus:
+        engine = rules.engine(language)
+        sms_lower = body.lower()
+        results.append((engine.detect_site(sms_lower), engine.extract_ref_code(sms_lower),
+                        engine.extract_verification_code(sms_lower)))
+    return results
+
+
+def _time_per_message(packs: Tuple[RulePack, ...], corpus: Corpus, rounds: int) -> List[float]:
+    """Her paket için en iyi turun mesaj başına süresi (ns); turlar sırayla dönüşümlü ölçülür"""
+    best = [None] * len(packs)
+    for _ in range(rounds):
+        for index, rules in enumerate(packs):
+            started = time.perf_counter_ns()
+            _parse_corpus(rules, corpus)
+            elapsed = time.perf_counter_ns() - started
+            best[index] = elapsed if best[index] is None else min(best[index], elapsed)
+    return [elapsed / max(len(corpus), 1) for elapsed in best]
+
+
+def evaluate(candidate: RulePack, baseline: RulePack, corpus: Corpus, rounds: int = 3) -> Dict:
+    """
+    Adayı mevcut paketle aynı corpus üzerinde karşılaştırır. Gerileme: mevcut
+    paketin bulduğu bir alanı (site != 'other', ref kodu, doğrulama kodu) adayın
+    bulamaması ya da farklı bir site/kod bulması. Yalnızca aday paketin yeni
+    bulduğu alanlar (örn. yeni eklenen site) gerileme sayılmaz.
+    """
+    old_results = _parse_corpus(baseline, corpus)
+    new_results = _parse_corpus(candidate, corpus)
+    regressions = []
+    improvements = 0
+    site_changes = Counter()
+    for (body, language), old, new in zip(corpus, old_results, new_results):
+        if old == new:
+            continue
+        if old[0] != new[0]:
+            site_changes[f'{old[0]}->{new[0]}'] += 1
+        lost = [field for field, before, after in zip(('site', 'ref_code', 'verification_code'), old, new)
+                if before not in (None, 'other') and before != after]
+        if lost:
+            regressions.append({'body': body, 'language': language, 'fields': lost,
+                                'baseline': old, 'candidate': new})
+        else:
+            improvements += 1
+
+    baseline_ns, candidate_ns = _time_per_message((baseline, candidate), corpus, rounds)
+    return {
+        'messages': len(corpus),
+        'baseline_ns': round(baseline_ns),
+        'candidate_ns': round(candidate_ns),
+        'slowdown': round(candidate_ns / baseline_ns, 3) if baseline_ns else None,
+        'regressions': regressions,
+        'improvements': improvements,
+        'site_changes': dict(site_changes.most_common()),
+        'site_counts': dict(Counter(result[0] for result in new_results).most_common()),
+    }
+
+
+def check_report(report: Dict, max_slowdown: float = RULE_PACK_MAX_SLOWDOWN,
+                 allow_regressions: bool = False) -> List[str]:
+    """Raporu eşiklerle karşılaştırır; devreye almayı engelleyen sorunlar (boş liste = geçti)"""
+    problems = []
+    if report['regressions'] and not allow_regressions:
+        problems.append(f"{len(report['regressions'])} mesajda mevcut paketin bulduğu alan kayboluyor/değişiyor")
+    if report['slowdown'] is not None and report['slowdown'] > max_slowdown:
+        problems.append(f"mesaj başına süre {report['slowdown']}x (sınır {max_slowdown}x)")
+    return problems
+
+
+def pack_summary(rules: RulePack) -> Dict:
+    return {
+        'version': rules.version,
+        'checksum': rules.checksum,
+        'source': rules.source,
+        'sites': list(rules.sites),
+        'bubble_sites': list(rules.bubble_sites),
+        'languages': sorted(rules.languages),
+    }
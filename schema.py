@@ -0,0 +1,229 @@
+"""
+Veritabanı şeması.
+
+Şema uygulama import edilirken değil, ayrı ve tek seferlik bir komutla kurulur:
+
+    python manage.py migrate
+
+(Procfile'daki `release` adımı her dağıtımda bunu bir kez çalıştırır.)
+Tüm ifadeler idempotenttir (IF NOT EXISTS); aynı anda çalışan iki migrate
+advisory lock ile sıraya girer. Yerel geliştirmede AUTO_MIGRATE=1 verilirse
+Flask uygulaması her süreçte ilk istekte migrate() çağırır.
+
+sms_messages `timestamp` üzerinde aralık bölümlü bir tablodur (bkz. partitions.py).
+Bölümlü tabloda primary key ve unique index'ler bölüm anahtarını içermek
+zorundadır: PK (id, timestamp), unique (content_hash, timestamp). Zaman damgası
+boş/çözülemeyen SMS alınma anıyla saklandığından aynı özet farklı timestamp'lere
+düşebilir; kesin tekrar kontrolü bu yüzden bölümlenmemiş sms_dedup tablosundadır
+(content_hash primary key, SMS_DEDUP_RETENTION_HOURS sonra bakımda silinir).
+Bölümlemeden önce oluşturulmuş tablo `python manage.py partitions --convert`
+ile taşınır.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from psycopg2 import sql
+
+from partitions import (
+    DEFAULT_PARTITION, PARENT, SMS_RETENTION_DAYS, ensure_partitions, is_partitioned, maintain,
+)
+
+AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '').lower() in ('1', 'true', 'yes')
+
+# pg_advisory_xact_lock anahtarı (sabit, uygulamaya özgü)
+MIGRATE_LOCK_KEY = 0x5348_4950
+
+# Yeni kurulumda sms_messages bölümlü oluşturulur
+CREATE_SMS_MESSAGES = (
+    '''
+    CREATE TABLE sms_messages (
+        id SERIAL,
+        from_number TEXT NOT NULL,
+        body TEXT NOT NULL,
+        timestamp TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+        device_id TEXT,
+        processed BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        source TEXT,
+        site TEXT,
+        verification_code TEXT,
+        ref_code TEXT,
+        language TEXT,
+        content_hash TEXT,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+    ''',
+    # Bölüm aralığı dışında kalan (cihaz saati hatalı) satırlar buraya düşer
+    f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF sms_messages DEFAULT',
+)
+
+STATEMENTS = (
+    # Parse edilmiş alanlar: /gateway-sms yazarken doldurur,
+    # eski satırlar için: python manage.py reparse --only-missing
+    '''
+    ALTER TABLE sms_messages
+        ADD COLUMN IF NOT EXISTS site TEXT,
+        ADD COLUMN IF NOT EXISTS verification_code TEXT,
+        ADD COLUMN IF NOT EXISTS ref_code TEXT,
+        ADD COLUMN IF NOT EXISTS language TEXT,
+        ADD COLUMN IF NOT EXISTS content_hash TEXT
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        id SERIAL PRIMARY KEY,
+        session_id TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # Oturum analitiği; sessions.SessionTracker toplu upsert ile doldurur
+    '''
+    ALTER TABLE chat_sessions
+        ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS language TEXT
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_activity ON chat_sessions (last_activity DESC)',
+    # SMS parse kural paketleri (RULE_PACK_SOURCE=db); en fazla bir aktif sürüm (bkz. rules.py)
+    '''
+    CREATE TABLE IF NOT EXISTS rule_packs (
+        version TEXT PRIMARY KEY,
+        pack JSONB NOT NULL,
+        checksum TEXT NOT NULL,
+        active BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+        activated_at TIMESTAMP
+    )
+    ''',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_rule_packs_active ON rule_packs (active) WHERE active',
+    # Öğrenilmiş gönderici adı -> site eşlemesi (bkz. senders.py)
+    '''
+    CREATE TABLE IF NOT EXISTS sms_senders (
+        sender TEXT PRIMARY KEY,
+        site TEXT NOT NULL,
+        messages INTEGER NOT NULL,
+        share REAL NOT NULL,
+        learned_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC')
+    )
+    ''',
+    # Gateway tekrarlarını tüm worker'larda reddeden içerik özetleri (bkz. ingest.insert_sms_rows)
+    '''
+    CREATE TABLE IF NOT EXISTS sms_dedup (
+        content_hash TEXT PRIMARY KEY,
+        seen_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC')
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_sms_dedup_seen_at ON sms_dedup (seen_at)',
+    # Son SMS sorguları için index'ler (bkz. chatbot_manager.check_query_plans)
+    'CREATE INDEX IF NOT EXISTS idx_sms_messages_timestamp ON sms_messages (timestamp DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_sms_messages_site_timestamp ON sms_messages (site, timestamp DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_sms_messages_ref_code_timestamp ON sms_messages (ref_code, timestamp DESC)',
+    # sms_dedup öncesinden kalan satırlar için de aynı (özet, zaman) ikinci kez yazılmaz
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_sms_messages_content_hash ON sms_messages (content_hash, timestamp)',
+)
+
+# Referans kodu gövde araması (ILIKE '%kod%') için trigram index.
+# pg_trgm kurulamıyorsa arama timestamp index'i üzerinden yapılır.
+OPTIONAL_STATEMENTS = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS idx_sms_messages_body_trgm ON sms_messages USING GIN (body gin_trgm_ops)',
+)
+
+
+def migrate(conn) -> List[str]:
+    """
+    Şemayı kurar/günceller, bölümleri hazırlar ve commit eder. Zorunlu
+    ifadelerden biri hata verirse rollback edilip istisna fırlatılır;
+    opsiyonel (pg_trgm) adım başarısızsa yalnızca uyarı listesine eklenir.
+    """
+    warnings = []
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATE_LOCK_KEY,))
+        cur.execute('SELECT to_regclass(%s) IS NOT NULL', (PARENT,))
+        if not cur.fetchone()[0]:
+            for statement in CREATE_SMS_MESSAGES:
+                cur.execute(statement)
+        elif not is_partitioned(cur):
+            warnings.append("sms_messages bölümlenmemiş; taşımak için: python manage.py partitions --convert")
+        for statement in STATEMENTS:
+            cur.execute(statement)
+        conn.commit()
+
+        cur.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATE_LOCK_KEY,))
+        try:
+            for statement in OPTIONAL_STATEMENTS:
+                cur.execute(statement)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            warnings.append(f"pg_trgm index'i oluşturulamadı: {e}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    maintain(conn)
+    return warnings
+
+
+def convert_to_partitioned(conn) -> Dict:
+    """
+    Bölümlemeden önce oluşturulmuş sms_messages tablosunu bölümlü tabloya taşır.
+
+    Eski tablo (index'leri ve id dizisiyle birlikte) `_unpartitioned` sonekiyle
+    yeniden adlandırılır, yeni tablo kurulur ve saklama süresi içindeki satırlar
+    kopyalanır; id'ler korunur. Taşıma boyunca tabloya yazma bekler (ingest
+    kuyruğu dolmadan bitecek kadar kısa olmalıdır). Eski tablo silinmez;
+    kontrol edildikten sonra elle DROP edilir.
+    """
+    legacy = f'{PARENT}_unpartitioned'
+    cutoff = datetime.utcnow() - timedelta(days=SMS_RETENTION_DAYS) if SMS_RETENTION_DAYS > 0 else datetime.min
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATE_LOCK_KEY,))
+        if is_partitioned(cur):
+            conn.rollback()
+            return {'converted': False, 'rows': 0}
+        cur.execute(sql.SQL('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE').format(sql.Identifier(PARENT)))
+
+        cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s", (PARENT,))
+        for (index_name,) in cur.fetchall():
+            cur.execute(sql.SQL('ALTER INDEX {} RENAME TO {}').format(
+                sql.Identifier(index_name), sql.Identifier(f'{index_name}_unpartitioned')))
+        cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (PARENT,))
+        sequence = cur.fetchone()[0]
+        if sequence:
+            cur.execute(sql.SQL('ALTER SEQUENCE {} RENAME TO {}').format(
+                sql.SQL(sequence), sql.Identifier(f'{PARENT}_id_seq_unpartitioned')))
+        cur.execute(sql.SQL('ALTER TABLE {} RENAME TO {}').format(sql.Identifier(PARENT), sql.Identifier(legacy)))
+
+        for statement in CREATE_SMS_MESSAGES + STATEMENTS:
+            cur.execute(statement)
+
+        timestamp = sql.SQL("COALESCE(timestamp, created_at, now() AT TIME ZONE 'UTC')")
+        cur.execute(sql.SQL('SELECT min({}) FROM {} WHERE {} >= %s').format(
+            timestamp, sql.Identifier(legacy), timestamp), (cutoff,))
+        oldest = cur.fetchone()[0]
+        ensure_partitions(cur, datetime.utcnow(), since=oldest)
+
+        columns = sql.SQL(', ').join(map(sql.Identifier, (
+            'id', 'from_number', 'body', 'device_id', 'processed', 'created_at', 'source',
+            'site', 'verification_code', 'ref_code', 'language', 'content_hash')))
+        cur.execute(sql.SQL('''
+            INSERT INTO {parent} ({columns}, timestamp)
+            SELECT {columns}, {timestamp} FROM {legacy} WHERE {timestamp} >= %s
+            ON CONFLICT DO NOTHING
+        ''').format(parent=sql.Identifier(PARENT), columns=columns, timestamp=timestamp,
+                     legacy=sql.Identifier(legacy)), (cutoff,))
+        rows = cur.rowcount
+        cur.execute(sql.SQL("SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(max(id), 0) + 1, false) FROM {}")
+                    .format(sql.Identifier(legacy)), (PARENT,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return {'converted': True, 'rows': rows, 'legacy_table': legacy}
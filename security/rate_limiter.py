@@ -1,22 +1,250 @@
+import math
+import os
+import sqlite3
+import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from flask import request
 
-class RateLimiter:
+from database import get_db_connection, release_db_connection
+from logs import get_logger
+
+log = get_logger('rate_limit')
+
+
+def _take_token(tokens: float, updated_at: float, now: float,
+                capacity: float, rate: float) -> Tuple[bool, float, int]:
+    """
+    Token bucket adımı: kovayı geçen süre kadar doldurur ve bir token harcamayı dener.
+    (izin verildi mi, kalan token, kaç saniye sonra tekrar denenmeli) döndürür.
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, math.ceil((1 - tokens) / rate)
+
+
+class MemoryBackend:
+    """
+    Süreç içi backend (varsayılan). Her anahtar için yalnızca (token, zaman, bitiş)
+    tutulur; kova dolduktan sonra (bitiş) anahtar boşta sayılır ve silinir.
+    Gunicorn'da her worker kendi sayacını tutar; paylaşım için sqlite/postgres.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # anahtar -> (token, güncelleme, bitiş); en eskiden yeniye
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float) -> Tuple[bool, int]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.pop(key, None)
+            tokens, updated_at = (state[0], state[1]) if state else (capacity, now)
+            allowed, tokens, retry_after = _take_token(tokens, updated_at, now, capacity, rate)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._evict(now)
+        return allowed, retry_after
+
+    def _evict(self, now: float):
+        # Sıra son erişime göre; baştaki anahtarlar en uzun süredir boşta olanlardır
+        while self._buckets:
+            key, state = next(iter(self._buckets.items()))
+            if state[2] > now and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'keys': len(self._buckets)}
+
+
+class SQLiteBackend:
+    """
+    Aynı makinedeki tüm worker'ların paylaştığı SQLite dosyası (WAL modu).
+    Her istek tek bir BEGIN IMMEDIATE transaction'ıyla okunup yazılır.
+    """
+
+    name = 'sqlite'
+    EVICT_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float) -> Tuple[bool, int]:
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            allowed, tokens, retry_after = _take_token(tokens, updated_at, now, capacity, rate)
+            conn.execute('INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?)',
+                         (key, tokens, now, now + (capacity - tokens) / rate))
+            self._calls += 1
+            if self._calls % self.EVICT_EVERY == 0:
+                conn.execute('DELETE FROM rate_limits WHERE expires_at < ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        return {'path': self.path}
+
+
+class PostgresBackend:
+    """
+    Tüm sunucuların paylaştığı UNLOGGED rate_limits tablosu. Doldurma ve token
+    harcama tek bir INSERT ... ON CONFLICT DO UPDATE ile atomik yapılır
+    (satır kilidi yarışları sıraya koyar, okuma-yazma arası yarış yoktur).
+    """
+
+    name = 'postgres'
+    EVICT_EVERY = 1000
+
+    CREATE_SQL = '''
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            allowed BOOLEAN NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL,
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+    '''
+
+    # Dolmuş token miktarı; SET ifadelerinin hepsi satırın eski değerlerini görür
+    _REFILLED = ("LEAST(%(capacity)s, r.tokens + "
+                 "GREATEST(0, EXTRACT(EPOCH FROM now() - r.updated_at)) * %(rate)s)")
+    _LEFT = f"(CASE WHEN {_REFILLED} >= 1 THEN {_REFILLED} - 1 ELSE {_REFILLED} END)"
+    TAKE_SQL = f'''
+        INSERT INTO rate_limits AS r (key, tokens, allowed, updated_at, expires_at)
+        VALUES (%(key)s, %(capacity)s - 1, TRUE, now(), now() + make_interval(secs => 1 / %(rate)s))
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = {_LEFT},
+            allowed = {_REFILLED} >= 1,
+            updated_at = now(),
+            expires_at = now() + make_interval(secs => (%(capacity)s - {_LEFT}) / %(rate)s)
+        RETURNING allowed, tokens
+    '''
+
     def __init__(self):
-        self.requests = defaultdict(list)
-    
+        self._ready = False
+        self._calls = 0
+
+    def take(self, key: str, capacity: float, rate: float) -> Tuple[bool, int]:
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+        try:
+            cur = conn.cursor()
+            if not self._ready:
+                cur.execute(self.CREATE_SQL)
+                self._ready = True
+            cur.execute(self.TAKE_SQL, {'key': key, 'capacity': capacity, 'rate': rate})
+            allowed, tokens = cur.fetchone()
+            self._calls += 1
+            if self._calls % self.EVICT_EVERY == 0:
+                cur.execute('DELETE FROM rate_limits WHERE expires_at < now()')
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db_connection(conn)
+        return allowed, 0 if allowed else math.ceil((1 - tokens) / rate)
+
+    def stats(self) -> dict:
+        return {}
+
+
+class RateLimiter:
+    """
+    Token bucket hız sınırlayıcı: her anahtar için `window_seconds` içinde en
+    fazla `max_requests` istek (kapasite = max_requests, dolum = max_requests / window).
+    Anahtar başına sabit boyutlu durum tutulur; boşta kalan anahtarlar silinir.
+
+    Paylaşılan backend (sqlite/postgres) hata verirse istek düşürülmez,
+    süreç içi backend ile sınırlanmaya devam edilir.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self._fallback = self.backend if isinstance(self.backend, MemoryBackend) else MemoryBackend()
+        self.limited = 0
+        self.backend_errors = 0
+
+    @property
+    def blocking(self) -> bool:
+        """Backend ağ/disk G/Ç'si yapıyor mu (asyncio sunucusu bunu thread'de çağırır)"""
+        return not isinstance(self.backend, MemoryBackend)
+
     def get_client_ip(self):
-        return request.headers.get("X-Forwarded-For", request.remote_addr)
-    
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+        return request.remote_addr or 'unknown'
+
+    def check(self, key: str, max_requests: int, window_seconds: float) -> Tuple[bool, int]:
+        """(izin verildi mi, Retry-After saniyesi) döndürür"""
+        capacity = float(max_requests)
+        rate = capacity / window_seconds
+        try:
+            allowed, retry_after = self.backend.take(key, capacity, rate)
+        except Exception as e:
+            self.backend_errors += 1
+            log.warning('rate_limit_backend_failed', backend=self.backend.name, error=str(e))
+            allowed, retry_after = self._fallback.take(key, capacity, rate)
+        if not allowed:
+            self.limited += 1
+        return allowed, retry_after
+
     def is_rate_limited(self, key, max_requests, window_seconds):
-        now = time.time()
-        self.requests[key] = [req_time for req_time in self.requests[key] if now - req_time < window_seconds]
-        
-        if len(self.requests[key]) >= max_requests:
-            return True
-        
-        self.requests[key].append(now)
-        return False
-
-rate_limiter = RateLimiter()
\ No newline at end of file
+        return not self.check(key, max_requests, window_seconds)[0]
+
+    def stats(self) -> dict:
+        return {
+            'backend': self.backend.name,
+            'limited': self.limited,
+            'backend_errors': self.backend_errors,
+            **self.backend.stats(),
+        }
+
+
+def _build_backend(name: Optional[str] = None):
+    name = (name or os.environ.get('RATE_LIMIT_BACKEND', 'memory')).lower()
+    if name == 'sqlite':
+        return SQLiteBackend(os.environ.get('RATE_LIMIT_SQLITE_PATH', '/tmp/shipliyo_rate_limits.sqlite3'))
+    if name == 'postgres':
+        return PostgresBackend()
+    return MemoryBackend(max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)))
+
+
+# Süreç geneli sınırlayıcı; RATE_LIMIT_BACKEND=memory|sqlite|postgres
+rate_limiter = RateLimiter(_build_backend())
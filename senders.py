@@ -0,0 +1,239 @@
+"""
+Gönderici adı -> site indeksi.
+
+Pazar yeri OTP'leri çoğunlukla alfanümerik bir gönderici adıyla gelir
+(`TRENDYOL`, `n11.com`). /gateway-sms bu adı from_number olarak aldığından
+ingest'te site önce göndericiden tek sözlük aramasıyla çözülür; gövdedeki
+anahtar kelime taraması yalnızca bilinmeyen göndericiler için yapılır.
+Çözülen site sms_messages.site'a yazılır (idx_sms_messages_site_timestamp);
+site filtreleri gövde araması değil tam eşleşmedir.
+
+Eşleme iki kaynaktan gelir, yapılandırılmış olan önce gelir:
+- yapılandırılmış: aktif kural paketindeki sitelerin `senders` listesi (bkz. rules.py),
+- öğrenilmiş: sms_senders tablosu. Son SENDER_LEARN_DAYS günün en yeni
+  SENDER_LEARN_SAMPLE SMS'inin gövdeleri aktif paketle yeniden taranır; en az
+  SENDER_MIN_MESSAGES mesajının SENDER_MIN_SHARE oranı aynı siteye (other
+  dışında) çıkan göndericiler öğrenilir. Öğrenme kayıtlı site sütununu değil
+  gövdeyi kullanır: göndericiden çözülmüş satırlar eşlemeyi kendi kendine
+  doğrulamaz, yanlış öğrenilen gönderici bir sonraki turda düşer.
+
+Öğrenme SENDER_LEARN_INTERVAL saniyede bir tek süreçte yapılır (advisory
+lock); her süreç tabloyu SENDER_INDEX_REFRESH saniyede bir belleğe alır.
+Elle: python manage.py senders learn|show
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Dict, Optional
+
+from psycopg2.extras import execute_values
+
+from database import get_db_connection, release_db_connection
+from logs import get_logger
+from sms_parser import SMSParser, active_rules, normalize_sender
+
+log = get_logger('senders')
+
+SENDER_INDEX_REFRESH = float(os.environ.get('SENDER_INDEX_REFRESH', 300))    # 0: süreç içi yenileme kapalı
+SENDER_LEARN_INTERVAL = float(os.environ.get('SENDER_LEARN_INTERVAL', 3600))  # 0: süreç içi öğrenme kapalı
+SENDER_LEARN_DAYS = int(os.environ.get('SENDER_LEARN_DAYS', 7))
+SENDER_LEARN_SAMPLE = int(os.environ.get('SENDER_LEARN_SAMPLE', 20000))
+SENDER_MIN_MESSAGES = int(os.environ.get('SENDER_MIN_MESSAGES', 20))
+SENDER_MIN_SHARE = float(os.environ.get('SENDER_MIN_SHARE', 0.95))
+
+LEARN_LOCK_KEY = 0x5348_4952
+
+# Telefon numaralarını baştan eler; en yeni satırlar timestamp index'inden gelir
+LEARN_SAMPLE_SQL = '''
+    SELECT from_number, body FROM sms_messages
+    WHERE timestamp >= %s AND from_number ~ '[A-Za-z]'
+    ORDER BY timestamp DESC LIMIT %s
+'''
+
+
+def learn_senders(sample, min_messages: int = SENDER_MIN_MESSAGES,
+                  min_share: float = SENDER_MIN_SHARE) -> Dict[str, tuple]:
+    """(from_number, body) örneğinden öğrenilen eşleme: gönderici -> (site, mesaj sayısı, oran)"""
+    parser = SMSParser()
+    rules = active_rules()
+    counts = defaultdict(Counter)
+    for from_number, body in sample:
+        sender = normalize_sender(from_number)
+        if sender is None:
+            continue
+        counts[sender][rules.engine(parser.detect_language(body)).detect_site(body.lower())] += 1
+
+    learned = {}
+    for sender, sites in counts.items():
+        total = sum(sites.values())
+        site, matched = sites.most_common(1)[0]
+        if site != 'other' and total >= min_messages and matched / total >= min_share:
+            learned[sender] = (site, total, round(matched / total, 4))
+    return learned
+
+
+class SenderIndex:
+    """
+    Süreç geneli gönderici indeksi. Arama yolunda kilit yoktur: öğrenilmiş
+    eşleme her yenilemede yeni bir sözlük olarak tek atamayla değiştirilir.
+    Flask modunda lazy başlatılan bir daemon thread (fork sonrası her
+    worker'da), ASGI modunda lifespan'de başlatılan bir coroutine çalıştırır.
+    """
+
+    def __init__(self, refresh_interval: float = SENDER_INDEX_REFRESH,
+                 learn_interval: float = SENDER_LEARN_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.learn_interval = learn_interval
+        self._learned = MappingProxyType({})
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._last_learn_at = None     # time.monotonic()
+
+        self.refreshes = 0
+        self.failures = 0
+        self.learn_runs = 0
+        self.last_refresh_at = None     # time.monotonic()
+        self.last_error = None
+
+    # --- Ingest yolu ---
+    def lookup(self, from_number: Optional[str]) -> Optional[str]:
+        """Göndericinin sitesi; bilinmiyorsa (ya da site aktif pakette yoksa) None"""
+        sender = normalize_sender(from_number)
+        if sender is None:
+            return None
+        rules = active_rules()
+        site = rules.senders.get(sender)
+        if site is None:
+            site = self._learned.get(sender)
+            # Paketten çıkarılmış bir siteye öğrenilmiş eşleme uygulanmaz
+            if site not in rules.titles:
+                return None
+        return site
+
+    def mapping(self) -> Dict[str, Dict]:
+        """gönderici -> {'site', 'source'}; yapılandırılmış eşleme öğrenilmişi ezer"""
+        combined = {sender: {'site': site, 'source': 'learned'} for sender, site in self._learned.items()}
+        combined.update({sender: {'site': site, 'source': 'configured'}
+                         for sender, site in active_rules().senders.items()})
+        return combined
+
+    # --- Öğrenme ve yenileme ---
+    def learn(self, conn, force: bool = False) -> Optional[Dict]:
+        """
+        Eşlemeyi örnekten yeniden öğrenir ve sms_senders'ı tek transaction'da
+        değiştirir. Başka süreç öğreniyorsa ya da son öğrenme (bu süreçte veya
+        tabloda) learn_interval'dan yeniyse (force=False) None döner.
+        """
+        if not force and self._last_learn_at and time.monotonic() - self._last_learn_at < self.learn_interval:
+            return None
+        cur = conn.cursor()
+        try:
+            cur.execute('SELECT pg_try_advisory_xact_lock(%s)', (LEARN_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return None
+            if not force:
+                cur.execute("SELECT max(learned_at) > (now() AT TIME ZONE 'UTC') - %s FROM sms_senders",
+                            (timedelta(seconds=self.learn_interval),))
+                if cur.fetchone()[0]:
+                    conn.rollback()
+                    return None
+            started = time.monotonic()
+            cur.execute(LEARN_SAMPLE_SQL, (datetime.utcnow() - timedelta(days=SENDER_LEARN_DAYS), SENDER_LEARN_SAMPLE))
+            sample = cur.fetchall()
+            learned = learn_senders(sample)
+            cur.execute('DELETE FROM sms_senders')
+            if learned:
+                execute_values(cur, 'INSERT INTO sms_senders (sender, site, messages, share) VALUES %s',
+                               [(sender, *entry) for sender, entry in sorted(learned.items())])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+        with self._lock:
+            self.learn_runs += 1
+            self._last_learn_at = time.monotonic()
+        result = {'sample': len(sample), 'senders': len(learned), 'seconds': round(time.monotonic() - started, 3)}
+        log.info('senders_learned', **result)
+        return result
+
+    def load(self, conn) -> int:
+        cur = conn.cursor()
+        try:
+            cur.execute('SELECT sender, site FROM sms_senders')
+            rows = cur.fetchall()
+            conn.rollback()
+        finally:
+            cur.close()
+        self._learned = MappingProxyType(dict(rows))
+        return len(rows)
+
+    def run_once(self):
+        conn = get_db_connection()
+        if not conn:
+            return
+        try:
+            if self.learn_interval > 0:
+                self.learn(conn)
+            self.load(conn)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+            log.error('sender_index_refresh_failed', error=str(e))
+            return
+        finally:
+            release_db_connection(conn)
+        with self._lock:
+            self.refreshes += 1
+            self.last_refresh_at = time.monotonic()
+            self.last_error = None
+
+    def ensure_thread(self):
+        if self.refresh_interval <= 0:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='sender-index', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.run_once()
+            time.sleep(self.refresh_interval)
+
+    async def run_async(self):
+        """ASGI lifespan'inde task olarak çalışır; psycopg2 çağrıları thread'e devredilir"""
+        if self.refresh_interval <= 0:
+            return
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'configured': len(active_rules().senders),
+                'learned': len(self._learned),
+                'refreshes': self.refreshes,
+                'learn_runs': self.learn_runs,
+                'failures': self.failures,
+                'last_refresh_age_seconds': round(time.monotonic() - self.last_refresh_at, 1) if self.last_refresh_at else None,
+                'last_error': self.last_error,
+            }
+
+
+# Süreç geneli indeks
+sender_index = SenderIndex()
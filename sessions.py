@@ -0,0 +1,188 @@
+"""
+Write-behind chat oturumu takibi (chat_sessions).
+
+/api/chatbot her mesajda yalnızca bellekteki sözlüğü günceller (touch);
+DB'ye yazma SESSION_FLUSH_INTERVAL saniyede bir (ya da bekleyen oturum
+sayısı SESSION_FLUSH_MAX'a ulaşınca) arka plan thread'inde tek bir çok
+satırlı upsert ile yapılır. Aynı oturumun aralık içindeki mesajları tek
+satıra birleşir: sohbet yolunda DB'ye gidiş yoktur.
+
+Zamanlar sms_messages ile aynı şekilde naive UTC yazılır. Süreç beklenmedik
+şekilde ölürse son aralığın güncellemeleri kaybolabilir (analitik veri).
+"""
+import atexit
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from psycopg2.extras import execute_values
+
+from database import get_db_connection, release_db_connection
+from logs import get_logger
+from metrics import DB_QUERY_SECONDS
+
+log = get_logger('sessions')
+
+SESSION_FLUSH_INTERVAL = float(os.environ.get('SESSION_FLUSH_INTERVAL', 5))
+SESSION_FLUSH_MAX = int(os.environ.get('SESSION_FLUSH_MAX', 1000))
+# DB uzun süre yoksa bellekte tutulacak en fazla bekleyen oturum (fazlası atılır)
+SESSION_MAX_PENDING = int(os.environ.get('SESSION_MAX_PENDING', 50000))
+
+SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+UPSERT_SESSIONS_SQL = '''
+    INSERT INTO chat_sessions (session_id, created_at, last_activity, message_count, language)
+    VALUES %s
+    ON CONFLICT (session_id) DO UPDATE SET
+        last_activity = GREATEST(chat_sessions.last_activity, EXCLUDED.last_activity),
+        message_count = chat_sessions.message_count + EXCLUDED.message_count,
+        language = COALESCE(EXCLUDED.language, chat_sessions.language)
+'''
+
+
+class SessionTracker:
+    def __init__(self, flush_interval: float = SESSION_FLUSH_INTERVAL, flush_max: int = SESSION_FLUSH_MAX,
+                 max_pending: int = SESSION_MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.flush_max = flush_max
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending: Dict[str, List] = {}     # session_id -> [ilk görülme, son aktivite, mesaj sayısı, dil]
+        self._thread = None
+        self._pid = None
+
+        self.touched = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed_sessions = 0
+        self.failed_flushes = 0
+        self.last_flush_size = 0
+        self.last_flush_at = None   # time.monotonic()
+
+    # --- Sohbet yolu ---
+    def touch(self, session_id, language: Optional[str] = None) -> bool:
+        """Oturumun son aktivitesini bellekte günceller; geçersiz session_id takip edilmez"""
+        if not isinstance(session_id, str) or not SESSION_ID_RE.match(session_id):
+            with self._lock:
+                self.rejected += 1
+            return False
+        self._ensure_worker()
+        now = datetime.utcnow()
+        with self._lock:
+            self.touched += 1
+            entry = self._pending.get(session_id)
+            if entry is None:
+                if len(self._pending) >= self.max_pending:
+                    self.dropped += 1
+                    return False
+                self._pending[session_id] = [now, now, 1, language]
+                pending = len(self._pending)
+            else:
+                entry[1] = now
+                entry[2] += 1
+                if language:
+                    entry[3] = language
+                return True
+        if pending >= self.flush_max:
+            self._wake.set()
+        return True
+
+    # --- Yazma ---
+    def flush(self) -> int:
+        """Bekleyen oturumları tek upsert ile yazar; başarısızsa bellekteki güncellemelerle birleştirir"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            # Sabit sıra: aynı oturumları yazan worker'lar birbirini kilitlenmeye sokmasın
+            rows = [(session_id, *pending[session_id]) for session_id in sorted(pending)]
+            try:
+                self._write(rows)
+            except Exception as e:
+                self._restore(pending)
+                with self._lock:
+                    self.failed_flushes += 1
+                log.warning('session_flush_failed', sessions=len(rows), error=str(e))
+                return 0
+            with self._lock:
+                self.flushes += 1
+                self.flushed_sessions += len(rows)
+                self.last_flush_size = len(rows)
+                self.last_flush_at = time.monotonic()
+            return len(rows)
+
+    def _write(self, rows):
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Veritabanı bağlantısı kurulamadı")
+        try:
+            cur = conn.cursor()
+            with DB_QUERY_SECONDS.time(query='upsert_sessions'):
+                execute_values(cur, UPSERT_SESSIONS_SQL, rows, page_size=len(rows))
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_db_connection(conn)
+
+    def _restore(self, pending: Dict[str, List]):
+        with self._lock:
+            for session_id, (first_seen, last_activity, messages, language) in pending.items():
+                entry = self._pending.get(session_id)
+                if entry is None:
+                    if len(self._pending) >= self.max_pending:
+                        self.dropped += 1
+                        continue
+                    self._pending[session_id] = [first_seen, last_activity, messages, language]
+                else:
+                    entry[0] = min(entry[0], first_seen)
+                    entry[2] += messages
+                    entry[3] = entry[3] or language
+
+    # --- Worker ---
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != pid or not self._thread.is_alive():
+                # Fork sonrası ebeveynin bekleyenleri bu süreçte yazılmaz (ebeveyn kendisi yazar)
+                if self._pid != pid:
+                    self._pending = {}
+                self._pid = pid
+                self._thread = threading.Thread(target=self._run, name='session-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'touched': self.touched,
+                'rejected': self.rejected,
+                'dropped': self.dropped,
+                'flushes': self.flushes,
+                'flushed_sessions': self.flushed_sessions,
+                'failed_flushes': self.failed_flushes,
+                'last_flush_size': self.last_flush_size,
+                'last_flush_age_seconds': round(time.monotonic() - self.last_flush_at, 1) if self.last_flush_at else None,
+            }
+
+
+# Süreç geneli takipçi; kapanışta bekleyenler yazılır
+session_tracker = SessionTracker()
+atexit.register(session_tracker.flush)
@@ -0,0 +1,169 @@
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# Satır biçimi chatbot_manager.SMS_COLUMNS ile aynıdır:
+# (body, timestamp, site, verification_code, ref_code, language)
+SMSRow = Tuple
+
+
+class RecentSMSCache:
+    """
+    Son `window_seconds` saniyedeki SMS'lerin süreç içi, zaman sıralı önbelleği.
+    Varsayılan pencere (3 saat) en uzun okuma penceresini (_handle_reference_code, 2 saat) kapsar.
+
+    - /gateway-sms yazdıktan sonra add() ile beslenir, açılışta warm() ile DB'den doldurulur.
+    - Site ve referans koduna göre ayrı, timestamp'e göre sıralı listeler tutulur;
+      sorgular bisect ile O(log n) sınır bulup en yeniden geriye doğru okur.
+    - Pencereden çıkan kayıtlar her yazmada baştan kesilerek atılır (yaşa göre tahliye).
+
+    Önbellek ancak bütün yazmaları görüyorsa doğru cevap verir; görmediği anda
+    `warmed` False olur ve okumalar boş döner (çağıran DB'ye düşer):
+    - SMS_EVENTS_BACKEND=memory: yalnızca bu sürecin yazdıkları eklenir; bu mod
+      tek worker'lı kurulum içindir.
+    - SMS_EVENTS_BACKEND=postgres: her süreçte LISTEN bağlantısı tüm worker'ların
+      yazdığı SMS'leri ekler; bağlantı koptuğunda invalidate() ile önbellek devre
+      dışı kalır, yeniden bağlanınca DB'den tekrar ısıtılır (bkz. sms_events).
+    Boş sonuç yine "miss" sayılır ve DB'ye düşer.
+    """
+
+    def __init__(self, window_seconds: int = 10800, max_items: int = 50000):
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._all = []          # [(timestamp, seq, row)]
+        self._by_site = {}      # site -> [(timestamp, seq, row)]
+        self._by_ref = {}       # ref_code -> [(timestamp, seq, row)]
+        self._seq = 0
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+
+    # --- Yazma ---
+    def add(self, row: SMSRow):
+        timestamp = row[1]
+        if timestamp is None or timestamp < self._cutoff():
+            return
+        with self._lock:
+            # Isıtma ile LISTEN aynı satırı iki kez getirebilir
+            index = bisect_left(self._all, (timestamp,))
+            while index < len(self._all) and self._all[index][0] == timestamp:
+                if self._all[index][2] == row:
+                    return
+                index += 1
+            self._seq += 1
+            entry = (timestamp, self._seq, row)
+            insort(self._all, entry)
+            insort(self._by_site.setdefault(row[2], []), entry)
+            if row[4]:
+                insort(self._by_ref.setdefault(row[4], []), entry)
+            self._evict()
+
+    def warm(self, rows: Iterable[SMSRow]):
+        """DB'den okunan son pencere satırlarıyla önbelleği doldurur"""
+        for row in rows:
+            self.add(tuple(row))
+        self.warmed = True
+
+    def invalidate(self):
+        """Yazmaların bir kısmı kaçırılabilir: yeniden warm() edilene kadar okumalar DB'ye düşer"""
+        self.warmed = False
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.window_seconds)
+
+    def _evict(self):
+        cutoff = (self._cutoff(),)
+        expired = bisect_left(self._all, cutoff)
+        overflow = max(0, len(self._all) - expired - self.max_items)
+        drop = expired + overflow
+        if not drop:
+            return
+        dropped = self._all[:drop]
+        del self._all[:drop]
+        boundary = (dropped[-1][0], dropped[-1][1] + 1)
+        for index, column in ((self._by_site, 2), (self._by_ref, 4)):
+            for key in {entry[2][column] for entry in dropped}:
+                entries = index.get(key)
+                if entries is None:
+                    continue
+                # Sıralı listede sınırdan küçük olanlar tam olarak düşenlerdir
+                del entries[:bisect_left(entries, boundary)]
+                if not entries:
+                    del index[key]
+
+    # --- Okuma ---
+    def _newest(self, entries: List, since: datetime, limit: int, accept=None) -> List[SMSRow]:
+        start = bisect_left(entries, (since,))
+        result = []
+        for index in range(len(entries) - 1, start - 1, -1):
+            row = entries[index][2]
+            if accept is None or accept(row):
+                result.append(row)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def recent_by_site(self, site: str, since: datetime, limit: int = 10,
+                       exclude_sites: Optional[Sequence[str]] = None) -> List[SMSRow]:
+        """
+        since'ten yeni SMS'leri en yeniden eskiye döndürür.
+        exclude_sites verilirse site yerine 'bu siteler hariç' filtresi uygulanır ('other').
+        Sitesi boş (eski) satırlar da döner; çağıran parse edip süzer.
+        """
+        if not self.warmed or since < self._cutoff():
+            return []
+        with self._lock:
+            if exclude_sites is not None:
+                excluded = frozenset(exclude_sites)
+                rows = self._newest(self._all, since, limit, lambda row: row[2] is None or row[2] not in excluded)
+            elif None in self._by_site:
+                # Sitesi yazılmamış eski satırlar DB sorgusundaki gibi adaydır
+                rows = self._newest(self._all, since, limit, lambda row: row[2] is None or row[2] == site)
+            else:
+                rows = self._newest(self._by_site.get(site, []), since, limit)
+            self._count(rows)
+        return rows
+
+    def find_by_ref(self, ref_code: str, since: datetime) -> Optional[SMSRow]:
+        if not self.warmed or since < self._cutoff():
+            return None
+        with self._lock:
+            rows = self._newest(self._by_ref.get(ref_code, []), since, 1)
+            self._count(rows)
+        return rows[0] if rows else None
+
+    def _count(self, rows):
+        if rows:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._all)
+        lookups = self.hits + self.misses
+        return {
+            'enabled': True,
+            'warmed': self.warmed,
+            'size': size,
+            'window_seconds': self.window_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def _build_cache() -> Optional[RecentSMSCache]:
+    if os.environ.get('SMS_CACHE_ENABLED', '1') == '0':
+        return None
+    return RecentSMSCache(
+        window_seconds=int(os.environ.get('SMS_CACHE_WINDOW_SECONDS', 10800)),
+        max_items=int(os.environ.get('SMS_CACHE_MAX_ITEMS', 50000)),
+    )
+
+
+# Süreç geneli önbellek; SMS_CACHE_ENABLED=0 ile kapatılabilir (None olur)
+recent_sms_cache = _build_cache()
@@ -0,0 +1,53 @@
+"""
+Gerçekçi pazar yeri SMS gövdeleri üreten deterministik corpus.
+Parser benchmark'ları ve kural paketi doğrulaması (rules.sample_corpus) aynı
+corpus'u kullanır; `manage.py rules activate` da kullandığı için benchmarks/
+paketinde değil, uygulama modüllerinin yanında durur.
+"""
+import random
+
+TEMPLATES = {
+    'tr': [
+        "Trendyol onay kodunuz: {code} Ref: {ref}",
+        "{code} Trendyol uyelik dogrulama kodunuzdur. Kodu kimseyle paylasmayiniz. B{ref}",
+        "Hepsiburada hesabiniza giris icin dogrulama kodu: {code}. Referans: {ref}",
+        "HB: {code} kodunu kullanarak siparisinizi onaylayin. Mersis no: 0123456789",
+        "n11.com sifre yenileme kodunuz {code}. Ref:{ref}",
+        "N11 onay kodu: {code} - Bu kodu kimseyle paylasmayin.",
+        "Amazon.com.tr dogrulama kodunuz: {code}",
+        "Getir siparis onay kodunuz {code}. No: {ref}",
+        "Ciceksepeti siparis dogrulama kodunuz: {code}",
+        "Temu giris kodunuz {code}. Kimseyle paylasmayin.",
+        "Yemeksepeti tek kullanimlik sifreniz: {code}",
+        "Sayin musterimiz, {code} numarali kodu kullanarak islemi tamamlayin. Kargonuz yola cikti, takip no {ref}",
+    ],
+    'en': [
+        "Trendyol verification code: {code} reference: {ref}",
+        "Your Amazon OTP is {code}. Do not share it. Ref {ref}",
+        "{code} is your Hepsiburada verification code.",
+        "Use code {code} to confirm your n11 order. Reference {ref}",
+        "Your confirmation code is {code}. Number: {ref}",
+        "Your Temu verification code is {code}.",
+    ],
+    'bg': [
+        "Trendyol потвърдителен код: {code} рефер: {ref}",
+        "Вашият код за Hepsiburada е {code}",
+        "n11 код: {code} nomer {ref}",
+        "Amazon потвърдителен код {code}. kod {ref}",
+    ],
+}
+
+_ALNUM = 'ABCDEFGHJKLMNPQRSTUVWXYZ0123456789'
+
+
+def generate_corpus(size: int = 3000, seed: int = 42) -> list:
+    """(body, language) çiftlerinden oluşan listeyi döndürür"""
+    rng = random.Random(seed)
+    flat = [(template, language) for language, templates in TEMPLATES.items() for template in templates]
+    corpus = []
+    for _ in range(size):
+        template, language = rng.choice(flat)
+        code = str(rng.randint(10000, 999999))
+        ref = ''.join(rng.choice(_ALNUM) for _ in range(rng.randint(4, 6)))
+        corpus.append((template.format(code=code, ref=ref), language))
+    return corpus
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import math
+import os
+import queue
+import select
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import psycopg2
+
+from chatbot_manager import WARM_SMS_SQL, main_sites
+from database import get_database_url
+from logs import get_logger
+from sms_cache import recent_sms_cache
+
+log = get_logger('sms_events')
+
+NOTIFY_CHANNEL = 'sms_events'
+NOTIFY_SQL = 'SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload'
+
+# SSE akışı: en uzun bekleme (widget'ın sorguladığı 120 sn'lik pencere), canlılık aralığı ve
+# abonelikten önce geriye bakılan süre (widget'ın boş dönen sorgusu ile abonelik arası)
+SMS_STREAM_MAX_WAIT = float(os.environ.get('SMS_STREAM_MAX_WAIT', 120))
+SMS_STREAM_HEARTBEAT = 15
+SMS_STREAM_GRACE = 30
+# Flask (gthread) modunda her akış bir thread tutar: worker başına eşzamanlı akış sınırı.
+# Dolunca 503 + Retry-After döner ve widget periyodik sorguya geçer. Çok sayıda bekleyen
+# widget için SSE'yi ASGI modu (asgi_app.py) sunmalı; orada akışlar coroutine'dir.
+SMS_STREAM_MAX_CONCURRENT = int(os.environ.get('SMS_STREAM_MAX_CONCURRENT', 8))
+SMS_STREAM_RETRY_AFTER = 5
+
+
+def stream_wait(timeout: Optional[str]) -> float:
+    """
+    ?timeout= değerini (0, SMS_STREAM_MAX_WAIT] aralığında bekleme süresine çevirir.
+    Verilmezse en uzun bekleme; sayı değilse, sonlu değilse (nan/inf) ya da
+    pozitif değilse ValueError.
+    """
+    if timeout is None:
+        return SMS_STREAM_MAX_WAIT
+    wait = float(timeout)
+    if not math.isfinite(wait) or wait <= 0:
+        raise ValueError(f"Geçersiz timeout: {timeout}")
+    return min(wait, SMS_STREAM_MAX_WAIT)
+
+
+def event_topics(site: Optional[str]) -> tuple:
+    """SMS olayının teslim edileceği konular; ana siteler dışındakiler 'other' bekleyenlere de gider"""
+    if site is None:
+        return ()
+    if site in main_sites():
+        return (site,)
+    return (site, 'other')
+
+
+def format_sse(event: str, data) -> str:
+    """Tek bir Server-Sent Events mesajı"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def latest_cached_event(site: str) -> Optional[Dict]:
+    """
+    Abone olduktan hemen sonra çağrılır: istemcinin son sorgusu ile abonelik
+    arasında yazılmış SMS'i bellekteki pencereden (sorgusuz) bulur.
+    """
+    if not recent_sms_cache:
+        return None
+    since = datetime.utcnow() - timedelta(seconds=SMS_STREAM_GRACE)
+    rows = recent_sms_cache.recent_by_site(site, since, 1, main_sites() if site == 'other' else None)
+    if not rows:
+        return None
+    _body, timestamp, sms_site, code, ref_code, language = rows[0]
+    return {
+        'site': sms_site,
+        'verification_code': code,
+        'ref_code': ref_code,
+        'language': language,
+        'timestamp': timestamp.isoformat(),
+    }
+
+
+class Subscription:
+    """Tek bir bekleyen istemci (SSE bağlantısı) için sınırlı olay kuyruğu"""
+
+    def __init__(self, bus: 'SMSEventBus', topic: str, max_pending: int = 10):
+        self.bus = bus
+        self.topic = topic
+        self._queue = queue.Queue(maxsize=max_pending)
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, event: Dict):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass  # Okumayan istemci yazanı bekletmez
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncSubscription(Subscription):
+    """
+    asyncio sunucusu (asgi_app) için abonelik. Olaylar ingest thread'inden
+    gelir; event loop'a call_soon_threadsafe ile aktarılır.
+    """
+
+    def __init__(self, bus: 'SMSEventBus', topic: str, max_pending: int = 10):
+        self.bus = bus
+        self.topic = topic
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=max_pending)
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def _offer(self, event: Dict):
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # Event loop kapanmış
+
+    def _put(self, event: Dict):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class SMSEventBus:
+    """
+    Yeni yazılan SMS'leri bekleyen istemcilere iten pub/sub.
+
+    - memory (tek worker'da varsayılan): olaylar yalnızca bu süreçteki abonelere
+      gider; başka worker'ın yazdığı SMS bekleyen istemciye ulaşmaz. Yalnızca
+      tek worker'lı (gthread) kurulum içindir. Worker sayısı --workers ile
+      verildiyse SMS_EVENTS_BACKEND=postgres açıkça ayarlanmalıdır.
+    - postgres (WEB_CONCURRENCY > 1 iken varsayılan): olaylar INSERT ile aynı transaction'da pg_notify ile yayınlanır
+      (commit anında teslim edilir); her süreçteki tek bir LISTEN thread'i
+      onları yerel abonelere dağıtır. Böylece SMS'i hangi worker yazarsa yazsın
+      tüm worker'lardaki bekleyenler haberdar olur.
+
+    Bekleyen istemciler hiç sorgu çalıştırmaz; bir site için kaç abone olursa
+    olsun olay başına yalnızca bir NOTIFY vardır.
+
+    postgres modunda LISTEN thread'i süreç başlarken de açılır ve son SMS
+    önbelleğini (sms_cache) besler: LISTEN kurulduktan sonra önbellek DB'den
+    ısıtılır, sonraki her olay önbelleğe eklenir. Bağlantı koptuğu anda
+    önbellek invalidate edilir; okumalar yeniden bağlanana kadar DB'ye gider.
+    """
+
+    def __init__(self, backend: str = 'memory'):
+        self.backend = backend
+        self._subscribers = {}      # konu -> set(Subscription)
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+        self.published = 0
+        self.delivered = 0
+
+    @property
+    def uses_notify(self) -> bool:
+        return self.backend == 'postgres'
+
+    @property
+    def feeds_cache(self) -> bool:
+        """Son SMS önbelleğini yerel yazmalar yerine LISTEN bağlantısı mı besliyor"""
+        return self.uses_notify and recent_sms_cache is not None
+
+    def start(self):
+        """Süreç başlarken çağrılır; önbellek LISTEN ile besleniyorsa dinleyiciyi açar"""
+        if self.feeds_cache:
+            self._ensure_listener()
+
+    # --- Abonelik ---
+    def subscribe(self, topic: str) -> Subscription:
+        return self._register(Subscription(self, topic))
+
+    def subscribe_async(self, topic: str) -> AsyncSubscription:
+        """Çalışan event loop içinden çağrılmalıdır"""
+        return self._register(AsyncSubscription(self, topic))
+
+    def _register(self, subscription: Subscription) -> Subscription:
+        if self.uses_notify:
+            self._ensure_listener()
+        with self._lock:
+            self._subscribers.setdefault(subscription.topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    # --- Yayın ---
+    def notify(self, cur, events: List[Dict]):
+        """
+        postgres modunda olayları çağıranın transaction'ında NOTIFY eder (commit'te teslim).
+        Olaylar önbellek için `body` taşır; dinleyici onu abonelere göndermeden çıkarır.
+        """
+        if self.uses_notify and events:
+            cur.execute(NOTIFY_SQL, (NOTIFY_CHANNEL, [json.dumps(event, default=str) for event in events]))
+
+    def publish(self, events: Iterable[Dict]):
+        """memory modunda commit sonrası olayları yerel abonelere dağıtır"""
+        if not self.uses_notify:
+            self.dispatch(events)
+
+    def dispatch(self, events: Iterable[Dict]):
+        for event in events:
+            self.published += 1
+            with self._lock:
+                targets = [
+                    subscription
+                    for topic in event_topics(event.get('site'))
+                    for subscription in self._subscribers.get(topic, ())
+                ]
+            for subscription in targets:
+                subscription._offer(event)
+            self.delivered += len(targets)
+
+    # --- LISTEN köprüsü ---
+    def _ensure_listener(self):
+        pid = os.getpid()
+        if self._listener is not None and self._listener_pid == pid and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener is None or self._listener_pid != pid or not self._listener.is_alive():
+                self._listener_pid = pid
+                self._listener = threading.Thread(target=self._listen, name='sms-events-listen', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        db_url, _ = get_database_url()
+        while True:
+            conn = None
+            try:
+                # Havuz dışı, uzun ömürlü bağlantı; LISTEN oturuma bağlıdır
+                conn = psycopg2.connect(db_url, connect_timeout=10, keepalives=1, keepalives_idle=30)
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                warmed = None
+                if recent_sms_cache:
+                    # LISTEN'den sonra ısıtılır: aradaki commit'ler iki yoldan da gelir, kaybolmaz
+                    cur.execute(WARM_SMS_SQL, (datetime.utcnow() - timedelta(seconds=recent_sms_cache.window_seconds),))
+                    rows = cur.fetchall()
+                    recent_sms_cache.warm(rows)
+                    warmed = len(rows)
+                log.info('sms_events_listening', channel=NOTIFY_CHANNEL, cache_rows=warmed)
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        # Sessiz kopmayı fark etmek için (önbellek bu sürede eksik kalabilir)
+                        cur.execute('SELECT 1')
+                        continue
+                    conn.poll()
+                    events = []
+                    while conn.notifies:
+                        event = json.loads(conn.notifies.pop(0).payload)
+                        body = event.pop('body', None)
+                        if recent_sms_cache and body is not None:
+                            recent_sms_cache.add((body, datetime.fromisoformat(event['timestamp']), event['site'],
+                                                  event['verification_code'], event['ref_code'], event['language']))
+                        events.append(event)
+                    self.dispatch(events)
+            except Exception as e:
+                if recent_sms_cache:
+                    recent_sms_cache.invalidate()
+                log.warning('sms_events_listener_lost', error=str(e), retry_in=2)
+                time.sleep(2)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            waiting = sum(len(subscribers) for subscribers in self._subscribers.values())
+        return {
+            'backend': self.backend,
+            'waiting': waiting,
+            'published': self.published,
+            'delivered': self.delivered,
+            'listener_alive': bool(self._listener and self._listener.is_alive() and self._listener_pid == os.getpid()),
+        }
+
+
+def _default_backend() -> str:
+    # gunicorn ve uvicorn worker sayısını WEB_CONCURRENCY'den alır; memory olay
+    # yolu yalnızca aynı worker'a ulaştığından birden fazla worker'da postgres seçilir
+    try:
+        workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    except ValueError:
+        workers = 1
+    return 'postgres' if workers > 1 else 'memory'
+
+
+# Süreç geneli olay yolu; SMS_EVENTS_BACKEND=memory|postgres
+sms_event_bus = SMSEventBus(os.environ.get('SMS_EVENTS_BACKEND') or _default_backend())
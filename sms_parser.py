@@ -1,12 +1,24 @@
+import hashlib
+import json
 import re
-from typing import Dict, Optional
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from matcher import KeywordMatcher, PriorityMatcher
+from metrics import SMS_PARSE_SECONDS
 
 class SMSParser:
     """
     Çok dilli SMS parser - Türkçe, Bulgarca, İngilizce
+
+    Aşağıdaki tablolar yerleşik kural paketidir; çalışan süreçte kullanılan
+    paket dosyadan / DB'den yüklenip değiştirilebilir (bkz. RulePack, rules.py).
     """
     
-    # Çok dilli site tespiti
+    # Çok dilli site tespiti (sıra = öncelik)
     SITE_KEYWORDS = {
         'trendyol': {
             'tr': ['trendyol', 'trend'],
@@ -27,8 +39,29 @@ class SMSParser:
             'tr': ['amazon'],
             'bg': ['amazon'],
             'en': ['amazon', 'amzn']
+        },
+        'ciceksepeti': {
+            'tr': ['çiçeksepeti', 'ciceksepeti', 'çiçek sepeti', 'cicek sepeti'],
+            'bg': ['ciceksepeti', 'çiçeksepeti'],
+            'en': ['ciceksepeti', 'çiçeksepeti']
+        },
+        'temu': {
+            'tr': ['temu'],
+            'bg': ['temu'],
+            'en': ['temu']
         }
     }
+
+    # Sitelerin görünen adı, widget baloncuğu (bubble=False: parse edilir, 'Diğer' altında listelenir)
+    # ve alfanümerik gönderici adları (from_number; bkz. normalize_sender, senders.py)
+    SITES = {
+        'trendyol': {'title': 'Trendyol', 'emoji': '🛍️', 'bubble': True, 'senders': ['TRENDYOL']},
+        'hepsiburada': {'title': 'Hepsiburada', 'emoji': '📦', 'bubble': True, 'senders': ['HEPSIBURADA']},
+        'n11': {'title': 'N11', 'emoji': '🏪', 'bubble': True, 'senders': ['N11', 'N11COM']},
+        'amazon': {'title': 'Amazon', 'emoji': '🛒', 'bubble': True, 'senders': ['AMAZON', 'AMAZONTR']},
+        'ciceksepeti': {'title': 'Çiçeksepeti', 'emoji': '💐', 'bubble': True, 'senders': ['CICEKSEPETI']},
+        'temu': {'title': 'Temu', 'emoji': '🧡', 'bubble': True, 'senders': ['TEMU']},
+    }
     
     # Çok dilli referans kodu pattern'leri
     REF_PATTERNS = {
@@ -76,55 +109,79 @@ class SMSParser:
         ]
     }
     
-    def parse_sms(self, sms_body: str, language: str = 'tr') -> Dict:
+    def parse_sms(self, sms_body: str, language: str = 'tr', site: Optional[str] = None) -> Dict:
         """
-        SMS'i belirtilen dilde parse eder
+        SMS'i belirtilen dilde parse eder.
+        Her alan yalnızca bir kez, önceden derlenmiş motorla hesaplanır (bkz. _ParseEngine).
+        site verilirse (göndericiden çözülmüş, bkz. senders.py) gövdede site araması yapılmaz.
         """
+        started = time.perf_counter()
         sms_lower = sms_body.lower()
-        
+        engine = _get_engine(language)
+        ref_code = engine.extract_ref_code(sms_lower)
+        verification_code = engine.extract_verification_code(sms_lower)
+        if site is None:
+            site = engine.detect_site(sms_lower)
+        SMS_PARSE_SECONDS.observe(time.perf_counter() - started, language=engine.language)
+
         return {
             'original_body': sms_body,  # Orijinal SMS içeriği
             'raw': sms_body,            # RAW alanı - orijinal içerik
             'language': language,
-            'site': self._detect_site(sms_lower, language),
-            'ref_code': self._extract_ref_code(sms_lower, language),
-            'verification_code': self._extract_verification_code(sms_lower, language),
-            'code': self._extract_verification_code(sms_lower, language),  # 'code' alanı da ekle
-            'has_reference': bool(self._extract_ref_code(sms_lower, language))
+            'site': site,
+            'ref_code': ref_code,
+            'verification_code': verification_code,
+            'code': verification_code,  # 'code' alanı da ekle
+            'has_reference': bool(ref_code)
         }
     
+    def parse_many(self, bodies: Iterable, language: Optional[str] = None,
+                   workers: Optional[int] = None, chunk_size: int = 500) -> Iterator[Dict]:
+        """
+        Birden çok SMS'i sırayla parse eden generator.
+
+        Her öğe gövde metni ya da (gövde, site) çiftidir; site göndericiden
+        çözülmüşse (bkz. senders.py) parse_sms'e aynen geçirilir.
+        language verilmezse her SMS için detect_language ile dil tespit edilir.
+        workers > 1 ise gövdeler chunk_size'lık parçalar halinde bir process
+        havuzuna dağıtılır; sonuçlar yine giriş sırasıyla ve akış halinde döner
+        (aynı anda en fazla workers * 2 parça bellekte tutulur).
+        """
+        if not workers or workers <= 1:
+            for item in bodies:
+                body, site = item if isinstance(item, tuple) else (item, None)
+                yield self.parse_sms(body, language or self.detect_language(body), site)
+            return
+
+        # Worker süreçleri (spawn dahil) ebeveynle aynı kural paketini kullanır
+        rules = active_rules()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_activate_in_worker,
+                                 initargs=(rules.data, rules.source)) as executor:
+            pending = deque()
+            for chunk in _chunked(bodies, chunk_size):
+                pending.append(executor.submit(_parse_chunk, chunk, language))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    
     def _detect_site(self, sms_body: str, language: str) -> str:
         """
         SMS içeriğinden site adını tespit eder (çok dilli)
         """
-        for site, keywords in self.SITE_KEYWORDS.items():
-            lang_keywords = keywords.get(language, keywords.get('en', []))
-            for keyword in lang_keywords:
-                if keyword in sms_body:
-                    return site
-        return 'other'
+        return _get_engine(language).detect_site(sms_body)
     
     def _extract_ref_code(self, sms_body: str, language: str) -> Optional[str]:
         """
         Referans kodunu çıkarır (çok dilli)
         """
-        patterns = self.REF_PATTERNS.get(language, self.REF_PATTERNS['en'])
-        for pattern in patterns:
-            match = re.search(pattern, sms_body)
-            if match:
-                return match.group(1).upper()
-        return None
+        return _get_engine(language).extract_ref_code(sms_body)
     
     def _extract_verification_code(self, sms_body: str, language: str) -> Optional[str]:
         """
         Doğrulama kodunu çıkarır (çok dilli)
         """
-        patterns = self.VERIFICATION_PATTERNS.get(language, self.VERIFICATION_PATTERNS['en'])
-        for pattern in patterns:
-            match = re.search(pattern, sms_body)
-            if match:
-                return match.group(1)
-        return None
+        return _get_engine(language).extract_verification_code(sms_body)
 
     def detect_language(self, sms_body: str) -> str:
         """
@@ -132,16 +189,9 @@ class SMSParser:
         """
         sms_lower = sms_body.lower()
         
-        # Bulgarca kelimeler
-        bg_keywords = ['потвърдителен', 'код', 'номер', 'рефер']
-        # Türkçe kelimeler  
-        tr_keywords = ['onay', 'kod', 'numara', 'referans']
-        # İngilizce kelimeler
-        en_keywords = ['verification', 'code', 'number', 'reference']
-        
-        bg_count = sum(1 for word in bg_keywords if word in sms_lower)
-        tr_count = sum(1 for word in tr_keywords if word in sms_lower) 
-        en_count = sum(1 for word in en_keywords if word in sms_lower)
+        bg_count = sum(1 for word in LANGUAGE_KEYWORDS['bg'] if word in sms_lower)
+        tr_count = sum(1 for word in LANGUAGE_KEYWORDS['tr'] if word in sms_lower) 
+        en_count = sum(1 for word in LANGUAGE_KEYWORDS['en'] if word in sms_lower)
         
         if bg_count > tr_count and bg_count > en_count:
             return 'bg'
@@ -152,6 +202,180 @@ class SMSParser:
         else:
             return 'tr'  # Varsayılan
 
+class _ParseEngine:
+    """
+    Tek bir dil için derlenmiş parse motoru.
+    Site anahtar kelimeleri KeywordMatcher'a, referans ve doğrulama pattern'leri
+    PriorityMatcher'lara derlenir; sonuçlar eski sıralı döngülerle birebir aynıdır.
+    """
+
+    def __init__(self, site_keywords: Dict, ref_patterns: Dict, verification_patterns: Dict, language: str):
+        self.language = language
+        sites = []
+        keywords = []
+        priorities = []
+        for site, keywords_by_lang in site_keywords.items():
+            lang_keywords = keywords_by_lang.get(language, keywords_by_lang.get('en', []))
+            for keyword in lang_keywords:
+                keywords.append(keyword)
+                priorities.append(len(sites))
+            sites.append(site)
+
+        self.sites = tuple(sites)
+        self.site_matcher = KeywordMatcher(keywords, priorities)
+        self.ref_matcher = PriorityMatcher(ref_patterns.get(language, ref_patterns['en']))
+        self.verification_matcher = PriorityMatcher(
+            verification_patterns.get(language, verification_patterns['en'])
+        )
+
+    def detect_site(self, sms_lower: str) -> str:
+        found = self.site_matcher.search(sms_lower)
+        return self.sites[found] if found is not None else 'other'
+
+    def extract_ref_code(self, sms_lower: str) -> Optional[str]:
+        found = self.ref_matcher.search(sms_lower)
+        return found[1][0].upper() if found else None
+
+    def extract_verification_code(self, sms_lower: str) -> Optional[str]:
+        found = self.verification_matcher.search(sms_lower)
+        return found[1][0] if found else None
+
+
+class RulePack:
+    """
+    Derlenmiş, değişmez kural paketi: site anahtar kelimeleri, referans ve
+    doğrulama kodu pattern'leri, site adları ve baloncukları.
+
+    Paketteki tüm diller kurulurken bir kez derlenir; paket değişince yenisi
+    ayrı kurulup activate_rules() ile tek bir referans atamasıyla devreye
+    girer. Mesaj başına derleme yapılmaz, yarım kurulmuş paket görülmez.
+    Veri biçimi ve doğrulaması için bkz. rules.py.
+    """
+
+    def __init__(self, data: Dict, source: str = 'builtin'):
+        self.data = data
+        self.source = source
+        self.version = str(data.get('version') or 'builtin')
+        self.checksum = hashlib.sha1(
+            json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+        sites = data['sites']
+        site_keywords = {site['id']: site['keywords'] for site in sites}
+        self.sites = tuple(site_keywords)
+        self.titles = MappingProxyType({site['id']: site.get('title') or site['id'].title() for site in sites})
+        # Baloncuğu olan siteler; 'other' bunların dışındaki tüm SMS'leri kapsar
+        self.bubble_sites = tuple(site['id'] for site in sites if site.get('bubble'))
+        self.site_payloads = frozenset(self.bubble_sites + ('other',))
+        self.site_bubbles = tuple(
+            {"title": f"{site.get('emoji') or '🛒'} {self.titles[site['id']]}", "payload": site['id']}
+            for site in sites if site.get('bubble')
+        )
+        # Yapılandırılmış gönderici adı -> site (öğrenilenler senders.SenderIndex'te)
+        self.senders = MappingProxyType({
+            normalize_sender(sender): site['id'] for site in sites for sender in site.get('senders', ())
+        })
+
+        ref_patterns = data['ref_patterns']
+        verification_patterns = data['verification_patterns']
+        self.languages = frozenset(ref_patterns) | frozenset(verification_patterns) | frozenset(
+            language for keywords in site_keywords.values() for language in keywords)
+        self._engines = {
+            language: _ParseEngine(site_keywords, ref_patterns, verification_patterns, language)
+            for language in self.languages | {'en'}
+        }
+        # Hiçbir tabloda bulunmayan diller tamamen 'en' tablolarına düşer
+        self._fallback = self._engines['en']
+
+    def engine(self, language: str) -> '_ParseEngine':
+        return self._engines.get(language, self._fallback)
+
+    def site_title(self, site: Optional[str]) -> str:
+        return self.titles.get(site) or (site or '').title()
+
+
+def builtin_rule_data() -> Dict:
+    """SMSParser sınıf tablolarından yerleşik paket (rules.py dosya/DB biçimiyle aynı)"""
+    return {
+        'version': 'builtin',
+        'sites': [
+            dict(id=site, keywords=keywords, **SMSParser.SITES.get(site, {}))
+            for site, keywords in SMSParser.SITE_KEYWORDS.items()
+        ],
+        'ref_patterns': SMSParser.REF_PATTERNS,
+        'verification_patterns': SMSParser.VERIFICATION_PATTERNS,
+    }
+
+
+_SENDER_STRIP_RE = re.compile(r'[^A-Z0-9]')
+_SENDER_FOLD = str.maketrans('İÇŞĞÜÖ', 'ICSGUO')
+
+
+def normalize_sender(from_number: Optional[str]) -> Optional[str]:
+    """
+    Alfanümerik gönderici adını karşılaştırma anahtarına çevirir ('n11.com' ->
+    'N11COM'). Harf içermeyen göndericiler (telefon numaraları, kısa numaralar)
+    birden çok siteyle paylaşılabildiği için None döner.
+    """
+    if not from_number:
+        return None
+    sender = _SENDER_STRIP_RE.sub('', from_number.upper().translate(_SENDER_FOLD))
+    if not sender or sender.isdigit() or len(sender) > 16:
+        return None
+    return sender
+
+
+_active_rules: Optional[RulePack] = None
+
+
+def active_rules() -> RulePack:
+    """Süreçte kullanılan paket; ilk çağrıda yerleşik paket derlenir"""
+    rules = _active_rules
+    if rules is None:
+        rules = activate_rules(RulePack(builtin_rule_data()))
+    return rules
+
+
+def activate_rules(rules: RulePack) -> RulePack:
+    """Paketi atomik olarak devreye alır (tek referans ataması); devreye alınan paketi döndürür"""
+    global _active_rules
+    _active_rules = rules
+    return rules
+
+
+def _activate_in_worker(data: Dict, source: str):
+    activate_rules(RulePack(data, source))
+
+
+def _get_engine(language: str) -> _ParseEngine:
+    return active_rules().engine(language)
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_chunk(bodies: List, language: Optional[str]) -> List[Dict]:
+    """Process havuzunda çalışan parça parse fonksiyonu (pickle edilebilir olmalı)"""
+    return list(SMSParser().parse_many(bodies, language))
+
+
+# Dil tespiti anahtar kelimeleri
+LANGUAGE_KEYWORDS = {
+    # Bulgarca kelimeler
+    'bg': ('потвърдителен', 'код', 'номер', 'рефер'),
+    # Türkçe kelimeler
+    'tr': ('onay', 'kod', 'numara', 'referans'),
+    # İngilizce kelimeler
+    'en': ('verification', 'code', 'number', 'reference')
+}
+
 # Test fonksiyonu - çok dilli
 def test_multilingual_parser():
     """Çok dilli parser testleri"""
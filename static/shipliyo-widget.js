@@ -12,6 +12,11 @@ class ShipliyoWidget {
         this.API_BASE_URL = ''; 
         
         this.currentLanguage = 'tr';
+        this.sessionId = this.loadSessionId(); // Sayfa yenilemelerinde aynı kalır (chat_sessions)
+        this.smsStream = null; // Açık SSE bağlantısı (SMS bekleme)
+        this.smsPoll = null; // SSE açılamadığında periyodik sorgu
+        this.SMS_POLL_INTERVAL = 5000;
+        this.SMS_POLL_TIMEOUT = 120000;
         this.translations = {
             'tr': {
                 'welcome': 'Merhaba!',
@@ -34,6 +39,7 @@ class ShipliyoWidget {
                 'messagePlaceholder': 'Mesajınızı yazın...',
                 'searching': 'aranıyor...',
                 'noSms': 'SMS bulunamadı.',
+                'waitingSms': 'SMS bekleniyor, kod gelince burada görünecek...',
                 'error': 'Hata oluştu:',
                 'smsFound': 'SMS bulundu:',
                 'addressResult': 'TESLİMAT ADRESİNİZ:',
@@ -68,6 +74,7 @@ class ShipliyoWidget {
                 'messagePlaceholder': 'Type your message...',
                 'searching': 'searching...',
                 'noSms': 'No SMS found.',
+                'waitingSms': 'Waiting for the SMS, the code will appear here...',
                 'error': 'Error:',
                 'smsFound': 'SMS found:',
                 'addressResult': 'YOUR DELIVERY ADDRESS:',
@@ -102,6 +109,7 @@ class ShipliyoWidget {
                 'messagePlaceholder': 'Напишете вашето съобщение...',
                 'searching': 'търси се...',
                 'noSms': 'Не са намерени SMS.',
+                'waitingSms': 'Очаква се SMS, кодът ще се появи тук...',
                 'error': 'Грешка:',
                 'smsFound': 'Намерени SMS:',
                 'addressResult': 'ВАШИЯТ АДРЕС ЗА ДОСТАВКА:',
@@ -120,10 +128,28 @@ class ShipliyoWidget {
         this.init();
     }
     
+    loadSessionId() {
+        const key = 'shipliyo_session_id';
+        try {
+            const saved = localStorage.getItem(key);
+            if (saved) return saved;
+        } catch (e) { /* localStorage kapalı (gizli mod vb.) */ }
+
+        const random = (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+        const sessionId = 'widget_' + random;
+        try {
+            localStorage.setItem(key, sessionId);
+        } catch (e) { /* yalnızca bu sayfa ömrü boyunca geçerli */ }
+        return sessionId;
+    }
+    
     setLanguage(lang) {
         if (this.translations[lang]) {
             this.currentLanguage = lang;
             this.updateUITexts();
+            this.loadSites();
             console.log('Dil değiştirildi:', lang);
         }
     }
@@ -932,6 +958,9 @@ class ShipliyoWidget {
     }
     
     showView(viewName, addToHistory = true) {
+        // Sohbetten çıkılınca bekleyen SMS akışını kapat
+        if (viewName !== 'chat') this.closeSmsStream();
+        
         // Tüm view'leri gizle
         document.querySelectorAll('[class^="view-"]').forEach(view => {
             view.style.display = 'none';
@@ -983,13 +1012,25 @@ class ShipliyoWidget {
     }
     
     loadSites() {
-        const sites = [
+        // Varsayılan liste; site listesi sunucudaki aktif kural paketinden gelince yenilenir
+        this.renderSites([
             { name: 'Trendyol', id: 'trendyol' },
             { name: 'Hepsiburada', id: 'hepsiburada' },
             { name: 'n11', id: 'n11' },
             { name: 'Diğer', id: 'other' }
-        ];
-        
+        ]);
+
+        fetch(this.API_BASE_URL + '/api/chatbot/reply/get_code?language=' + encodeURIComponent(this.currentLanguage))
+            .then(response => response.json())
+            .then(data => {
+                if (Array.isArray(data.bubbles) && data.bubbles.length) {
+                    this.renderSites(data.bubbles.map(bubble => ({ name: bubble.title, id: bubble.payload })));
+                }
+            })
+            .catch(error => console.log('Site listesi alınamadı:', error));
+    }
+
+    renderSites(sites) {
         const grid = document.getElementById('sitesGrid');
         grid.innerHTML = '';
         
@@ -1031,7 +1072,7 @@ class ShipliyoWidget {
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify({
                 message: refCode,
-                session_id: 'widget_user_' + Date.now(),
+                session_id: this.sessionId,
                 language: this.currentLanguage
             })
         })
@@ -1103,38 +1144,138 @@ class ShipliyoWidget {
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify({
                 message: site,
-                session_id: 'widget_user_' + Date.now(),
+                session_id: this.sessionId,
                 language: this.currentLanguage
             })
         })
         .then(response => response.json())
         .then(data => {
             this.showLoading(false);
-            
-            if (data.sms_list && data.sms_list.length > 0) {
-                let message = this.t('smsFound') + ` ${data.sms_list.length} SMS:\n\n`;
-                
-                data.sms_list.forEach((sms, index) => {
-                    let codeDisplay = sms.code;
-                    if (!codeDisplay && sms.raw) {
-                        const codeMatch = sms.raw.match(/\b\d{4,6}\b/);
-                        codeDisplay = codeMatch ? codeMatch[0] : sms.raw;
-                    }
-                    
-                    message += `${index + 1}. 📱 ${codeDisplay}\n`;
-                });
-                
-                this.addMessage(message, 'bot');
-            } else if (data.response) {
-                this.addMessage(data.response, 'bot');
-            } else {
-                this.addMessage(this.t('noSms'), 'bot');
+
+            if (!this.showSmsResult(data)) {
+                // Henüz SMS yok: tekrar sorgulamak yerine sunucunun itmesini bekle
+                this.waitForSms(site);
             }
         })
         .catch(error => {
             this.addMessage(this.t('error') + ' ' + error.message, 'bot');
         });
     }
+
+    showSmsResult(data) {
+        // /api/chatbot site yanıtını gösterir; gösterilecek SMS yoksa false
+        if (data.sms_list && data.sms_list.length > 0) {
+            let message = this.t('smsFound') + ` ${data.sms_list.length} SMS:\n\n`;
+
+            data.sms_list.forEach((sms, index) => {
+                let codeDisplay = sms.code;
+                if (!codeDisplay && sms.raw) {
+                    const codeMatch = sms.raw.match(/\b\d{4,6}\b/);
+                    codeDisplay = codeMatch ? codeMatch[0] : sms.raw;
+                }
+
+                message += `${index + 1}. 📱 ${codeDisplay}\n`;
+            });
+
+            this.addMessage(message, 'bot');
+            return true;
+        }
+        if (data.success) {
+            this.addMessage(data.response, 'bot');
+            return true;
+        }
+        return false;
+    }
+
+    waitForSms(site) {
+        this.closeSmsStream();
+        this.addMessage(this.t('waitingSms'), 'bot');
+
+        if (!window.EventSource) {
+            this.pollForSms(site);
+            return;
+        }
+
+        const url = this.API_BASE_URL + '/api/sms-stream?site=' + encodeURIComponent(site) +
+            '&language=' + encodeURIComponent(this.currentLanguage);
+        const stream = new EventSource(url);
+        this.smsStream = stream;
+        let opened = false;
+
+        stream.onopen = () => {
+            opened = true;
+        };
+
+        stream.addEventListener('sms', event => {
+            const sms = JSON.parse(event.data);
+            this.closeSmsStream();
+            this.addMessage(sms.response || ('📱 ' + sms.verification_code), 'bot');
+        });
+        
+        stream.addEventListener('timeout', () => {
+            this.closeSmsStream();
+            this.addMessage(this.t('noSms'), 'bot');
+        });
+        
+        stream.onerror = () => {
+            // Sunucu akışı kapattıysa tekrar bağlanma
+            if (stream.readyState === EventSource.CLOSED) {
+                this.closeSmsStream();
+                // Akış hiç açılamadıysa (ör. 503: sunucudaki akış kapasitesi dolu) sorgulamaya geç
+                if (!opened) {
+                    this.pollForSms(site);
+                }
+            }
+        };
+    }
+
+    pollForSms(site) {
+        const poll = {timer: null, deadline: Date.now() + this.SMS_POLL_TIMEOUT};
+        this.smsPoll = poll;
+
+        const next = () => {
+            if (this.smsPoll !== poll) return; // iptal edildi ya da yeni bekleme başladı
+            if (Date.now() >= poll.deadline) {
+                this.smsPoll = null;
+                this.addMessage(this.t('noSms'), 'bot');
+                return;
+            }
+            poll.timer = setTimeout(check, this.SMS_POLL_INTERVAL);
+        };
+        const check = () => {
+            fetch(this.API_BASE_URL + '/api/chatbot', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({
+                    message: site,
+                    session_id: this.sessionId,
+                    language: this.currentLanguage
+                })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (this.smsPoll !== poll) return;
+                if (this.showSmsResult(data)) {
+                    this.smsPoll = null;
+                } else {
+                    next();
+                }
+            })
+            .catch(() => next());
+        };
+        next();
+    }
+
+    closeSmsStream() {
+        if (this.smsStream) {
+            this.smsStream.close();
+            this.smsStream = null;
+        }
+        if (this.smsPoll) {
+            clearTimeout(this.smsPoll.timer);
+            this.smsPoll = null;
+        }
+    }
     
     showHelp() {
         this.showChatView();
@@ -1160,7 +1301,7 @@ class ShipliyoWidget {
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify({
                 message: message,
-                session_id: 'widget_user_' + Date.now(),
+                session_id: this.sessionId,
                 language: this.currentLanguage
             })
         })
@@ -1,4 +1,4 @@
-class ShipliyoWidget{constructor(){this.isOpen=!1,this.isLoading=!1,this.currentView="main",this.viewHistory=[],this.API_BASE_URL="https://shipliyo-chatbot-production.up.railway.app",this.currentLanguage="tr",this.translations={tr:{welcome:"Merhaba!",helpText:"Size nasıl yardımcı olabilirim?",online:"\xc7evrimi\xe7i",getCode:"Doğrulama Kodu Al",help:"Yardım & Bilgi",searchRef:"Referans Kodu ile Ara",getAddress:"Teslimat Adresi Al",selectSite:"Site Se\xe7in",siteDesc:"Doğrulama kodu almak i\xe7in bir site se\xe7in",searchRefTitle:"Referans Kodu Ara",searchRefDesc:"Referans kodunu girerek arama yapın",refPlaceholder:"Referans kodunu girin...",addressTitle:"Teslimat Adresi",addressDesc:"Telefon numaranızın son 9 hanesini girin",phonePlaceholder:"\xd6rnek: 111222333",processing:"İşleniyor...",send:"G\xf6nder",messagePlaceholder:"Mesajınızı yazın...",searching:"aranıyor...",noSms:"SMS bulunamadı.",error:"Hata oluştu:",smsFound:"SMS bulundu:",addressResult:"TESLİMAT ADRESİNİZ:",turkish:"\uD83C\uDDF9\uD83C\uDDF7 T\xfcrk\xe7e:",english:"\uD83C\uDDEC\uD83C\uDDE7 English:",bulgarian:"\uD83C\uDDE7\uD83C\uDDEC Български:",city:"İl:",district:"İl\xe7e:",neighborhood:"Mahalle:",street:"Sokak:",buildingNo:"Kapı No:",invalidPhone:"L\xfctfen sadece 9 haneli telefon numarası girin (\xf6rn: 111222333)"},en:{welcome:"Hello!",helpText:"How can I help you?",online:"Online",getCode:"Get Verification Code",help:"Help & Information",searchRef:"Search by Reference Code",getAddress:"Get Delivery Address",selectSite:"Select Site",siteDesc:"Select a site to get verification code",searchRefTitle:"Search Reference Code",searchRefDesc:"Search by entering reference code",refPlaceholder:"Enter reference code...",addressTitle:"Delivery Address",addressDesc:"Enter last 9 digits of your phone number",phonePlaceholder:"Example: 111222333",processing:"Processing...",send:"Send",messagePlaceholder:"Type your message...",searching:"searching...",noSms:"No SMS found.",error:"Error:",smsFound:"SMS found:",addressResult:"YOUR DELIVERY ADDRESS:",turkish:"\uD83C\uDDF9\uD83C\uDDF7 Turkish:",english:"\uD83C\uDDEC\uD83C\uDDE7 English:",bulgarian:"\uD83C\uDDE7\uD83C\uDDEC Bulgarian:",city:"City:",district:"District:",neighborhood:"Neighborhood:",street:"Street:",buildingNo:"Building No:",invalidPhone:"Please enter only 9-digit phone number (e.g., 111222333)"},bg:{welcome:"Здравейте!",helpText:"Как мога да ви помогна?",online:"Онлайн",getCode:"Вземи код за потвърждение",help:"Помощ & Информация",searchRef:"Търсене с референтен код",getAddress:"Вземи адрес за доставка",selectSite:"Изберете сайт",siteDesc:"Изберете сайт, за да получите код за потвърждение",searchRefTitle:"Търсене на референтен код",searchRefDesc:"Търсене чрез въвеждане на референтен код",refPlaceholder:"Въведете референтен код...",addressTitle:"Адрес за доставка",addressDesc:"Въведете последните 9 цифри от телефона си",phonePlaceholder:"Пример: 111222333",processing:"Обработва се...",send:"Изпрати",messagePlaceholder:"Напишете вашето съобщение...",searching:"търси се...",noSms:"Не са намерени SMS.",error:"Грешка:",smsFound:"Намерени SMS:",addressResult:"ВАШИЯТ АДРЕС ЗА ДОСТАВКА:",turkish:"\uD83C\uDDF9\uD83C\uDDF7 Турски:",english:"\uD83C\uDDEC\uD83C\uDDE7 Английски:",bulgarian:"\uD83C\uDDE7\uD83C\uDDEC Български:",city:"Област:",district:"Община:",neighborhood:"Квартал:",street:"Улица:",buildingNo:"Номер на сграда:",invalidPhone:"Моля, въведете само 9-цифрен телефонен номер (напр. 111222333)"}},this.init()}setLanguage(e){this.translations[e]&&(this.currentLanguage=e,this.updateUITexts(),console.log("Dil değiştirildi:",e))}t(e){return this.translations[this.currentLanguage][e]||e}updateUITexts(){let e=this.translations[this.currentLanguage],t=document.querySelector(".header-text h3");t&&(t.textContent="Shipliyo Assistant");let i=document.querySelector(".status small");i&&(i.textContent=e.online);let s=document.querySelector(".welcome-text strong");s&&(s.textContent=e.welcome);let a=document.querySelector(".welcome-text p");a&&(a.textContent=e.helpText);let n=document.querySelectorAll(".action-card span");n.length>=4&&(n[0].textContent=e.getCode,n[1].textContent=e.help,n[2].textContent=e.searchRef,n[3].textContent=e.getAddress);let r=document.querySelector("#sitesView .view-header h3");r&&(r.textContent=e.selectSite);let d=document.querySelector("#sitesView .view-header p");d&&(d.textContent=e.siteDesc);let o=document.querySelector("#referenceView .view-header h3");o&&(o.textContent=e.searchRefTitle);let l=document.querySelector("#referenceView .view-header p");l&&(l.textContent=e.searchRefDesc);let c=document.querySelector("#addressView .view-header h3");c&&(c.textContent=e.addressTitle);let h=document.querySelector("#addressView .view-header p");h&&(h.textContent=e.addressDesc);let p=document.getElementById("refCodeInput");p&&(p.placeholder=e.refPlaceholder);let g=document.getElementById("phoneInput");g&&(g.placeholder=e.phonePlaceholder);let u=document.getElementById("chatInput");u&&(u.placeholder=e.messagePlaceholder);let _=document.querySelector("#loadingState p");_&&(_.textContent=e.processing)}init(){this.createWidget(),this.attachEvents()}createWidget(){let e=`
+class ShipliyoWidget{constructor(){this.isOpen=!1,this.isLoading=!1,this.currentView="main",this.viewHistory=[],this.API_BASE_URL="https://shipliyo-chatbot-production.up.railway.app",this.currentLanguage="tr",this.sessionId=this.loadSessionId(),this.smsStream=null,this.smsPoll=null,this.SMS_POLL_INTERVAL=5e3,this.SMS_POLL_TIMEOUT=12e4,this.translations={tr:{welcome:"Merhaba!",helpText:"Size nasıl yardımcı olabilirim?",online:"\xc7evrimi\xe7i",getCode:"Doğrulama Kodu Al",help:"Yardım & Bilgi",searchRef:"Referans Kodu ile Ara",getAddress:"Teslimat Adresi Al",selectSite:"Site Se\xe7in",siteDesc:"Doğrulama kodu almak i\xe7in bir site se\xe7in",searchRefTitle:"Referans Kodu Ara",searchRefDesc:"Referans kodunu girerek arama yapın",refPlaceholder:"Referans kodunu girin...",addressTitle:"Teslimat Adresi",addressDesc:"Telefon numaranızın son 9 hanesini girin",phonePlaceholder:"\xd6rnek: 111222333",processing:"İşleniyor...",send:"G\xf6nder",messagePlaceholder:"Mesajınızı yazın...",searching:"aranıyor...",noSms:"SMS bulunamadı.",waitingSms:"SMS bekleniyor, kod gelince burada g\xf6r\xfcnecek...",error:"Hata oluştu:",smsFound:"SMS bulundu:",addressResult:"TESLİMAT ADRESİNİZ:",turkish:"\uD83C\uDDF9\uD83C\uDDF7 T\xfcrk\xe7e:",english:"\uD83C\uDDEC\uD83C\uDDE7 English:",bulgarian:"\uD83C\uDDE7\uD83C\uDDEC Български:",city:"İl:",district:"İl\xe7e:",neighborhood:"Mahalle:",street:"Sokak:",buildingNo:"Kapı No:",invalidPhone:"L\xfctfen sadece 9 haneli telefon numarası girin (\xf6rn: 111222333)"},en:{welcome:"Hello!",helpText:"How can I help you?",online:"Online",getCode:"Get Verification Code",help:"Help & Information",searchRef:"Search by Reference Code",getAddress:"Get Delivery Address",selectSite:"Select Site",siteDesc:"Select a site to get verification code",searchRefTitle:"Search Reference Code",searchRefDesc:"Search by entering reference code",refPlaceholder:"Enter reference code...",addressTitle:"Delivery Address",addressDesc:"Enter last 9 digits of your phone number",phonePlaceholder:"Example: 111222333",processing:"Processing...",send:"Send",messagePlaceholder:"Type your message...",searching:"searching...",noSms:"No SMS found.",waitingSms:"Waiting for the SMS, the code will appear here...",error:"Error:",smsFound:"SMS found:",addressResult:"YOUR DELIVERY ADDRESS:",turkish:"\uD83C\uDDF9\uD83C\uDDF7 Turkish:",english:"\uD83C\uDDEC\uD83C\uDDE7 English:",bulgarian:"\uD83C\uDDE7\uD83C\uDDEC Bulgarian:",city:"City:",district:"District:",neighborhood:"Neighborhood:",street:"Street:",buildingNo:"Building No:",invalidPhone:"Please enter only 9-digit phone number (e.g., 111222333)"},bg:{welcome:"Здравейте!",helpText:"Как мога да ви помогна?",online:"Онлайн",getCode:"Вземи код за потвърждение",help:"Помощ & Информация",searchRef:"Търсене с референтен код",getAddress:"Вземи адрес за доставка",selectSite:"Изберете сайт",siteDesc:"Изберете сайт, за да получите код за потвърждение",searchRefTitle:"Търсене на референтен код",searchRefDesc:"Търсене чрез въвеждане на референтен код",refPlaceholder:"Въведете референтен код...",addressTitle:"Адрес за доставка",addressDesc:"Въведете последните 9 цифри от телефона си",phonePlaceholder:"Пример: 111222333",processing:"Обработва се...",send:"Изпрати",messagePlaceholder:"Напишете вашето съобщение...",searching:"търси се...",noSms:"Не са намерени SMS.",waitingSms:"Очаква се SMS, кодът ще се появи тук...",error:"Грешка:",smsFound:"Намерени SMS:",addressResult:"ВАШИЯТ АДРЕС ЗА ДОСТАВКА:",turkish:"\uD83C\uDDF9\uD83C\uDDF7 Турски:",english:"\uD83C\uDDEC\uD83C\uDDE7 Английски:",bulgarian:"\uD83C\uDDE7\uD83C\uDDEC Български:",city:"Област:",district:"Община:",neighborhood:"Квартал:",street:"Улица:",buildingNo:"Номер на сграда:",invalidPhone:"Моля, въведете само 9-цифрен телефонен номер (напр. 111222333)"}},this.init()}loadSessionId(){let e="shipliyo_session_id";try{let t=localStorage.getItem(e);if(t)return t}catch(i){}let s="widget_"+(window.crypto&&crypto.randomUUID?crypto.randomUUID():Date.now().toString(36)+"-"+Math.random().toString(36).slice(2,12));try{localStorage.setItem(e,s)}catch(a){}return s}setLanguage(e){this.translations[e]&&(this.currentLanguage=e,this.updateUITexts(),this.loadSites(),console.log("Dil değiştirildi:",e))}t(e){return this.translations[this.currentLanguage][e]||e}updateUITexts(){let e=this.translations[this.currentLanguage],t=document.querySelector(".header-text h3");t&&(t.textContent="Shipliyo Assistant");let i=document.querySelector(".status small");i&&(i.textContent=e.online);let s=document.querySelector(".welcome-text strong");s&&(s.textContent=e.welcome);let a=document.querySelector(".welcome-text p");a&&(a.textContent=e.helpText);let n=document.querySelectorAll(".action-card span");n.length>=4&&(n[0].textContent=e.getCode,n[1].textContent=e.help,n[2].textContent=e.searchRef,n[3].textContent=e.getAddress);let r=document.querySelector("#sitesView .view-header h3");r&&(r.textContent=e.selectSite);let d=document.querySelector("#sitesView .view-header p");d&&(d.textContent=e.siteDesc);let o=document.querySelector("#referenceView .view-header h3");o&&(o.textContent=e.searchRefTitle);let l=document.querySelector("#referenceView .view-header p");l&&(l.textContent=e.searchRefDesc);let c=document.querySelector("#addressView .view-header h3");c&&(c.textContent=e.addressTitle);let h=document.querySelector("#addressView .view-header p");h&&(h.textContent=e.addressDesc);let p=document.getElementById("refCodeInput");p&&(p.placeholder=e.refPlaceholder);let g=document.getElementById("phoneInput");g&&(g.placeholder=e.phonePlaceholder);let u=document.getElementById("chatInput");u&&(u.placeholder=e.messagePlaceholder);let _=document.querySelector("#loadingState p");_&&(_.textContent=e.processing)}init(){this.createWidget(),this.attachEvents()}createWidget(){let e=`
             <div id="shipliyoWidget">
                 <div id="shipliyoBubble">
                     <div class="bubble-pulse"></div>
@@ -604,7 +604,7 @@ class ShipliyoWidget{constructor(){this.isOpen=!1,this.isLoading=!1,this.current
                     padding: 2px 0;
                 }
             </style>
-        `;document.head.insertAdjacentHTML("beforeend",e)}attachEvents(){document.getElementById("shipliyoBubble").addEventListener("click",()=>{this.toggleWidget()}),document.querySelector(".close-btn").addEventListener("click",()=>{this.closeWidget()}),document.getElementById("backBtn").addEventListener("click",()=>{this.goBack()}),document.querySelectorAll(".action-card").forEach(e=>{e.addEventListener("click",e=>{let t=e.currentTarget.dataset.action;this.handleAction(t)})}),document.getElementById("searchRefBtn").addEventListener("click",()=>{this.searchReference()}),document.getElementById("refCodeInput").addEventListener("keypress",e=>{"Enter"===e.key&&this.searchReference()}),document.getElementById("sendMessageBtn").addEventListener("click",()=>{this.sendMessage()}),document.getElementById("chatInput").addEventListener("keypress",e=>{"Enter"===e.key&&this.sendMessage()}),document.getElementById("getAddressBtn").addEventListener("click",()=>{this.processPhoneNumber()}),document.getElementById("phoneInput").addEventListener("keypress",e=>{"Enter"===e.key&&this.processPhoneNumber()}),document.querySelectorAll(".lang-btn").forEach(e=>{e.addEventListener("click",e=>{let t=e.currentTarget.dataset.lang;this.setLanguage(t),document.querySelectorAll(".lang-btn").forEach(e=>{e.classList.remove("active")}),e.currentTarget.classList.add("active")})})}toggleWidget(){this.isOpen=!this.isOpen,document.getElementById("shipliyoWindow").style.display=this.isOpen?"flex":"none",this.isOpen&&this.showView("main")}closeWidget(){this.isOpen=!1,document.getElementById("shipliyoWindow").style.display="none",this.viewHistory=[],this.updateBackButton()}showView(e,t=!0){document.querySelectorAll('[class^="view-"]').forEach(e=>{e.style.display="none"}),document.getElementById(e+"View").style.display="block",this.currentView=e,t&&"main"!==e&&this.viewHistory.push(e),this.updateBackButton()}goBack(){if(this.viewHistory.length>0){this.viewHistory.pop();let e=this.viewHistory.length>0?this.viewHistory[this.viewHistory.length-1]:"main";this.showView(e,!1)}else this.showView("main")}updateBackButton(){let e=document.getElementById("backBtn");e.style.display=this.viewHistory.length>0?"flex":"none"}handleAction(e){switch(console.log("Action:",e),e){case"get_code":this.showSitesView();break;case"help":this.showHelp();break;case"reference_input":this.showReferenceView();break;case"get_address":this.showAddressView()}}loadSites(){let e=document.getElementById("sitesGrid");e.innerHTML="",[{name:"Trendyol",id:"trendyol"},{name:"Hepsiburada",id:"hepsiburada"},{name:"n11",id:"n11"},{name:"Diğer",id:"other"}].forEach(t=>{let i=document.createElement("div");i.className="site-card",i.textContent=t.name,i.dataset.site=t.id,i.addEventListener("click",()=>{this.selectSite(t.id)}),e.appendChild(i)})}showSitesView(){this.showView("sites")}showReferenceView(){this.showView("reference"),document.getElementById("refCodeInput").focus()}showAddressView(){this.showView("address"),document.getElementById("phoneInput").focus()}searchReference(){let e=document.getElementById("refCodeInput").value.trim();e&&(this.showChatView(),this.addMessage(e+" "+this.t("searching"),"user"),fetch(this.API_BASE_URL+"/api/chatbot",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({message:e,session_id:"widget_user_"+Date.now(),language:this.currentLanguage})}).then(e=>e.json()).then(e=>{this.addMessage(e.response||this.t("noSms"),"bot")}).catch(e=>{this.addMessage(this.t("error")+" "+e.message,"bot")}))}processPhoneNumber(){let e=document.getElementById("phoneInput"),t=e.value.trim(),i=document.getElementById("addressResult");if(t){if(9===t.length&&/^\d+$/.test(t)){let s=`BG${t} Hatip Mahallesi Fulya Sokak No: 19/A \xc7orlu, Tekirdağ`,a=`
+        `;document.head.insertAdjacentHTML("beforeend",e)}attachEvents(){document.getElementById("shipliyoBubble").addEventListener("click",()=>{this.toggleWidget()}),document.querySelector(".close-btn").addEventListener("click",()=>{this.closeWidget()}),document.getElementById("backBtn").addEventListener("click",()=>{this.goBack()}),document.querySelectorAll(".action-card").forEach(e=>{e.addEventListener("click",e=>{let t=e.currentTarget.dataset.action;this.handleAction(t)})}),document.getElementById("searchRefBtn").addEventListener("click",()=>{this.searchReference()}),document.getElementById("refCodeInput").addEventListener("keypress",e=>{"Enter"===e.key&&this.searchReference()}),document.getElementById("sendMessageBtn").addEventListener("click",()=>{this.sendMessage()}),document.getElementById("chatInput").addEventListener("keypress",e=>{"Enter"===e.key&&this.sendMessage()}),document.getElementById("getAddressBtn").addEventListener("click",()=>{this.processPhoneNumber()}),document.getElementById("phoneInput").addEventListener("keypress",e=>{"Enter"===e.key&&this.processPhoneNumber()}),document.querySelectorAll(".lang-btn").forEach(e=>{e.addEventListener("click",e=>{let t=e.currentTarget.dataset.lang;this.setLanguage(t),document.querySelectorAll(".lang-btn").forEach(e=>{e.classList.remove("active")}),e.currentTarget.classList.add("active")})})}toggleWidget(){this.isOpen=!this.isOpen,document.getElementById("shipliyoWindow").style.display=this.isOpen?"flex":"none",this.isOpen&&this.showView("main")}closeWidget(){this.isOpen=!1,document.getElementById("shipliyoWindow").style.display="none",this.viewHistory=[],this.updateBackButton()}showView(e,t=!0){"chat"!==e&&this.closeSmsStream(),document.querySelectorAll('[class^="view-"]').forEach(e=>{e.style.display="none"}),document.getElementById(e+"View").style.display="block",this.currentView=e,t&&"main"!==e&&this.viewHistory.push(e),this.updateBackButton()}goBack(){if(this.viewHistory.length>0){this.viewHistory.pop();let e=this.viewHistory.length>0?this.viewHistory[this.viewHistory.length-1]:"main";this.showView(e,!1)}else this.showView("main")}updateBackButton(){let e=document.getElementById("backBtn");e.style.display=this.viewHistory.length>0?"flex":"none"}handleAction(e){switch(console.log("Action:",e),e){case"get_code":this.showSitesView();break;case"help":this.showHelp();break;case"reference_input":this.showReferenceView();break;case"get_address":this.showAddressView()}}loadSites(){this.renderSites([{name:"Trendyol",id:"trendyol"},{name:"Hepsiburada",id:"hepsiburada"},{name:"n11",id:"n11"},{name:"Diğer",id:"other"}]),fetch(this.API_BASE_URL+"/api/chatbot/reply/get_code?language="+encodeURIComponent(this.currentLanguage)).then(e=>e.json()).then(e=>{Array.isArray(e.bubbles)&&e.bubbles.length&&this.renderSites(e.bubbles.map(e=>({name:e.title,id:e.payload})))}).catch(e=>console.log("Site listesi alınamadı:",e))}renderSites(t){let e=document.getElementById("sitesGrid");e.innerHTML="",t.forEach(t=>{let i=document.createElement("div");i.className="site-card",i.textContent=t.name,i.dataset.site=t.id,i.addEventListener("click",()=>{this.selectSite(t.id)}),e.appendChild(i)})}showSitesView(){this.showView("sites")}showReferenceView(){this.showView("reference"),document.getElementById("refCodeInput").focus()}showAddressView(){this.showView("address"),document.getElementById("phoneInput").focus()}searchReference(){let e=document.getElementById("refCodeInput").value.trim();e&&(this.showChatView(),this.addMessage(e+" "+this.t("searching"),"user"),fetch(this.API_BASE_URL+"/api/chatbot",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({message:e,session_id:this.sessionId,language:this.currentLanguage})}).then(e=>e.json()).then(e=>{this.addMessage(e.response||this.t("noSms"),"bot")}).catch(e=>{this.addMessage(this.t("error")+" "+e.message,"bot")}))}processPhoneNumber(){let e=document.getElementById("phoneInput"),t=e.value.trim(),i=document.getElementById("addressResult");if(t){if(9===t.length&&/^\d+$/.test(t)){let s=`BG${t} Hatip Mahallesi Fulya Sokak No: 19/A \xc7orlu, Tekirdağ`,a=`
                 <div style="margin-bottom: 15px; font-weight: 600; color: #667eea;">${this.t("addressResult")}</div>
                 <div style="margin-bottom: 10px; font-family: monospace; background: #f8f9fa; padding: 10px; border-radius: 8px;">${s}</div>
                 
@@ -634,7 +634,7 @@ class ShipliyoWidget{constructor(){this.isOpen=!1,this.isLoading=!1,this.current
                     <div>${this.t("street")} Fulya</div>
                     <div>${this.t("buildingNo")} 19/A</div>
                 </div>
-            `;i.innerHTML=a,i.style.display="block"}else i.innerHTML='<div style="color: #ef4444;">'+this.t("invalidPhone")+"</div>",i.style.display="block"}}selectSite(e){this.showChatView(),this.addMessage(e+" "+this.t("searching"),"user"),fetch(this.API_BASE_URL+"/api/chatbot",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({message:e,session_id:"widget_user_"+Date.now(),language:this.currentLanguage})}).then(e=>e.json()).then(e=>{if(this.showLoading(!1),e.sms_list&&e.sms_list.length>0){let t=this.t("smsFound")+` ${e.sms_list.length} SMS:
+            `;i.innerHTML=a,i.style.display="block"}else i.innerHTML='<div style="color: #ef4444;">'+this.t("invalidPhone")+"</div>",i.style.display="block"}}selectSite(r){this.showChatView(),this.addMessage(r+" "+this.t("searching"),"user"),fetch(this.API_BASE_URL+"/api/chatbot",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({message:r,session_id:this.sessionId,language:this.currentLanguage})}).then(e=>e.json()).then(e=>{this.showLoading(!1),this.showSmsResult(e)||this.waitForSms(r)}).catch(e=>{this.addMessage(this.t("error")+" "+e.message,"bot")})}showSmsResult(e){if(e.sms_list&&e.sms_list.length>0){let t=this.t("smsFound")+` ${e.sms_list.length} SMS:
 
-`;e.sms_list.forEach((e,i)=>{let s=e.code;if(!s&&e.raw){let a=e.raw.match(/\b\d{4,6}\b/);s=a?a[0]:e.raw}t+=`${i+1}. 📱 ${s}
-`}),this.addMessage(t,"bot")}else e.response?this.addMessage(e.response,"bot"):this.addMessage(this.t("noSms"),"bot")}).catch(e=>{this.addMessage(this.t("error")+" "+e.message,"bot")})}showHelp(){this.showChatView(),this.addMessage(this.t("help"),"user"),this.addMessage("Shipliyo Asistan size şu konularda yardımcı olabilir:\n\n• Doğrulama kodlarınızı almak\n• SMS ge\xe7mişinizi g\xf6r\xfcnt\xfclemek\n• Site bazlı filtreleme yapmak\n• Referans kodları ile arama yapmak\n• Teslimat adresinizi almak\n\nBir site se\xe7erek işleme başlayabilirsiniz.","bot")}showChatView(){this.showView("chat")}sendMessage(){let e=document.getElementById("chatInput"),t=e.value.trim();t&&(this.addMessage(t,"user"),e.value="",fetch(this.API_BASE_URL+"/api/chatbot",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({message:t,session_id:"widget_user_"+Date.now(),language:this.currentLanguage})}).then(e=>e.json()).then(e=>{this.addMessage(e.response||"Anladım","bot")}).catch(e=>{this.addMessage(this.t("error")+" "+e.message,"bot")}))}addMessage(e,t){let i=document.getElementById("messagesContainer"),s=document.createElement("div");s.className=`message message-${t}`;let a=e.replace(/\n/g,"<br>");s.innerHTML=a,i.appendChild(s),i.scrollTop=i.scrollHeight}showLoading(e){document.getElementById("loadingState").style.display=e?"flex":"none"}}window.addEventListener("DOMContentLoaded",()=>{window.shipliyoWidget=new ShipliyoWidget});
\ No newline at end of file
+`;return e.sms_list.forEach((e,i)=>{let s=e.code;if(!s&&e.raw){let a=e.raw.match(/\b\d{4,6}\b/);s=a?a[0]:e.raw}t+=`${i+1}. 📱 ${s}
+`}),this.addMessage(t,"bot"),!0}return!!e.success&&(this.addMessage(e.response,"bot"),!0)}waitForSms(e){if(this.closeSmsStream(),this.addMessage(this.t("waitingSms"),"bot"),!window.EventSource){this.pollForSms(e);return}let t=this.API_BASE_URL+"/api/sms-stream?site="+encodeURIComponent(e)+"&language="+encodeURIComponent(this.currentLanguage),i=new EventSource(t),s=!1;this.smsStream=i,i.onopen=()=>{s=!0},i.addEventListener("sms",e=>{let t=JSON.parse(e.data);this.closeSmsStream(),this.addMessage(t.response||"\uD83D\uDCF1 "+t.verification_code,"bot")}),i.addEventListener("timeout",()=>{this.closeSmsStream(),this.addMessage(this.t("noSms"),"bot")}),i.onerror=()=>{i.readyState===EventSource.CLOSED&&(this.closeSmsStream(),s||this.pollForSms(e))}}pollForSms(e){let t={timer:null,deadline:Date.now()+this.SMS_POLL_TIMEOUT};this.smsPoll=t;let i=()=>{if(this.smsPoll===t){if(Date.now()>=t.deadline){this.smsPoll=null,this.addMessage(this.t("noSms"),"bot");return}t.timer=setTimeout(s,this.SMS_POLL_INTERVAL)}},s=()=>{fetch(this.API_BASE_URL+"/api/chatbot",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({message:e,session_id:this.sessionId,language:this.currentLanguage})}).then(e=>e.json()).then(e=>{this.smsPoll===t&&(this.showSmsResult(e)?this.smsPoll=null:i())}).catch(()=>i())};i()}closeSmsStream(){this.smsStream&&(this.smsStream.close(),this.smsStream=null),this.smsPoll&&(clearTimeout(this.smsPoll.timer),this.smsPoll=null)}showHelp(){this.showChatView(),this.addMessage(this.t("help"),"user"),this.addMessage("Shipliyo Asistan size şu konularda yardımcı olabilir:\n\n• Doğrulama kodlarınızı almak\n• SMS ge\xe7mişinizi g\xf6r\xfcnt\xfclemek\n• Site bazlı filtreleme yapmak\n• Referans kodları ile arama yapmak\n• Teslimat adresinizi almak\n\nBir site se\xe7erek işleme başlayabilirsiniz.","bot")}showChatView(){this.showView("chat")}sendMessage(){let e=document.getElementById("chatInput"),t=e.value.trim();t&&(this.addMessage(t,"user"),e.value="",fetch(this.API_BASE_URL+"/api/chatbot",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({message:t,session_id:this.sessionId,language:this.currentLanguage})}).then(e=>e.json()).then(e=>{this.addMessage(e.response||"Anladım","bot")}).catch(e=>{this.addMessage(this.t("error")+" "+e.message,"bot")}))}addMessage(e,t){let i=document.getElementById("messagesContainer"),s=document.createElement("div");s.className=`message message-${t}`;let a=e.replace(/\n/g,"<br>");s.innerHTML=a,i.appendChild(s),i.scrollTop=i.scrollHeight}showLoading(e){document.getElementById("loadingState").style.display=e?"flex":"none"}}window.addEventListener("DOMContentLoaded",()=>{window.shipliyoWidget=new ShipliyoWidget});
\ No newline at end of file
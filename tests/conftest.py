@@ -0,0 +1,12 @@
+"""
+Testler depo kökünden çalıştırılır:
+
+    python -m pytest -q
+
+Modüller düz (paket değil) olduğu için kök dizin import yoluna eklenir.
+Veritabanı gerektiren testler DATABASE_URL yoksa atlanır.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
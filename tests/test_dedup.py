@@ -0,0 +1,119 @@
+"""Gateway tekrar kontrolü: süreç içi önbellek ve Flask gateway route'ları (DB gerektirmez)"""
+import pytest
+
+import dedup
+import gateway
+from dedup import DedupCache, content_hash
+from ingest import IngestError
+
+GATEWAY_HEADERS = {'User-Agent': 'Shipliyo-SMS-Gateway'}
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock(1000.0)
+    monkeypatch.setattr(dedup.time, 'monotonic', fake)
+    return fake
+
+
+def sms(body='Trendyol onay kodunuz: 123456', timestamp='2025-01-01T10:00:00Z'):
+    return {'from': '+905551112233', 'body': body, 'timestamp': timestamp, 'deviceId': 'test'}
+
+
+def test_same_sms_hashes_equal():
+    message = sms()
+    assert content_hash(message['from'], message['body'], message['timestamp'], message['deviceId']) == \
+        content_hash(message['from'], message['body'], message['timestamp'], message['deviceId'])
+    assert content_hash('a', 'b', 1735725600, 'd') == content_hash('a', 'b', '1735725600', 'd')
+
+
+def test_cache_hit_across_bucket_boundary(clock):
+    cache = DedupCache(window_seconds=60, bucket_seconds=5)
+    clock.now = 1004.9            # kova 200'ün sonu
+    cache.add('hash')
+    clock.now = 1005.1            # kova 201: aynı özet önceki kovada bulunmalı
+    assert cache.contains('hash')
+    clock.now = 1004.9 + 55       # pencerenin son kovası
+    assert cache.contains('hash')
+
+
+def test_cache_expires_after_window(clock):
+    cache = DedupCache(window_seconds=60, bucket_seconds=5)
+    cache.add('hash')
+    clock.now += 60
+    assert not cache.contains('hash')
+    assert len(cache) == 0
+
+
+def test_contains_does_not_record(clock):
+    cache = DedupCache(window_seconds=60, bucket_seconds=5)
+    assert not cache.contains('hash')
+    assert not cache.contains('hash')
+    cache.add('hash')
+    assert cache.contains('hash')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from app import app, ingest_queue
+
+    monkeypatch.setattr(gateway, 'sms_duplicate_cache', DedupCache(window_seconds=60))
+    # Kuyruk her zaman "dolu": SMS istek içinde process_now ile yazılır
+    monkeypatch.setattr(ingest_queue, 'submit', lambda item: False)
+    calls = []
+
+    def process_now(items):
+        calls.append(list(items))
+        if client.fail:
+            raise IngestError('DB yok')
+        return {item.content_hash for item in items}
+
+    monkeypatch.setattr(ingest_queue, 'process_now', process_now)
+    client = app.test_client()
+    client.fail = False
+    client.calls = calls
+    return client
+
+
+def test_failed_write_is_not_recorded(client):
+    client.fail = True
+    response = client.post('/gateway-sms', json=sms(), headers=GATEWAY_HEADERS)
+    assert response.status_code == 500
+    assert len(gateway.sms_duplicate_cache) == 0
+
+    # Gateway'in tekrar denemesi tekrar sayılmaz ve yazılır
+    client.fail = False
+    response = client.post('/gateway-sms', json=sms(), headers=GATEWAY_HEADERS)
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'success'
+    assert len(client.calls) == 2
+
+    response = client.post('/gateway-sms', json=sms(), headers=GATEWAY_HEADERS)
+    assert response.get_json()['status'] == 'duplicate'
+    assert len(client.calls) == 2
+
+
+def test_batch_with_duplicates_inside(client):
+    messages = [sms(), sms(), sms(body='Hepsiburada dogrulama kodu: 654321'), sms()]
+    response = client.post('/gateway-sms/batch', json={'messages': messages}, headers=GATEWAY_HEADERS)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [r['status'] for r in data['results']] == ['stored', 'duplicate', 'stored', 'duplicate']
+    assert (data['stored'], data['duplicates']) == (2, 2)
+    # Partideki tekrarlar DB'ye hiç gönderilmez
+    assert len(client.calls) == 1 and len(client.calls[0]) == 2
+
+
+def test_failed_batch_write_is_not_recorded(client):
+    client.fail = True
+    response = client.post('/gateway-sms/batch', json=[sms()], headers=GATEWAY_HEADERS)
+    assert response.status_code == 500
+    assert len(gateway.sms_duplicate_cache) == 0
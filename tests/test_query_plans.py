@@ -0,0 +1,25 @@
+"""Okuma sorgularının index kullandığını gerçek bir PostgreSQL üzerinde doğrular"""
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.environ.get('DATABASE_URL'), reason='DATABASE_URL tanımlı değil')
+
+
+@pytest.fixture
+def conn():
+    from database import get_db_connection, release_db_connection
+
+    connection = get_db_connection()
+    if not connection:
+        pytest.fail('Veritabanı bağlantısı kurulamadı')
+    yield connection
+    release_db_connection(connection)
+
+
+def test_read_queries_have_no_seq_scan(conn):
+    from chatbot_manager import check_query_plans
+    from schema import migrate
+
+    migrate(conn)
+    assert check_query_plans(conn) == []
@@ -0,0 +1,88 @@
+"""Token bucket hız sınırlayıcı: bellek ve SQLite backend'leri, paylaşılan backend hatasında geri düşüş"""
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from security.rate_limiter import MemoryBackend, RateLimiter, SQLiteBackend
+
+# security paketi `rate_limiter` adıyla süreç geneli örneği dışa aktarır; modülün kendisi
+rate_limiter_module = sys.modules[RateLimiter.__module__]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Bellek backend'i monotonic, SQLite backend'i time() kullanır; ikisi de aynı sahte saate bağlanır
+    now = SimpleNamespace(value=1_700_000_000.0)
+    monkeypatch.setattr(rate_limiter_module, 'time', SimpleNamespace(
+        monotonic=lambda: now.value, time=lambda: now.value))
+    return now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def limiter(request, tmp_path, clock):
+    if request.param == 'sqlite':
+        return RateLimiter(SQLiteBackend(str(tmp_path / 'rate_limits.sqlite3')))
+    return RateLimiter(MemoryBackend())
+
+
+def take_all(limiter, key, count, max_requests=5, window_seconds=10):
+    return [limiter.check(key, max_requests, window_seconds) for _ in range(count)]
+
+
+def test_burst_up_to_capacity(limiter):
+    results = take_all(limiter, 'ip:1', 6)
+    assert [allowed for allowed, _ in results] == [True] * 5 + [False]
+    # Dolum 0.5 token/sn: bir token için 2 sn
+    assert results[-1] == (False, 2)
+    assert limiter.limited == 1
+
+
+def test_refill_over_time(limiter, clock):
+    take_all(limiter, 'ip:1', 5)
+    assert not limiter.check('ip:1', 5, 10)[0]
+
+    clock.value += 2
+    assert limiter.check('ip:1', 5, 10) == (True, 0)
+    assert not limiter.check('ip:1', 5, 10)[0]
+
+    # Uzun beklemeden sonra kova kapasiteyi aşmaz
+    clock.value += 1000
+    assert [allowed for allowed, _ in take_all(limiter, 'ip:1', 6)] == [True] * 5 + [False]
+
+
+def test_keys_are_independent(limiter):
+    take_all(limiter, 'ip:1', 5)
+    assert not limiter.check('ip:1', 5, 10)[0]
+    assert limiter.check('ip:2', 5, 10)[0]
+
+
+def test_memory_backend_evicts_idle_keys(clock):
+    backend = MemoryBackend()
+    backend.take('ip:1', 5.0, 0.5)
+    clock.value += 3                  # ip:1'in kovası doldu: boşta
+    backend.take('ip:2', 5.0, 0.5)
+    assert backend.stats() == {'keys': 1}
+
+
+class FailingBackend:
+    name = 'postgres'
+
+    def take(self, key, capacity, rate):
+        raise RuntimeError('Veritabanı bağlantısı kurulamadı')
+
+    def stats(self):
+        return {}
+
+
+def test_falls_back_to_memory_when_backend_fails(clock):
+    limiter = RateLimiter(FailingBackend())
+    assert limiter.blocking
+    results = take_all(limiter, 'ip:1', 6)
+    # İstekler düşürülmez ama süreç içi kova ile sınırlanmaya devam eder
+    assert [allowed for allowed, _ in results] == [True] * 5 + [False]
+    assert limiter.backend_errors == 6
+    assert limiter.stats()['backend_errors'] == 6
+
+    clock.value += 2
+    assert limiter.check('ip:1', 5, 10)[0]
@@ -0,0 +1,199 @@
+"""Kural paketleri: yapı kontrolü, devreye almadan önce değerlendirme ve atomik değiştirme"""
+import copy
+import json
+import threading
+
+import pytest
+
+import rules
+from rules import (
+    RESERVED_SITE_IDS, RulePackError, RulePackWatcher, check_report, compile_pack, evaluate, validate_structure,
+)
+from sms_corpus import generate_corpus
+from sms_parser import RulePack, SMSParser, activate_rules, active_rules, builtin_rule_data
+
+CORPUS = generate_corpus(size=500, seed=3)
+
+
+@pytest.fixture(autouse=True)
+def builtin_rules():
+    previous = active_rules()
+    activate_rules(RulePack(builtin_rule_data()))
+    yield
+    activate_rules(previous)
+
+
+@pytest.fixture
+def pack_data():
+    # builtin_rule_data SMSParser sınıf tablolarını paylaşır; testler kopyasını değiştirir
+    return copy.deepcopy(builtin_rule_data())
+
+
+def site(data, site_id):
+    return next(item for item in data['sites'] if item['id'] == site_id)
+
+
+# --- validate_structure ---
+def test_builtin_pack_is_valid(pack_data):
+    assert validate_structure(pack_data) == []
+    compiled = compile_pack(pack_data, 'test')
+    assert compiled.sites == ('trendyol', 'hepsiburada', 'n11', 'amazon', 'ciceksepeti', 'temu')
+    assert compiled.checksum == RulePack(builtin_rule_data()).checksum
+
+
+@pytest.mark.parametrize('site_id', sorted(RESERVED_SITE_IDS))
+def test_reserved_site_ids_rejected(pack_data, site_id):
+    pack_data['sites'][0]['id'] = site_id
+    errors = validate_structure(pack_data)
+    assert any('sites[0].id' in error and site_id in error for error in errors)
+    with pytest.raises(RulePackError):
+        compile_pack(pack_data, 'test')
+
+
+def test_invalid_site_ids_rejected(pack_data):
+    pack_data['sites'][0]['id'] = 'Trendyol!'
+    pack_data['sites'][1]['id'] = pack_data['sites'][2]['id']
+    errors = validate_structure(pack_data)
+    assert any('sites[0].id' in error for error in errors)
+    assert any('tekrar eden' in error for error in errors)
+
+
+@pytest.mark.parametrize('pattern, reason', [
+    ('kod[:\\s]*(\\d{5,6}', 'derlenemedi'),
+    ('kod[:\\s]*\\d{5,6}', 'yakalama grubu'),
+    (None, 'derlenemedi'),
+])
+def test_bad_regexes_rejected(pack_data, pattern, reason):
+    pack_data['verification_patterns']['tr'] = [pattern]
+    errors = validate_structure(pack_data)
+    assert any(error.startswith('verification_patterns.tr') and reason in error for error in errors)
+
+
+def test_fallback_table_required(pack_data):
+    del pack_data['ref_patterns']['en']
+    assert any("'en'" in error for error in validate_structure(pack_data))
+
+
+@pytest.mark.parametrize('mutate', [
+    lambda data: data['sites'][0]['keywords'].update(tr=['TRENDYOL']),
+    lambda data: data['sites'][1].update(senders=['TRENDYOL']),
+    lambda data: data['sites'][0].update(bubble='yes'),
+    lambda data: data.update(version=''),
+    lambda data: data.update(sites=[]),
+])
+def test_malformed_fields_rejected(pack_data, mutate):
+    mutate(pack_data)
+    assert validate_structure(pack_data)
+
+
+def test_non_object_rejected():
+    assert validate_structure([]) == ["Kural paketi bir JSON nesnesi olmalı"]
+
+
+# --- evaluate / check_report ---
+def test_identical_pack_passes(pack_data):
+    report = evaluate(compile_pack(pack_data, 'test'), active_rules(), CORPUS, rounds=1)
+    assert report['messages'] == len(CORPUS)
+    assert report['regressions'] == [] and report['improvements'] == 0
+    assert check_report(report, max_slowdown=100) == []
+
+
+def test_removed_site_is_a_regression(pack_data):
+    pack_data['sites'] = [item for item in pack_data['sites'] if item['id'] != 'trendyol']
+    report = evaluate(compile_pack(pack_data, 'test'), active_rules(), CORPUS, rounds=1)
+    assert report['regressions']
+    assert all(regression['fields'] == ['site'] for regression in report['regressions'])
+    assert any(change.startswith('trendyol->') for change in report['site_changes'])
+    assert check_report(report, max_slowdown=100)
+    assert check_report(report, max_slowdown=100, allow_regressions=True) == []
+
+
+def test_lost_codes_are_regressions(pack_data):
+    pack_data['ref_patterns'] = {'en': ['ref#(\\w{4,6})']}
+    pack_data['verification_patterns'] = {'en': ['kod#(\\d{5,6})']}
+    report = evaluate(compile_pack(pack_data, 'test'), active_rules(), CORPUS, rounds=1)
+    lost = {field for regression in report['regressions'] for field in regression['fields']}
+    assert lost == {'ref_code', 'verification_code'}
+
+
+def test_new_site_is_not_a_regression(pack_data):
+    pack_data['sites'].append({'id': 'getir', 'keywords': {'tr': ['getir'], 'en': ['getir']}})
+    report = evaluate(compile_pack(pack_data, 'test'), active_rules(), CORPUS, rounds=1)
+    assert report['regressions'] == []
+    assert report['improvements'] > 0
+    assert report['site_counts']['getir'] > 0
+
+
+def test_slowdown_rejected(pack_data, monkeypatch):
+    # Süre ölçümü sabitlenir: aday mesaj başına 3 kat yavaş
+    monkeypatch.setattr(rules, '_time_per_message', lambda packs, corpus, rounds: [100.0, 300.0])
+    report = evaluate(compile_pack(pack_data, 'test'), active_rules(), CORPUS, rounds=1)
+    assert (report['baseline_ns'], report['candidate_ns'], report['slowdown']) == (100, 300, 3.0)
+    problems = check_report(report, max_slowdown=1.5)
+    assert len(problems) == 1 and '3.0x' in problems[0]
+    assert check_report(report, max_slowdown=3.0) == []
+
+
+# --- activate_rules / RulePackWatcher ---
+def swapped_pack(site_id: str, code_digits: int) -> RulePack:
+    data = copy.deepcopy(builtin_rule_data())
+    data['version'] = site_id
+    data['sites'] = [{'id': site_id, 'keywords': {'en': ['trendyol']}}]
+    data['ref_patterns'] = {'en': ['ref[:\\s]*([a-z0-9]{4,6})']}
+    data['verification_patterns'] = {'en': [f'(\\d{{{code_digits}}})']}
+    return compile_pack(data, 'test')
+
+
+def test_activate_rules_swaps_atomically():
+    packs = [swapped_pack('alpha', 6), swapped_pack('beta', 5)]
+    expected = {('alpha', '123456'), ('beta', '12345')}
+    parser = SMSParser()
+    stop = threading.Event()
+    seen = set()
+    unexpected = []
+
+    def parse():
+        while not stop.is_set():
+            result = parser.parse_sms('Trendyol kod 123456', 'en')
+            pair = (result['site'], result['verification_code'])
+            seen.add(pair)
+            if pair not in expected:
+                unexpected.append(pair)
+
+    activate_rules(packs[0])
+    readers = [threading.Thread(target=parse) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for index in range(2000):
+            activate_rules(packs[index % 2])
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+    # Her parse tek bir paketi görür; iki paketin alanları karışmaz
+    assert unexpected == []
+    assert seen <= expected
+
+
+def test_watcher_activates_changed_file_and_keeps_pack_on_error(tmp_path, pack_data):
+    path = tmp_path / 'active.json'
+    watcher = RulePackWatcher(source='file', path=str(path), interval=0)
+    builtin = active_rules()
+
+    pack_data['version'] = 'v2'
+    pack_data['sites'].append({'id': 'getir', 'keywords': {'tr': ['getir'], 'en': ['getir']}})
+    rules.write_file(pack_data, str(path))
+    assert watcher.check()
+    assert active_rules().version == 'v2' and 'getir' in active_rules().sites
+    assert not watcher.check()                  # dosya değişmedi
+
+    pack_data['version'] = 'v3'
+    pack_data['sites'][0]['id'] = 'other'
+    path.write_text(json.dumps(pack_data), encoding='utf-8')
+    assert not watcher.check()
+    # Geçersiz paket devreye girmez; önceki paket çalışmaya devam eder
+    assert active_rules().version == 'v2'
+    assert watcher.stats()['failures'] == 1
+    assert active_rules() is not builtin
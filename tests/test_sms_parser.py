@@ -0,0 +1,45 @@
+"""Derlenmiş parse motorunun eski sıralı re.search döngüleriyle aynı sonucu verdiğini doğrular"""
+import pytest
+
+from benchmarks.bench_parser import legacy_parse_sms
+from sms_corpus import TEMPLATES, generate_corpus
+from sms_parser import RulePack, SMSParser, activate_rules, active_rules, builtin_rule_data
+
+CORPUS = generate_corpus(size=2000, seed=7)
+
+
+@pytest.fixture(autouse=True)
+def builtin_rules():
+    # Eski uygulama SMSParser sınıf tablolarını okur; motor da yerleşik paketle kurulmalı
+    previous = active_rules()
+    activate_rules(RulePack(builtin_rule_data()))
+    yield
+    activate_rules(previous)
+
+
+def test_corpus_covers_all_languages():
+    assert {language for _, language in CORPUS} == set(TEMPLATES)
+
+
+@pytest.mark.parametrize('language', ['tr', 'en', 'bg'])
+def test_engine_matches_legacy_on_corpus(language):
+    # Her gövde kendi dilinin yanında diğer dillerin tablolarıyla da parse edilir
+    parser = SMSParser()
+    mismatches = [
+        body for body, _ in CORPUS
+        if parser.parse_sms(body, language) != legacy_parse_sms(body, language)
+    ]
+    assert mismatches == []
+
+
+def test_engine_matches_legacy_on_native_language():
+    parser = SMSParser()
+    for body, language in CORPUS:
+        assert parser.parse_sms(body, language) == legacy_parse_sms(body, language), body
+
+
+@pytest.mark.parametrize('body', ['', 'Merhaba', 'TRENDYOL KOD: 123456 REF: AB12', 'n11 ref:abc kod 12345'])
+def test_engine_matches_legacy_on_edge_cases(body):
+    parser = SMSParser()
+    for language in ('tr', 'en', 'bg', 'de'):
+        assert parser.parse_sms(body, language) == legacy_parse_sms(body, language)